@@ -3,6 +3,12 @@ ASGI config for alx_travel_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through ASGI lets long-lived responses such as the payment status
+stream (/api/payments/<transaction_id>/events/) wait on the event loop
+instead of tying up a worker thread each. Run it with, for example:
+
+    gunicorn alx_travel_app.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -4,9 +4,19 @@ Celery configuration for alx_travel_app project.
 import os
 from celery import Celery
 
+from . import tracing
+
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
 
+# Celery runs Django's system checks when a worker starts, and the URL
+# checks import the whole URLconf (every view and what it imports). The
+# web deploy runs them already (migrate, in build.sh), so workers skip them.
+# This only saves time: with the same INSTALLED_APPS as the web, the checks
+# pass in workers too.
+if os.environ.get('PROCESS_ROLE') == 'worker':
+    os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
+
 app = Celery('alx_travel_app')
 
 # Load configuration from Django settings with the CELERY namespace
@@ -16,6 +26,10 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+# Trace context in task headers, plus DB and outbound HTTP spans. This
+# module is imported by every web and worker process (see __init__.py).
+tracing.install()
+
 @app.task(bind=True)
 def debug_task(self):
     """Debug task to test Celery setup."""
@@ -0,0 +1,73 @@
+"""
+Deferred imports, to keep process start-up fast.
+
+Every gunicorn and Celery process imports whatever its modules import at
+the top, whether or not that process ever uses it. For the heavy
+dependencies only some code paths need (requests, NumPy, Pillow), a module
+can bind a LazyModule instead:
+
+    requests = LazyModule("requests")
+
+It stands in for the module and imports it on first attribute access. So
+`requests.get(...)`, `except requests.exceptions.RequestException` and
+`mock.patch("listings.services.requests.get")` all behave as before, and a
+process that never makes an HTTP call never imports requests.
+
+`when_imported()` runs a callback once a module is really imported. The
+tracer uses it to instrument requests without importing it itself.
+
+`python manage.py profile_imports` shows what is still imported at boot.
+"""
+import importlib
+import importlib.abc
+import importlib.util
+import sys
+
+
+class LazyModule:
+    """A module imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "imported" if self.__dict__["_module"] is not None else "not imported yet"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class _ImportHook(importlib.abc.MetaPathFinder):
+    def __init__(self, name, callback):
+        self.name = name
+        self.callback = callback
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != self.name:
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+        callback = self.callback
+
+        def exec_then_callback(module):
+            exec_module(module)
+            callback(module)
+
+        spec.loader.exec_module = exec_then_callback
+        return spec
+
+
+def when_imported(name, callback):
+    """Call `callback(module)` once module `name` is imported (now, if it already is)."""
+    if name in sys.modules:
+        callback(sys.modules[name])
+    else:
+        sys.meta_path.insert(0, _ImportHook(name, callback))
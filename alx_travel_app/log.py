@@ -0,0 +1,185 @@
+"""
+Non-blocking structured logging.
+
+Request threads never touch the disk: QueueingHandler puts records on a
+bounded in-memory queue and a background QueueListener thread writes them
+as JSON lines to a size-rotated file (and the console). If the queue is
+full the record is dropped rather than making the request wait. Each
+process writes its own file, since rotating a shared one is not safe.
+
+Every record carries the id of the request that produced it
+(RequestIdMiddleware + RequestIdFilter). SamplingFilter keeps only a
+fraction of INFO-and-below records, deciding per request so a sampled
+request keeps all of its lines.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import re
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+import orjson
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# What a client-sent X-Request-ID may look like. Anything else (newlines,
+# markup, megabytes) is replaced, as it ends up in logs and response headers.
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+# Attributes every LogRecord has; anything else was passed via `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdMiddleware:
+    """Tag each request with an id (reusing a well-formed X-Request-ID from the client)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get("X-Request-ID", "")
+        if not REQUEST_ID_RE.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response["X-Request-ID"] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            # django.request logs after the middleware has returned, but
+            # passes the request along in `extra`.
+            request = getattr(record, "request", None)
+            record.request_id = getattr(request, "request_id", None) or request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` (0..1) of INFO-and-below records; warnings and errors always pass."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.threshold = int(float(rate) * 10000)
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or self.threshold >= 10000:
+            return True
+        key = getattr(record, "request_id", None) or f"{record.name}:{record.created}"
+        return zlib.crc32(key.encode()) % 10000 < self.threshold
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "process": record.process,
+            "thread": record.thread,
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "request":
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Block at shutdown so records already queued get written, not lost.
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Enqueue records for a background thread that does the actual I/O.
+
+    Configured from settings.LOGGING like any other handler class; the
+    file/console handlers it feeds are built here because dictConfig has
+    no way to point one handler at others.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 console=True, queue_size=10000, per_process=False):
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self.filename = Path(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.console = console
+        self.per_process = per_process
+
+        self.listener = _Listener(self.queue, *self._targets(), respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+        # gunicorn/celery fork workers after settings are loaded; the listener
+        # thread does not survive fork, so start a fresh one in the child.
+        os.register_at_fork(after_in_child=self._restart_listener)
+
+    def log_path(self):
+        """
+        The file this process writes. Rotation renames the file, which is
+        only safe with a single writer, so with per_process every worker
+        gets its own: logs/django.log -> logs/django.<pid>.log.
+        """
+        if not self.per_process:
+            return self.filename
+        return self.filename.with_name(f"{self.filename.stem}.{os.getpid()}{self.filename.suffix}")
+
+    def _targets(self):
+        formatter = JsonFormatter()
+        targets = [RotatingFileHandler(self.log_path(), maxBytes=self.max_bytes,
+                                       backupCount=self.backup_count, delay=True)]
+        if self.console:
+            targets.append(logging.StreamHandler())
+        for target in targets:
+            target.setFormatter(formatter)
+        return targets
+
+    def _restart_listener(self):
+        self.listener._thread = None
+        if self.per_process:
+            # The child must not rotate (or append to) the parent's file
+            self.listener.handlers = tuple(self._targets())
+        self.listener.start()
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, in the calling thread, while
+        # args and exc_info are still valid; keep extras for the formatter.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,45 @@
+"""
+Middleware that steps aside for the stateless API mount.
+
+Requests under STATELESS_API_PREFIX authenticate with signed JWT access
+tokens only, so they don't need a session (one DB read per request),
+CSRF checks, request.user from the session, or flash messages. These
+subclasses of the stock middleware behave exactly like Django's for every
+other path, and pass stateless requests straight through.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+def is_stateless(request):
+    return request.path_info.startswith(settings.STATELESS_API_PREFIX)
+
+
+class SkipForStatelessMixin:
+    def __call__(self, request):
+        if is_stateless(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class StatefulSessionMiddleware(SkipForStatelessMixin, SessionMiddleware):
+    pass
+
+
+class StatefulAuthenticationMiddleware(SkipForStatelessMixin, AuthenticationMiddleware):
+    pass
+
+
+class StatefulMessageMiddleware(SkipForStatelessMixin, MessageMiddleware):
+    pass
+
+
+class StatefulCsrfViewMiddleware(SkipForStatelessMixin, CsrfViewMiddleware):
+    # process_view is called by the handler directly, not through __call__
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_stateless(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
@@ -0,0 +1,113 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema walks every viewset and serializer, which costs
+hundreds of milliseconds of CPU. Instead we generate it once at build time
+(`python manage.py generate_schema`, run from build.sh) into versioned files
+under SCHEMA_ARTIFACT_DIR, load them into memory on first use and serve them
+with a strong ETag so clients can revalidate with a cheap 304. If a deploy
+skipped the build step, the first request generates the missing artifact.
+
+In DEBUG the artifacts are ignored and the schema is generated lazily on
+first request instead, so it always reflects the code being developed
+(the autoreloader restarts the process on changes).
+
+Serving the files needs nothing from drf_yasg; everything that does
+(generation, the Swagger/ReDoc pages) lives in openapi.py and is imported
+on first use.
+"""
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import condition, require_safe
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 'v1'
+
+FORMATS = {
+    ".json": "application/json",
+    ".yaml": "application/yaml",
+}
+
+
+_documents = {}
+_lock = threading.Lock()
+
+
+def artifact_path(fmt):
+    """File the build step writes the schema to, e.g. schema/openapi-v1.json."""
+    return settings.SCHEMA_ARTIFACT_DIR / f"openapi-{API_VERSION}{fmt}"
+
+
+def generate_schema(fmt):
+    """Build the full schema and encode it as `fmt` (".json" or ".yaml")."""
+    from . import openapi
+
+    return openapi.generate_schema(fmt)
+
+
+def _generate_missing(fmt):
+    """
+    Fallback for a deploy whose build skipped `generate_schema`: build the
+    schema once and write the artifact so other workers can just read it.
+    """
+    path = artifact_path(fmt)
+    logger.warning("Schema artifact %s missing; generating it now (run `manage.py generate_schema` at build time)", path)
+    content = generate_schema(fmt)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    except OSError:
+        # Read-only filesystem: this process still caches it in memory
+        logger.warning("Could not write schema artifact %s", path, exc_info=True)
+    return content
+
+
+def get_document(fmt):
+    """Return (content, etag) for `fmt`."""
+    if fmt not in _documents:
+        with _lock:
+            if fmt not in _documents:
+                if settings.DEBUG:
+                    content = generate_schema(fmt)
+                else:
+                    try:
+                        content = artifact_path(fmt).read_bytes()
+                    except FileNotFoundError:
+                        content = _generate_missing(fmt)
+                _documents[fmt] = (content, hashlib.sha256(content).hexdigest())
+    return _documents[fmt]
+
+
+def _etag(request, format):
+    if format not in FORMATS:
+        return None
+    return get_document(format)[1]
+
+
+@require_safe
+@condition(etag_func=_etag)
+def schema_document(request, format):
+    """Serve /swagger.json and /swagger.yaml from memory."""
+    if format not in FORMATS:
+        raise Http404("Unknown schema format")
+    return HttpResponse(get_document(format)[0], content_type=FORMATS[format])
+
+
+def schema_ui(renderer):
+    """The drf_yasg "swagger" or "redoc" page, built on its first request."""
+    view = None
+
+    def ui(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from .openapi import schema_view
+
+            view = schema_view.with_ui(renderer, cache_timeout=0)
+        return view(request, *args, **kwargs)
+
+    return ui
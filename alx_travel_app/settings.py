@@ -2,6 +2,7 @@
 Django settings for alx_travel_app project.
 """
 
+from datetime import timedelta
 from pathlib import Path
 import environ
 import os
@@ -46,30 +47,47 @@ THIRD_PARTY_APPS = [
     "rest_framework",
     "corsheaders",
     "drf_yasg",
-    "django_extensions",
 ]
 
+# Development helpers (shell_plus, runserver_plus, ...)
+if DEBUG:
+    THIRD_PARTY_APPS.append("django_extensions")
+
 LOCAL_APPS = [
     "listings",
 ]
 
+# Which kind of process this is: "web" (gunicorn, runserver, manage.py) or
+# "worker" (celery worker and beat; see Procfile). Both install the same
+# apps, so the URLconf, reverse() and the system checks work everywhere;
+# workers start fast because heavy modules are imported lazily and they
+# skip the system checks at start-up (see celery.py).
+PROCESS_ROLE = env("PROCESS_ROLE", default="web")
+
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 # ---------------------------------------------------------------------
 # MIDDLEWARE
 # ---------------------------------------------------------------------
 
+# Session, CSRF, auth and messages middleware are skipped for requests
+# under STATELESS_API_PREFIX (see alx_travel_app/middleware.py).
 MIDDLEWARE = [
+    "alx_travel_app.log.RequestIdMiddleware",
+    "alx_travel_app.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # Must be before CommonMiddleware
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "alx_travel_app.middleware.StatefulSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    "alx_travel_app.middleware.StatefulCsrfViewMiddleware",
+    "alx_travel_app.middleware.StatefulAuthenticationMiddleware",
+    "alx_travel_app.middleware.StatefulMessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Same API as /api/, but JWT-only: no session or CSRF work per request
+STATELESS_API_PREFIX = "/api/stateless/"
+
 # ---------------------------------------------------------------------
 # URLS & WSGI
 # ---------------------------------------------------------------------
@@ -99,6 +117,29 @@ else:
             "NAME": BASE_DIR / "db.sqlite3",
         }
     }
+    # Covering indexes' INCLUDE columns are Postgres-only; SQLite just
+    # builds the key columns, which is fine for development.
+    SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+# ---------------------------------------------------------------------
+# CACHES
+# ---------------------------------------------------------------------
+
+# Redis makes cached entries (idempotency keys, etc.) visible to every
+# process; without it each process gets its own in-memory cache.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
 
 # ---------------------------------------------------------------------
 # PASSWORD VALIDATION
@@ -131,12 +172,22 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Stream uploads to a temporary file instead of holding them in memory
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+
+# Listing photos (see listings/photos.py)
+LISTING_PHOTO_MAX_BYTES = env.int("LISTING_PHOTO_MAX_BYTES", default=15 * 1024 * 1024)
+LISTING_PHOTO_WIDTHS = [320, 640, 1280, 1920]
+LISTING_PHOTO_QUALITY = 80
+
 # ---------------------------------------------------------------------
 # REST FRAMEWORK
 # ---------------------------------------------------------------------
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        # Signed access tokens: the user is read from the token, not the DB
+        "rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.TokenAuthentication",
     ],
@@ -145,12 +196,42 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # Throttles key anonymous clients on their IP. With NUM_PROXIES unset DRF
+    # trusts the whole X-Forwarded-For header, which any client can forge; 0
+    # means REMOTE_ADDR, N means the address N proxies in front of us saw.
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=0),
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
+        "alx_travel_app.renderers.ORJSONRenderer",
+        "alx_travel_app.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "alx_travel_app.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
 }
 
+# Serve list/retrieve reads through listings/fastpath.py (values() rows +
+# precompiled field mappers) whenever the output is provably identical
+FAST_READ_PATH = env.bool("FAST_READ_PATH", default=True)
+
+# Short-lived access tokens keep stateless auth safe without a DB check per
+# request: a deactivated user loses access once the token expires, because
+# refreshing re-checks the user against the database.
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=env.int("JWT_ACCESS_MINUTES", default=5)),
+    "REFRESH_TOKEN_LIFETIME": timedelta(days=env.int("JWT_REFRESH_DAYS", default=1)),
+    "AUTH_HEADER_TYPES": ("Bearer",),
+    "SIGNING_KEY": env("JWT_SIGNING_KEY", default=SECRET_KEY),
+}
+
+# The browsable API renders templates and forms for every HTML request;
+# it is only worth that cost while developing.
+if DEBUG:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "rest_framework.renderers.BrowsableAPIRenderer"
+    )
+
 # ---------------------------------------------------------------------
 # CORS CONFIGURATION
 # ---------------------------------------------------------------------
@@ -173,6 +254,114 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Periodic tasks (run with: celery -A alx_travel_app beat)
+CELERY_BEAT_SCHEDULE = {
+    "refresh-listing-daily-stats": {
+        "task": "listings.tasks.refresh_listing_daily_stats",
+        "schedule": env.int("ANALYTICS_REFRESH_SECONDS", default=5 * 60),
+    },
+    "refresh-similar-listings": {
+        "task": "listings.tasks.refresh_similar_listings",
+        "schedule": env.int("SIMILAR_LISTINGS_REFRESH_SECONDS", default=5 * 60),
+    },
+    "rebuild-similar-listings": {
+        "task": "listings.tasks.rebuild_similar_listings",
+        "schedule": 24 * 60 * 60,
+    },
+    "maintain-booking-partitions": {
+        "task": "listings.tasks.maintain_booking_partitions",
+        "schedule": 24 * 60 * 60,
+    },
+    "expire-stale-records": {
+        "task": "listings.tasks.expire_stale_records",
+        "schedule": env.int("EXPIRY_SWEEP_SECONDS", default=10 * 60),
+    },
+    "archive-old-bookings": {
+        "task": "listings.tasks.archive_old_bookings",
+        "schedule": 24 * 60 * 60,
+    },
+    "refresh-exchange-rates": {
+        "task": "listings.tasks.refresh_exchange_rates",
+        "schedule": env.int("EXCHANGE_RATES_REFRESH_SECONDS", default=60 * 60),
+    },
+    "sync-calendar-feeds": {
+        "task": "listings.tasks.sync_calendar_feeds",
+        "schedule": env.int("CALENDAR_SYNC_SECONDS", default=15 * 60),
+    },
+}
+
+# ---------------------------------------------------------------------
+# SIMILAR LISTINGS (see listings/similarity.py)
+# ---------------------------------------------------------------------
+
+SIMILAR_LISTINGS_K = env.int("SIMILAR_LISTINGS_K", default=10)
+# Listings per sparse matrix product / per write transaction
+SIMILAR_LISTINGS_BATCH_SIZE = env.int("SIMILAR_LISTINGS_BATCH_SIZE", default=256)
+# Refreshes reuse the fitted vocabulary/IDF for this long, then refit on
+# every listing (the daily rebuild task refits too)
+SIMILAR_LISTINGS_REFIT_SECONDS = env.int("SIMILAR_LISTINGS_REFIT_SECONDS", default=24 * 60 * 60)
+
+# ---------------------------------------------------------------------
+# CURRENCIES (see listings/currency.py)
+# ---------------------------------------------------------------------
+
+# Listing prices and booking totals are stored in this currency
+BASE_CURRENCY = "ETB"
+# Currencies prices can be shown in, with their number of decimal places
+CURRENCIES = {"ETB": 2, "USD": 2, "EUR": 2}
+# Currencies Chapa can charge in
+CHAPA_CURRENCIES = ("ETB", "USD")
+# "{base}" is replaced by BASE_CURRENCY; the response needs a "rates" object.
+# Leave empty to maintain rates by hand in the admin.
+EXCHANGE_RATES_URL = env("EXCHANGE_RATES_URL", default="https://open.er-api.com/v6/latest/{base}")
+EXCHANGE_RATES_TIMEOUT = env.float("EXCHANGE_RATES_TIMEOUT", default=10)
+# How long each process reuses the rates it loaded from the database
+EXCHANGE_RATE_CACHE_SECONDS = env.int("EXCHANGE_RATE_CACHE_SECONDS", default=5 * 60)
+
+# ---------------------------------------------------------------------
+# CALENDAR SYNC (see listings/ical.py)
+# ---------------------------------------------------------------------
+
+CALENDAR_FETCH_TIMEOUT = env.float("CALENDAR_FETCH_TIMEOUT", default=10)
+# Larger external feeds are refused rather than parsed
+CALENDAR_MAX_BYTES = env.int("CALENDAR_MAX_BYTES", default=2 * 1024 * 1024)
+
+# ---------------------------------------------------------------------
+# AUTOCOMPLETE (see listings/autocomplete.py)
+# ---------------------------------------------------------------------
+
+# How often each process checks for listing changes to patch into its index
+AUTOCOMPLETE_VERSION_CHECK_SECONDS = env.int("AUTOCOMPLETE_VERSION_CHECK_SECONDS", default=5)
+# Patched listings + locations after which the index is rebuilt from scratch
+AUTOCOMPLETE_MAX_PATCHED = env.int("AUTOCOMPLETE_MAX_PATCHED", default=500)
+# Browser/CDN caching of suggestion responses
+AUTOCOMPLETE_CACHE_SECONDS = env.int("AUTOCOMPLETE_CACHE_SECONDS", default=60)
+
+# ---------------------------------------------------------------------
+# ADMIN
+# ---------------------------------------------------------------------
+
+# Changelists above this many rows (per the Postgres planner) show an
+# estimated count instead of running COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = env.int("ADMIN_EXACT_COUNT_LIMIT", default=10000)
+
+# ---------------------------------------------------------------------
+# BOOKING STORAGE (see listings/partitioning.py and listings/archive.py)
+# ---------------------------------------------------------------------
+
+# Current-data endpoints only read bookings starting this many months back
+BOOKING_HOT_MONTHS = env.int("BOOKING_HOT_MONTHS", default=3)
+# Postgres: monthly partitions are created this far ahead
+BOOKING_PARTITION_MONTHS_AHEAD = env.int("BOOKING_PARTITION_MONTHS_AHEAD", default=18)
+# Finished bookings move to the archive table this long after check-out
+BOOKING_ARCHIVE_AFTER_DAYS = env.int("BOOKING_ARCHIVE_AFTER_DAYS", default=365)
+
+# Pending rows older than these are expired by listings/expiry.py
+PAYMENT_PENDING_TTL_MINUTES = env.int("PAYMENT_PENDING_TTL_MINUTES", default=2 * 60)
+BOOKING_PENDING_TTL_MINUTES = env.int("BOOKING_PENDING_TTL_MINUTES", default=24 * 60)
+EXPIRY_BATCH_SIZE = env.int("EXPIRY_BATCH_SIZE", default=500)
+EXPIRY_MAX_BATCHES = env.int("EXPIRY_MAX_BATCHES", default=20)
+
 # ---------------------------------------------------------------------
 # EMAIL CONFIGURATION
 # ---------------------------------------------------------------------
@@ -195,6 +384,45 @@ if EMAIL_BACKEND == 'django.core.mail.backends.smtp.EmailBackend':
 # ---------------------------------------------------------------------
 
 CHAPA_SECRET_KEY = os.getenv("CHAPA_SECRET_KEY", "")
+CHAPA_TIMEOUT = env.float("CHAPA_TIMEOUT", default=10)
+# Batch verify (POST /api/payments/verify/): transactions per request, and
+# how many verify calls to Chapa run at once
+PAYMENT_BATCH_VERIFY_MAX = env.int("PAYMENT_BATCH_VERIFY_MAX", default=50)
+CHAPA_VERIFY_CONCURRENCY = env.int("CHAPA_VERIFY_CONCURRENCY", default=8)
+
+# ---------------------------------------------------------------------
+# PAYMENT EVENTS (Server-Sent Events, see listings/events.py)
+# ---------------------------------------------------------------------
+
+# Redis pub/sub lets Celery workers and other web processes reach clients
+# connected to this process; without it events stay in-process.
+PAYMENT_EVENTS_REDIS_URL = os.environ.get("PAYMENT_EVENTS_REDIS_URL", os.environ.get("REDIS_URL"))
+PAYMENT_EVENTS_HEARTBEAT = 15
+PAYMENT_EVENTS_MAX_SECONDS = 10 * 60
+
+# ---------------------------------------------------------------------
+# IDEMPOTENCY KEYS (see listings/idempotency.py)
+# ---------------------------------------------------------------------
+
+IDEMPOTENCY_TTL = env.int("IDEMPOTENCY_TTL", default=24 * 60 * 60)
+# How long a key stays locked while its first request runs
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+# How long a concurrent duplicate waits for the first request to finish
+IDEMPOTENCY_WAIT = env.float("IDEMPOTENCY_WAIT", default=5)
+
+# ---------------------------------------------------------------------
+# RATE LIMITING (token buckets, see listings/throttling.py)
+# ---------------------------------------------------------------------
+
+# Shared buckets across processes; falls back to per-process buckets
+# when unset or unreachable.
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", os.environ.get("REDIS_URL"))
+
+RATE_LIMITS = {
+    "payment_client": env("RATE_LIMIT_PAYMENT_CLIENT", default="10/min"),
+    "payment_booking": env("RATE_LIMIT_PAYMENT_BOOKING", default="5/min"),
+    "chapa_outbound": env("RATE_LIMIT_CHAPA_OUTBOUND", default="20/s"),
+}
 
 # ---------------------------------------------------------------------
 # SECURITY (PRODUCTION)
@@ -221,34 +449,70 @@ if not DEBUG:
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
+# Request threads only enqueue records; a background thread writes JSON
+# lines to a size-rotated file and the console (see alx_travel_app/log.py).
+# gunicorn and celery run several processes, so each gets its own file
+# (django.<pid>.log): one file rotated by several writers loses records.
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "verbose": {
-            "format": "{levelname} {asctime} {module} {process:d} {thread:d} {message}",
-            "style": "{",
+    "filters": {
+        "request_id": {"()": "alx_travel_app.log.RequestIdFilter"},
+        "sample_info": {
+            "()": "alx_travel_app.log.SamplingFilter",
+            "rate": env.float("LOG_INFO_SAMPLE_RATE", default=1.0),
         },
     },
     "handlers": {
-        "file": {
+        "async": {
             "level": "INFO",
-            "class": "logging.FileHandler",
+            "class": "alx_travel_app.log.QueueingHandler",
+            "filters": ["request_id", "sample_info"],
             "filename": LOG_DIR / "django.log",
-            "formatter": "verbose",
+            "per_process": True,
+            "max_bytes": env.int("LOG_MAX_BYTES", default=10 * 1024 * 1024),
+            "backup_count": env.int("LOG_BACKUP_COUNT", default=5),
+        },
+        "traces": {
+            "level": "INFO",
+            "class": "alx_travel_app.log.QueueingHandler",
+            "filters": ["request_id"],
+            "filename": LOG_DIR / "traces.jsonl",
+            "per_process": True,
+            "max_bytes": env.int("LOG_MAX_BYTES", default=10 * 1024 * 1024),
+            "backup_count": env.int("LOG_BACKUP_COUNT", default=5),
+            "console": False,
         },
-        "console": {
+    },
+    "loggers": {
+        # Finished spans when TRACE_EXPORTER = "file"
+        "alx_travel_app.tracing.spans": {
+            "handlers": ["traces"],
             "level": "INFO",
-            "class": "logging.StreamHandler",
-            "formatter": "verbose",
+            "propagate": False,
         },
     },
     "root": {
-        "handlers": ["console", "file"],
+        "handlers": ["async"],
         "level": "INFO",
     },
 }
 
+# ---------------------------------------------------------------------
+# TRACING
+# ---------------------------------------------------------------------
+
+# Spans for requests, queries, serializers, Celery tasks and outbound HTTP
+# (see alx_travel_app/tracing.py). The sample rate applies to every trace;
+# set TRACE_TRUST_INCOMING_SAMPLING only when requests reach the app through
+# your own gateway, to let the caller's traceparent decide instead.
+TRACE_SAMPLE_RATE = env.float("TRACE_SAMPLE_RATE", default=0.1)
+TRACE_TRUST_INCOMING_SAMPLING = env.bool("TRACE_TRUST_INCOMING_SAMPLING", default=False)
+# "file" (logs/traces.jsonl), "memory" (tracing.collector) or "none"
+TRACE_EXPORTER = env("TRACE_EXPORTER", default="file")
+TRACE_MEMORY_SPANS = env.int("TRACE_MEMORY_SPANS", default=10000)
+TRACE_DB_STATEMENT_CHARS = env.int("TRACE_DB_STATEMENT_CHARS", default=500)
+
 # ---------------------------------------------------------------------
 # DEFAULTS
 # ---------------------------------------------------------------------
@@ -276,7 +540,7 @@ TEMPLATES = [
     },
 ]
 
-CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', default=True, cast=bool)
+CORS_ALLOW_ALL_ORIGINS = env.bool('CORS_ALLOW_ALL_ORIGINS', default=True)
 
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
@@ -288,4 +552,14 @@ SWAGGER_SETTINGS = {
         }
     },
     'PERSIST_AUTH': True,
-}
\ No newline at end of file
+    'DEFAULT_GENERATOR_CLASS': 'alx_travel_app.openapi.PublicSchemaGenerator',
+    # Point the UIs at the precomputed schema instead of regenerating it
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+# Build-time OpenAPI schema (python manage.py generate_schema)
+SCHEMA_ARTIFACT_DIR = BASE_DIR / "schema"
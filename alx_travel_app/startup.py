@@ -0,0 +1,58 @@
+"""
+Process start-up, as measured by `manage.py profile_imports` and
+`python -m benchmarks.startup`.
+
+BOOT holds, for each PROCESS_ROLE, the Python code that does what a real
+process does before it can serve its first request or task. Each
+measurement runs it in a fresh interpreter, because imports are only slow
+the first time.
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+BOOT = {
+    # gunicorn's uvicorn worker builds the ASGI handler at start-up and loads
+    # the URLconf (and with it every view module) on the first request
+    "web": (
+        "from django.core.asgi import get_asgi_application; get_asgi_application(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    # celery sets up Django, then imports every app's tasks module
+    "worker": (
+        "import django; django.setup(); "
+        "from alx_travel_app.celery import app; app.loader.import_default_modules()"
+    ),
+}
+
+
+def run_boot(role, importtime=False):
+    """Boot a `role` process and exit. Returns the CompletedProcess (stderr has -X importtime output)."""
+    env = dict(os.environ, PROCESS_ROLE=role, DJANGO_SETTINGS_MODULE=os.environ.get(
+        "DJANGO_SETTINGS_MODULE", "alx_travel_app.settings"))
+    argv = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", BOOT[role]]
+    return subprocess.run(argv, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def parse_importtime(output):
+    """[(module, self µs, cumulative µs)] from `python -X importtime` output."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def by_package(modules):
+    """Total self time (µs) per top-level package, largest first."""
+    totals = defaultdict(int)
+    for name, self_us, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: -item[1])
@@ -0,0 +1,373 @@
+"""
+Request-to-worker tracing.
+
+A trace is a tree of timed spans sharing one trace id: the HTTP request,
+the queries and serializers it ran, the Celery tasks it queued (and what
+those did in the worker), and the outbound HTTP calls along the way, such
+as Chapa or SMTP. Context travels in W3C `traceparent` form: it is read
+from incoming requests, added to Celery message headers and added to
+outbound `requests` calls.
+
+Sampling is decided once, at the root (TRACE_SAMPLE_RATE, from the trace
+id so every process agrees), and inherited by every span below it. An
+incoming request keeps the caller's trace id, but its sampled flag is only
+honoured with TRACE_TRUST_INCOMING_SAMPLING; otherwise any client could
+have every one of its requests recorded. Unsampled requests still pass
+their context on, but record nothing and skip the per-query work.
+
+Finished spans go to TRACE_EXPORTER:
+- "file": JSON lines in logs/traces.jsonl, written by the same
+  non-blocking queue handler as the logs (see LOGGING in settings);
+- "memory": the in-process `collector` (last TRACE_MEMORY_SPANS spans);
+- "none": nowhere.
+
+install() hooks up the database, requests and Celery instrumentation; it
+is called when alx_travel_app.celery is imported, which happens in every
+web and worker process.
+"""
+import collections
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from .lazy import when_imported
+
+logger = logging.getLogger(__name__)
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(collections.namedtuple("SpanContext", "trace_id span_id sampled")):
+    """The part of a span that is propagated to other processes."""
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header):
+    """SpanContext from a `traceparent` header, or None if absent or malformed."""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def _sample(trace_id):
+    rate = settings.TRACE_SAMPLE_RATE
+    return rate >= 1 or int(trace_id[-8:], 16) < rate * 0x100000000
+
+
+class Span:
+    __slots__ = ("context", "parent_id", "name", "kind", "attributes", "start_time", "_start", "duration_ms", "error")
+
+    def __init__(self, name, kind="internal", parent=None, attributes=None):
+        if parent is None:
+            trace_id = os.urandom(16).hex()
+            self.context = SpanContext(trace_id, os.urandom(8).hex(), _sample(trace_id))
+            self.parent_id = None
+        else:
+            self.context = SpanContext(parent.trace_id, os.urandom(8).hex(), parent.sampled)
+            self.parent_id = parent.span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.error = None
+
+    @property
+    def trace_id(self):
+        return self.context.trace_id
+
+    @property
+    def sampled(self):
+        return self.context.sampled
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._start) * 1000
+            if self.sampled:
+                export(self)
+
+    def as_dict(self):
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": datetime.fromtimestamp(self.start_time, tz=timezone.utc).isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def start_span(name, kind="internal", parent=None, **attributes):
+    """Start a span under `parent` (a SpanContext) or the current span. Call .end() on it."""
+    if parent is None:
+        current = current_span.get()
+        parent = current.context if current is not None else None
+    return Span(name, kind, parent, attributes)
+
+
+@contextmanager
+def span(name, kind="internal", parent=None, **attributes):
+    """Time the block as a span, and make it the parent of spans started inside."""
+    active = start_span(name, kind, parent, **attributes)
+    token = current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.error = repr(e)[:300]
+        raise
+    finally:
+        current_span.reset(token)
+        active.end()
+
+
+def recording():
+    """True when the current span is sampled, i.e. child spans are worth creating."""
+    current = current_span.get()
+    return current is not None and current.sampled
+
+
+# -------------------------
+# Export
+# -------------------------
+class SpanCollector:
+    """In-process store of the most recent finished spans."""
+
+    def __init__(self, size=None):
+        self._spans = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, span_dict):
+        with self._lock:
+            if self._spans.maxlen != settings.TRACE_MEMORY_SPANS:
+                self._spans = collections.deque(self._spans, maxlen=settings.TRACE_MEMORY_SPANS)
+            self._spans.append(span_dict)
+
+    def spans(self, trace_id=None):
+        with self._lock:
+            return [s for s in self._spans if trace_id is None or s["trace_id"] == trace_id]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+collector = SpanCollector()
+span_logger = logging.getLogger("alx_travel_app.tracing.spans")
+
+
+def export(finished):
+    exporter = settings.TRACE_EXPORTER
+    if exporter == "file":
+        # Nested: "name" and friends are reserved LogRecord attributes
+        span_logger.info(finished.name, extra={"span": finished.as_dict()})
+    elif exporter == "memory":
+        collector.add(finished.as_dict())
+
+
+# -------------------------
+# HTTP requests in
+# -------------------------
+class TracingMiddleware:
+    """One server span per request, continuing the caller's trace if it sent one."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        parent = parse_traceparent(request.headers.get("traceparent"))
+        if parent is not None and not settings.TRACE_TRUST_INCOMING_SAMPLING:
+            parent = parent._replace(sampled=_sample(parent.trace_id))
+        with span(request.method, kind="server", parent=parent, **{
+            "http.method": request.method,
+            "http.target": request.path,
+            "request_id": getattr(request, "request_id", None),
+        }) as server:
+            response = self.get_response(request)
+            match = getattr(request, "resolver_match", None)
+            if match is not None and match.route:
+                # Route, not path, so spans of one endpoint group together
+                server.name = f"{request.method} /{match.route.replace('^', '').replace('$', '')}"
+            server.set(**{"http.status_code": response.status_code})
+        response["X-Trace-ID"] = server.trace_id
+        return response
+
+
+# -------------------------
+# Database queries
+# -------------------------
+def _traced_execute(execute, sql, params, many, context):
+    if not recording():
+        return execute(sql, params, many, context)
+    with span("db.query", kind="client", **{
+        "db.system": context["connection"].vendor,
+        "db.statement": sql[:settings.TRACE_DB_STATEMENT_CHARS],
+        "db.many": many,
+    }):
+        return execute(sql, params, many, context)
+
+
+def _instrument_connection(connection, **kwargs):
+    if _traced_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_traced_execute)
+
+
+# -------------------------
+# Outbound HTTP (requests)
+# -------------------------
+def _instrument_requests(requests):
+    original_send = requests.Session.send
+    if getattr(original_send, "_traced", False):
+        return
+
+    def send(self, request, **kwargs):
+        if current_span.get() is None:
+            return original_send(self, request, **kwargs)
+        url = urlsplit(request.url)
+        with span(f"HTTP {request.method} {url.netloc}", kind="client", **{
+            "http.method": request.method,
+            # No query string: it may carry tokens
+            "http.url": f"{url.scheme}://{url.netloc}{url.path}",
+        }) as client:
+            request.headers["traceparent"] = client.context.traceparent
+            response = original_send(self, request, **kwargs)
+            client.set(**{"http.status_code": response.status_code})
+            return response
+
+    send._traced = True
+    requests.Session.send = send
+
+
+# -------------------------
+# Celery
+# -------------------------
+class OpenSpans:
+    """
+    Spans open between two signals, keyed by task id. Bounded: a publish
+    that raises never sends after_task_publish, so its entry would stay
+    forever; the oldest entries are dropped (unexported) past `size`.
+    """
+
+    def __init__(self, size=10000):
+        self._spans = collections.OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._spans[key] = value
+            while len(self._spans) > self._size:
+                self._spans.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._spans.get(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._spans.pop(key, default)
+
+    def __len__(self):
+        return len(self._spans)
+
+
+_open_spans = OpenSpans()
+
+
+def _before_publish(headers=None, **kwargs):
+    if headers is None or current_span.get() is None:
+        return
+    publish = start_span(f"celery.publish {headers.get('task')}", kind="producer", **{"celery.task_id": headers.get("id")})
+    _open_spans[("publish", headers.get("id"))] = publish
+    headers["traceparent"] = publish.context.traceparent
+    headers["trace_enqueued_at"] = time.time()
+
+
+def _after_publish(headers=None, **kwargs):
+    publish = _open_spans.pop(("publish", (headers or {}).get("id")), None)
+    if publish is not None:
+        publish.end()
+
+
+def _header(request, name):
+    # Workers merge message headers into the request; apply() keeps them apart
+    return getattr(request, name, None) or (request.headers or {}).get(name)
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    request = task.request
+    attributes = {"celery.task_id": task_id, "celery.retries": request.retries or 0}
+    enqueued_at = _header(request, "trace_enqueued_at")
+    if enqueued_at:
+        # Time spent in the broker before a worker picked the task up
+        attributes["celery.queue_wait_ms"] = round((time.time() - float(enqueued_at)) * 1000, 3)
+    parent = parse_traceparent(_header(request, "traceparent"))
+    # Eager tasks run inside the caller's span; queued ones continue its trace
+    consumer = start_span(f"celery.task {task.name}", kind="consumer", parent=parent, **attributes)
+    _open_spans[("task", task_id)] = (consumer, current_span.set(consumer))
+
+
+def _task_postrun(task_id=None, state=None, **kwargs):
+    entry = _open_spans.pop(("task", task_id), None)
+    if entry is not None:
+        consumer, token = entry
+        consumer.set(**{"celery.state": state})
+        try:
+            current_span.reset(token)
+        except ValueError:
+            # Reset from another context; just clear it
+            current_span.set(None)
+        consumer.end()
+
+
+def _task_failure(task_id=None, exception=None, **kwargs):
+    entry = _open_spans.get(("task", task_id))
+    if entry is not None:
+        entry[0].error = repr(exception)[:300]
+
+
+_installed = False
+
+
+def install():
+    """Hook up DB, requests and Celery instrumentation (once per process)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from celery import signals as celery_signals
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_instrument_connection, weak=False)
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection)
+    # Without importing requests: processes that make no HTTP calls skip it
+    when_imported("requests", _instrument_requests)
+
+    celery_signals.before_task_publish.connect(_before_publish, weak=False)
+    celery_signals.after_task_publish.connect(_after_publish, weak=False)
+    celery_signals.task_prerun.connect(_task_prerun, weak=False)
+    celery_signals.task_postrun.connect(_task_postrun, weak=False)
+    celery_signals.task_failure.connect(_task_failure, weak=False)
@@ -6,36 +6,30 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-# Swagger imports
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-# Swagger/OpenAPI Schema Configuration
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ALX Travel App API",
-        default_version='v1',
-        description="A comprehensive travel listings API built with Django REST Framework",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@alxtravelapp.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+# Swagger/OpenAPI: the schema is precomputed, and drf_yasg itself is only
+# imported when a docs page is first opened (see schema.py).
+from .schema import schema_document, schema_ui
 
 urlpatterns = [
     # Admin interface
     path('admin/', admin.site.urls),
     
     # API Documentation
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger<format>/', schema_document, name='schema-json'),
+    path('swagger/', schema_ui('swagger'), name='schema-swagger-ui'),
+    path('redoc/', schema_ui('redoc'), name='schema-redoc'),
     
     # Django REST Framework browsable API
     path('api-auth/', include('rest_framework.urls')),
+
+    # JWT access/refresh tokens
+    path('api/token/', TokenObtainPairView.as_view(), name='token-obtain-pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+
+    # Stateless mount of the same API (no session/CSRF middleware)
+    path(settings.STATELESS_API_PREFIX.lstrip('/'), include('listings.urls')),
     path('api/', include('listings.urls'))
 ]
 
@@ -0,0 +1,28 @@
+"""
+Micro-benchmarks for hot paths in the API.
+
+Run one with:  python -m benchmarks.<name>
+They use in-memory objects where possible so results don't depend on the
+database that happens to be configured.
+"""
+import os
+import time
+
+
+def setup_django():
+    """Configure Django so benchmark scripts can import models and serializers."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_travel_app.settings")
+    import django
+
+    django.setup()
+
+
+def best_of(func, repeat=5, number=10):
+    """Return the best average time per call (in seconds) over `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
@@ -0,0 +1,53 @@
+"""
+Latency of autocomplete lookups against an index of 50,000 listing names
+and 5,000 locations.
+
+    python -m benchmarks.autocomplete
+"""
+import random
+import string
+import time
+
+from . import setup_django
+
+setup_django()
+
+from listings.autocomplete import PrefixIndex  # noqa: E402
+
+
+def random_words(rng, count):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).capitalize()
+        for _ in range(count)
+    )
+
+
+def main():
+    rng = random.Random(42)
+    locations = [(random_words(rng, rng.randint(1, 2)), rng.randint(1, 500), None) for _ in range(5000)]
+    names = [(random_words(rng, rng.randint(2, 4)), 1, i) for i in range(50000)]
+
+    start = time.perf_counter()
+    indexes = [PrefixIndex(locations), PrefixIndex(names)]
+    print(f"build: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    texts = [text for text, _, _ in locations + names]
+    queries = []
+    for _ in range(20000):
+        text = rng.choice(texts)
+        queries.append(text[:rng.randint(1, min(len(text), 8))])
+
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        for index in indexes:
+            index.search(query, 10)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    for label, fraction in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+        value = timings[min(int(len(timings) * fraction), len(timings) - 1)]
+        print(f"{label}: {value * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Render time and payload size for a 1,000-listing response.
+
+    python -m benchmarks.renderers
+"""
+from decimal import Decimal
+
+from . import best_of, setup_django
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from alx_travel_app.renderers import MessagePackRenderer, ORJSONRenderer  # noqa: E402
+from listings.models import CustomUser, Listing  # noqa: E402
+from listings.serializers import ListingSerializer  # noqa: E402
+
+
+def build_listings(count=1000):
+    """`count` unsaved listings spread over 50 hosts."""
+    hosts = [
+        CustomUser(id=i, username=f"host{i}", email=f"host{i}@example.com", phone_number="0912345678")
+        for i in range(1, 51)
+    ]
+    return [
+        Listing(
+            id=i,
+            host=hosts[i % len(hosts)],
+            name=f"Listing {i}",
+            description="Bright, quiet apartment close to the old town. " * 4,
+            location="Addis Ababa",
+            price_per_night=Decimal("1234.50") + i,
+            is_available=bool(i % 2),
+        )
+        for i in range(count)
+    ]
+
+
+def build_payload(count=1000):
+    """Serialize `count` unsaved listings (with expanded hosts) into API data."""
+    listings = build_listings(count)
+    serializer = ListingSerializer(listings, many=True, expand={"host": {}})
+    return {"count": count, "next": None, "previous": None, "results": serializer.data}
+
+
+def main():
+    data = build_payload()
+    renderers = [
+        ("stdlib JSONRenderer", JSONRenderer()),
+        ("ORJSONRenderer", ORJSONRenderer()),
+        ("MessagePackRenderer", MessagePackRenderer()),
+    ]
+    baseline = None
+    print(f"{'renderer':<22}{'ms/render':>12}{'bytes':>12}{'speedup':>10}")
+    for name, renderer in renderers:
+        seconds = best_of(lambda: renderer.render(data))
+        size = len(renderer.render(data))
+        baseline = baseline or seconds
+        print(f"{name:<22}{seconds * 1000:>12.2f}{size:>12}{baseline / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Time to shape a 100- and a 1,000-listing page (with expanded hosts) into
+response data: ListingSerializer on model instances versus the fast
+path's ReadPlan on the values() rows the view would fetch instead.
+
+    python -m benchmarks.serialization
+
+Only the Python side is measured; values() also saves building model
+instances from the database rows, which this leaves out.
+"""
+from types import SimpleNamespace
+
+from . import best_of, setup_django
+
+setup_django()
+
+from listings import fastpath  # noqa: E402
+from listings.serializers import ListingSerializer  # noqa: E402
+
+from .renderers import build_listings  # noqa: E402
+
+
+def as_row(instance, columns):
+    """The dict values(*columns) would return for `instance`."""
+    row = {}
+    for column in columns:
+        *path, name = column.split("__")
+        obj = instance
+        for part in path:
+            obj = getattr(obj, part)
+        # Foreign keys come back as their id
+        row[column] = getattr(obj, obj._meta.get_field(name).attname)
+    return row
+
+
+def main():
+    request = SimpleNamespace(query_params={"expand": "host"})
+    plan = fastpath.plan_for(ListingSerializer, request)
+    print(f"{'rows':>6}{'serializer ms':>16}{'fast path ms':>15}{'speedup':>10}")
+    for count in (100, 1000):
+        listings = build_listings(count)
+        rows = [as_row(listing, plan.columns) for listing in listings]
+        assert plan.render_many(rows) == ListingSerializer(listings, many=True, expand={"host": {}}).data
+        slow = best_of(lambda: ListingSerializer(listings, many=True, expand={"host": {}}).data)
+        fast = best_of(lambda: plan.render_many(rows))
+        print(f"{count:>6}{slow * 1000:>16.2f}{fast * 1000:>15.2f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
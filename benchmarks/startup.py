@@ -0,0 +1,37 @@
+"""
+Cold start-up time of a web and a worker process: a fresh interpreter
+doing what gunicorn does before its first response, or what celery does
+before its first task (see alx_travel_app/startup.py).
+
+    python -m benchmarks.startup
+
+`python manage.py profile_imports --role web|worker` shows where the time
+goes.
+"""
+import statistics
+import time
+
+from . import setup_django
+
+setup_django()
+
+from alx_travel_app.startup import BOOT, parse_importtime, run_boot  # noqa: E402
+
+
+def main(runs=7):
+    for role in BOOT:
+        run_boot(role)  # warm the OS file cache and .pyc files
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run_boot(role)
+            timings.append(time.perf_counter() - start)
+        modules = len(parse_importtime(run_boot(role, importtime=True).stderr))
+        print(
+            f"{role:>6}: median {statistics.median(timings) * 1000:.0f} ms, "
+            f"best {min(timings) * 1000:.0f} ms, {modules} modules"
+        )
+
+
+if __name__ == "__main__":
+    main()
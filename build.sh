@@ -11,4 +11,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # Run database migrations
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Precompute the OpenAPI schema served by /swagger.json
+python manage.py generate_schema
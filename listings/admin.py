@@ -1,8 +1,175 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import CustomUser, Listing, Payment
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
 
-# Register your models here.
-# Mange users models
-admin.site.register(CustomUser)
-admin.site.register(Listing)
-admin.site.register(Payment)
\ No newline at end of file
+from . import autocomplete, events, ical
+from .analytics import mark_dirty_many
+from .enums import PaymentStatus, Status
+from .models import Booking, CalendarFeed, CustomUser, ExchangeRate, Listing, Payment
+from .tasks import verify_payment_status
+
+
+# -------------------------
+# Changelists for big tables
+# -------------------------
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoid an exact COUNT(*) over millions of rows on every changelist page.
+
+    On Postgres we ask the planner how many rows it expects; above
+    ADMIN_EXACT_COUNT_LIMIT that estimate is shown instead (so the last
+    page numbers may be slightly off). Small results are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == "postgresql":
+            estimate = self._planner_estimate(queryset)
+            if estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.count()
+
+    @staticmethod
+    def _planner_estimate(queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N total"
+    show_full_result_count = False
+
+
+# -------------------------
+# Users
+# -------------------------
+@admin.register(CustomUser)
+class CustomUserAdmin(LargeTableAdmin):
+    list_display = ("email", "username", "is_staff", "is_active", "date_joined")
+    list_filter = ("is_staff", "is_active")
+    # Also what the user autocomplete widgets search by
+    search_fields = ("^email", "^username")
+    ordering = ("-id",)
+
+
+# -------------------------
+# Listings
+# -------------------------
+@admin.register(Listing)
+class ListingAdmin(LargeTableAdmin):
+    list_display = ("name", "location", "host", "price_per_night", "is_available")
+    list_select_related = ("host",)
+    autocomplete_fields = ("host",)
+    search_fields = ("name", "location")
+    ordering = ("-id",)
+    actions = ("mark_available", "mark_unavailable")
+
+    @admin.action(description="Mark selected listings as available")
+    def mark_available(self, request, queryset):
+        listing_ids = list(queryset.values_list("pk", flat=True))
+        updated = queryset.update(is_available=True)
+        # update() skips the Listing signals that refresh the search index
+        transaction.on_commit(lambda: autocomplete.mark_changed(listing_ids))
+        self.message_user(request, f"{updated} listings marked as available.")
+
+    @admin.action(description="Mark selected listings as unavailable")
+    def mark_unavailable(self, request, queryset):
+        listing_ids = list(queryset.values_list("pk", flat=True))
+        updated = queryset.update(is_available=False)
+        transaction.on_commit(lambda: autocomplete.mark_changed(listing_ids))
+        self.message_user(request, f"{updated} listings marked as unavailable.")
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ("listing", "name", "url", "last_synced_at", "last_error")
+    raw_id_fields = ("listing",)
+    readonly_fields = ("etag", "last_modified", "last_synced_at", "last_error")
+
+
+# -------------------------
+# Bookings
+# -------------------------
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdmin):
+    list_display = ("id", "property", "user", "start_date", "end_date", "status", "total_price")
+    # Booking.__str__ reads the listing name
+    list_select_related = ("property", "user")
+    list_filter = ("status", "start_date")
+    raw_id_fields = ("property",)
+    autocomplete_fields = ("user",)
+    search_fields = ("=id",)
+    ordering = ("-start_date", "-id")
+    actions = ("cancel_bookings",)
+
+    @admin.action(description="Cancel selected bookings")
+    def cancel_bookings(self, request, queryset):
+        with transaction.atomic():
+            rows = list(
+                queryset.exclude(status=Status.CANCELLED).select_for_update()
+                .values_list("pk", "property_id", "start_date", "end_date")
+            )
+            updated = Booking.objects.filter(pk__in=[row[0] for row in rows]).update(status=Status.CANCELLED)
+            # update() skips the signals that keep analytics and calendar feeds in step
+            mark_dirty_many(row[1:] for row in rows)
+            ical.bump_feed_versions(row[1] for row in rows)
+        self.message_user(request, f"{updated} bookings cancelled.")
+
+
+# -------------------------
+# Payments
+# -------------------------
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    # booking_id rather than booking: no join against the big Booking table
+    list_display = ("transaction_id", "booking_id", "amount", "currency", "base_amount", "status", "created_at")
+    list_filter = ("status", "created_at")
+    raw_id_fields = ("booking",)
+    # Exact matches use the unique indexes
+    search_fields = ("=transaction_id", "=chapa_reference")
+    readonly_fields = ("created_at", "updated_at")
+    actions = ("reverify_payments", "mark_failed")
+
+    @admin.action(description="Re-verify selected pending payments with Chapa")
+    def reverify_payments(self, request, queryset):
+        transaction_ids = list(
+            queryset.filter(status=PaymentStatus.PENDING, transaction_id__isnull=False)
+            .values_list("transaction_id", flat=True)
+        )
+        for transaction_id in transaction_ids:
+            verify_payment_status.delay(transaction_id)
+        self.message_user(request, f"Queued {len(transaction_ids)} payments for verification.")
+
+    @admin.action(description="Mark selected pending payments as failed")
+    def mark_failed(self, request, queryset):
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(status=PaymentStatus.PENDING).select_for_update()
+                .values_list("pk", "transaction_id", "booking_id")
+            )
+            updated = Payment.objects.filter(pk__in=[row[0] for row in rows]).update(status=PaymentStatus.FAILED)
+            # update() skips the signal that notifies clients; pending
+            # payments carry no revenue, so the rollups are unaffected.
+            for _, transaction_id, booking_id in rows:
+                if transaction_id:
+                    message = {"transaction_id": transaction_id, "status": PaymentStatus.FAILED.value, "booking": booking_id}
+                    transaction.on_commit(
+                        lambda tx=transaction_id, msg=message: events.publish(tx, msg)
+                    )
+        self.message_user(request, f"{updated} payments marked as failed.")
+
+
+# -------------------------
+# Exchange rates
+# -------------------------
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    # Processes pick up edits within EXCHANGE_RATE_CACHE_SECONDS
+    list_display = ("currency", "rate", "updated_at")
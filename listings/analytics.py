@@ -0,0 +1,154 @@
+"""
+Daily rollups behind the host analytics endpoint.
+
+Bookings and payments mark the days they touch as dirty (see signals.py).
+The scheduled `refresh_listing_daily_stats` task calls
+`refresh_dirty_days()`, which recomputes only those days and upserts the
+results into ListingDailyStats. The analytics view then reads rollups only.
+
+Bulk `queryset.update()` calls skip model signals, so code that changes
+booking dates or status in bulk must call `mark_dirty()` itself.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from .enums import PaymentStatus, Status
+from .models import Booking, Listing, ListingDailyStats, Payment, StatsDirtyRange
+
+# Booking statuses that occupy the calendar and count towards analytics.
+OCCUPYING_STATUSES = (Status.CONFIRMED,)
+
+
+def mark_dirty(listing_id, start_date, end_date):
+    """Queue [start_date, end_date) for `listing_id` to be recomputed."""
+    if not (listing_id and start_date and end_date):
+        return
+    StatsDirtyRange.objects.create(
+        listing_id=listing_id,
+        start_date=start_date,
+        end_date=max(end_date, start_date + timedelta(days=1)),
+    )
+
+
+def mark_dirty_many(ranges):
+    """mark_dirty() for many (listing_id, start_date, end_date) tuples in one insert."""
+    StatsDirtyRange.objects.bulk_create(
+        [
+            StatsDirtyRange(
+                listing_id=listing_id,
+                start_date=start_date,
+                end_date=max(end_date, start_date + timedelta(days=1)),
+            )
+            for listing_id, start_date, end_date in ranges
+        ],
+        batch_size=1000,
+    )
+
+
+def _days(start_date, end_date):
+    day = start_date
+    while day < end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def compute_daily_stats(days_by_listing):
+    """
+    Recompute rollup values for the given {listing_id: set(days)}.
+
+    Returns {(listing_id, day): (nights_booked, bookings_started, revenue)}
+    including all-zero entries, so callers can tell which rows to delete.
+    """
+    window = Q()
+    for listing_id, days in days_by_listing.items():
+        window |= Q(property_id=listing_id, start_date__lte=max(days), end_date__gt=min(days))
+
+    bookings = list(
+        Booking.objects.filter(window, status__in=OCCUPYING_STATUSES)
+        .values_list("id", "property_id", "start_date", "end_date")
+    )
+    revenue_by_booking = dict(
+        Payment.objects.filter(booking_id__in=[b[0] for b in bookings], status=PaymentStatus.COMPLETED)
+        .values("booking_id")
+        .annotate(total=Sum(Coalesce("base_amount", "amount")))
+        .values_list("booking_id", "total")
+    )
+
+    stats = {
+        (listing_id, day): [0, 0, Decimal("0")]
+        for listing_id, days in days_by_listing.items()
+        for day in days
+    }
+    for booking_id, listing_id, start_date, end_date in bookings:
+        for day in _days(start_date, end_date):
+            row = stats.get((listing_id, day))
+            if row is None:
+                continue
+            row[0] = 1
+            if day == start_date:
+                # Revenue is recognised on the check-in day.
+                row[1] += 1
+                row[2] += revenue_by_booking.get(booking_id) or 0
+    return {key: tuple(value) for key, value in stats.items()}
+
+
+def refresh_dirty_days(batch_size=500):
+    """
+    Consume dirty ranges in batches and rewrite the affected rollup rows.
+    Returns the number of (listing, day) rows recomputed.
+    """
+    refreshed = 0
+    while True:
+        with transaction.atomic():
+            dirty = list(
+                StatsDirtyRange.objects.select_for_update().order_by("id")[:batch_size]
+            )
+            if not dirty:
+                return refreshed
+
+            days_by_listing = defaultdict(set)
+            for row in dirty:
+                days_by_listing[row.listing_id].update(_days(row.start_date, row.end_date))
+
+            # Listings deleted since they were marked have nothing to roll up;
+            # their stats were removed by the cascade.
+            hosts = dict(
+                Listing.objects.filter(id__in=days_by_listing).values_list("id", "host_id")
+            )
+            for listing_id in set(days_by_listing) - set(hosts):
+                del days_by_listing[listing_id]
+
+            stats = compute_daily_stats(days_by_listing) if days_by_listing else {}
+            upserts, empty = [], defaultdict(list)
+            for (listing_id, day), (nights, started, revenue) in stats.items():
+                if nights or started or revenue:
+                    upserts.append(ListingDailyStats(
+                        listing_id=listing_id,
+                        host_id=hosts[listing_id],
+                        date=day,
+                        nights_booked=nights,
+                        bookings_started=started,
+                        revenue=revenue,
+                    ))
+                else:
+                    empty[listing_id].append(day)
+
+            ListingDailyStats.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=["listing", "date"],
+                update_fields=["host", "nights_booked", "bookings_started", "revenue"],
+            )
+            if empty:
+                clear = Q()
+                for listing_id, days in empty.items():
+                    clear |= Q(listing_id=listing_id, date__in=days)
+                ListingDailyStats.objects.filter(clear).delete()
+
+            StatsDirtyRange.objects.filter(id__in=[row.id for row in dirty]).delete()
+            refreshed += len(stats)
@@ -0,0 +1,84 @@
+"""
+Cold archive for finished bookings.
+
+`archive_bookings()` (run daily by the archive_old_bookings task) moves
+bookings that ended more than BOOKING_ARCHIVE_AFTER_DAYS ago and are
+confirmed, cancelled or expired into ArchivedBooking, in batches, keeping their ids.
+Their payments move to ArchivedPayment in the same transaction, so no
+Payment is ever left pointing at a booking that isn't there.
+Current-data endpoints read Booking only, so the hot table (and, on
+Postgres, its recent partitions) stays small.
+
+ListingDailyStats rows for archived days are deliberately kept: the rows
+are removed with plain DELETEs, without signals, so those days are never
+marked dirty and recomputed without them.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .enums import Status
+from .models import ArchivedBooking, ArchivedPayment, Booking, Payment
+from .partitioning import drop_empty_booking_partitions, month_start
+
+ARCHIVABLE_STATUSES = (Status.CONFIRMED, Status.CANCELLED, Status.EXPIRED)
+
+ARCHIVED_FIELDS = (
+    "id", "property_id", "user_id", "start_date", "end_date", "total_price", "status", "created_at",
+)
+
+ARCHIVED_PAYMENT_FIELDS = (
+    "id", "booking_id", "amount", "currency", "base_amount", "transaction_id", "chapa_reference",
+    "status", "created_at", "updated_at", "chapa_response",
+)
+
+
+def archive_horizon():
+    return timezone.now().date() - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS)
+
+
+def _delete_rows(model, ids):
+    """
+    DELETE rows by primary key in plain SQL. QuerySet.delete() would cascade
+    and send the delete signals (which mark analytics days dirty and push
+    payment events); moving rows to the archive must do neither.
+    """
+    connection = connections[model.objects.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+
+
+def archive_bookings(batch_size=1000):
+    """Move archivable bookings to ArchivedBooking. Returns how many were moved."""
+    horizon = archive_horizon()
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Booking.objects.select_for_update()
+                # start_date is implied by end_date, but spelling it out lets
+                # Postgres prune the partitions to old months only.
+                .filter(start_date__lt=horizon, end_date__lt=horizon, status__in=ARCHIVABLE_STATUSES)
+                .order_by("start_date", "id")
+                .values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            booking_ids = [row["id"] for row in rows]
+            payments = list(
+                Payment.objects.select_for_update()
+                .filter(booking_id__in=booking_ids)
+                .values(*ARCHIVED_PAYMENT_FIELDS)
+            )
+            ArchivedBooking.objects.bulk_create([ArchivedBooking(**row) for row in rows])
+            ArchivedPayment.objects.bulk_create([ArchivedPayment(**row) for row in payments])
+            if payments:
+                _delete_rows(Payment, [row["id"] for row in payments])
+            _delete_rows(Booking, booking_ids)
+            archived += len(rows)
+
+    drop_empty_booking_partitions(before=month_start(horizon))
+    return archived
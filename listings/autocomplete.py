@@ -0,0 +1,340 @@
+"""
+Type-ahead for the search box, served from memory.
+
+Each process keeps a PrefixIndex of distinct locations (weighted by how
+many available listings they have) and of available listings' names. A
+lookup is a bisect over a sorted array of keys, or, for one to
+SHORT_PREFIX characters where the match ranges are huge, a dict hit on
+precomputed top results. Longer prefixes read their top results from a
+segment tree over the key range, so even a prefix shared by thousands of
+keys costs O(log n). No query touches the database.
+
+Keeping it fresh: a name, location or availability change (Listing
+signals, admin bulk actions) is recorded as an AutocompleteChange row.
+Every AUTOCOMPLETE_VERSION_CHECK_SECONDS a background thread in each
+process reads the recent rows and patches its index: the changed
+listings and locations are masked out of the big base indexes and served
+from a small overlay index instead, which is cheap to rebuild. Once more
+than AUTOCOMPLETE_MAX_PATCHED entries are patched, the thread rebuilds
+the base indexes from the database, still answering from the old ones
+meanwhile. The change rows live in the database, so every process sees
+every change whatever cache backend is configured.
+"""
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import AutocompleteChange, Listing
+
+logger = logging.getLogger(__name__)
+
+# Prefixes up to this length get their results precomputed
+SHORT_PREFIX = 3
+
+MAX_LIMIT = 20
+
+# Base indexes keep this many best ranks per prefix, so results can still be
+# filled from them after masking out patched entries
+BASE_CAPACITY = 2 * MAX_LIMIT
+
+# Change rows are re-read for this long after they are written, to catch
+# rows from transactions that committed out of order (and clock skew)
+CHANGE_MARGIN = timedelta(seconds=60)
+# Older rows are pruned; an index synced longer ago than this is rebuilt
+CHANGE_RETENTION = timedelta(hours=1)
+
+
+def normalize(text):
+    """Lowercase and strip accents, so "Zürich" matches "zur"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+class PrefixIndex:
+    """
+    Items are (text, weight, payload). Matching is on the start of the text
+    or of any word in it; results come back heaviest first, at most
+    `capacity` of them (default MAX_LIMIT).
+    """
+
+    def __init__(self, items, capacity=MAX_LIMIT):
+        self.capacity = capacity
+        # Item position doubles as rank: lower index = better match.
+        self.items = sorted(items, key=_order)
+        pairs = []
+        for rank, (text, _, _) in enumerate(self.items):
+            words = normalize(text).split()
+            for start in range(len(words)):
+                pairs.append((" ".join(words[start:]), rank))
+        pairs.sort()
+        self._keys = [key for key, _ in pairs]
+
+        # Segment tree over the keys: node i holds the `capacity` best
+        # distinct ranks below it, leaves sit at _size + position.
+        self._size = 1
+        while self._size < len(pairs):
+            self._size *= 2
+        self._tree = [()] * (2 * self._size)
+        for position, (_, rank) in enumerate(pairs):
+            self._tree[self._size + position] = (rank,)
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = _best_ranks((self._tree[2 * node], self._tree[2 * node + 1]), capacity)
+
+        self._short = {}
+        for key, rank in pairs:
+            for length in range(1, min(len(key), SHORT_PREFIX) + 1):
+                ranks = self._short.setdefault(key[:length], set())
+                if len(ranks) < capacity or rank < max(ranks):
+                    ranks.add(rank)
+                    if len(ranks) > capacity:
+                        ranks.remove(max(ranks))
+        self._short = {prefix: sorted(ranks) for prefix, ranks in self._short.items()}
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, prefix, limit=10, exclude=frozenset()):
+        """Best `limit` items matching `prefix`, skipping the ranks in `exclude`."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        wanted = min(limit + len(exclude), self.capacity)
+        if len(key) <= SHORT_PREFIX:
+            ranks = self._short.get(key, ())[:wanted]
+        else:
+            ranks = self._range_ranks(*self._range(key), wanted)
+        if exclude:
+            found = len(ranks)
+            ranks = [rank for rank in ranks if rank not in exclude][:limit]
+            if len(ranks) < limit and found == self.capacity:
+                # The precomputed best were mostly excluded: scan the range
+                start, end = self._range(key)
+                matching = {leaf[0] for leaf in self._tree[self._size + start:self._size + end]}
+                ranks = heapq.nsmallest(limit, matching - exclude)
+        return [self.items[rank] for rank in ranks]
+
+    def _range(self, key):
+        start = bisect_left(self._keys, key)
+        return start, bisect_left(self._keys, key + "\U0010ffff", start)
+
+    def _range_ranks(self, start, end, limit):
+        """Best `limit` distinct ranks among keys[start:end], from O(log n) tree nodes."""
+        nodes = []
+        low, high = start + self._size, end + self._size
+        while low < high:
+            if low & 1:
+                nodes.append(self._tree[low])
+                low += 1
+            if high & 1:
+                high -= 1
+                nodes.append(self._tree[high])
+            low //= 2
+            high //= 2
+        return _best_ranks(nodes, limit)
+
+
+def _order(item):
+    text, weight, _ = item
+    return -weight, text
+
+
+def _best_ranks(rank_lists, limit):
+    """The `limit` smallest distinct ranks of some sorted rank tuples."""
+    best = []
+    for rank in heapq.merge(*rank_lists):
+        if not best or best[-1] != rank:
+            best.append(rank)
+            if len(best) == limit:
+                break
+    return tuple(best)
+
+
+class Suggestions:
+    """
+    The location and listing-name indexes: base indexes built from the
+    database, plus an overlay for the listings changed since (see apply()).
+    """
+
+    def __init__(self):
+        # Changes recorded from here on (less CHANGE_MARGIN) are still to apply
+        self.synced_at = timezone.now()
+        # What the indexes currently hold: id -> (name, location) of every
+        # available listing, and how many of them each location has
+        self.listings = {
+            listing_id: (name, location)
+            for listing_id, name, location in Listing.objects.filter(is_available=True)
+            .values_list("id", "name", "location")
+            .iterator()
+        }
+        self.location_counts = Counter(location for _, location in self.listings.values() if location)
+
+        self._locations = PrefixIndex(
+            ((location, count, None) for location, count in self.location_counts.items()), BASE_CAPACITY
+        )
+        self._names = PrefixIndex(
+            ((name, 1, listing_id) for listing_id, (name, _) in self.listings.items()), BASE_CAPACITY
+        )
+        self._location_rank = {text: rank for rank, (text, _, _) in enumerate(self._locations.items)}
+        self._name_rank = {listing_id: rank for rank, (_, _, listing_id) in enumerate(self._names.items)}
+
+        self._patched_listings = set()
+        self._patched_locations = set()
+        # (masked location ranks, masked name ranks, overlay locations, overlay
+        # names), swapped in as one tuple so a search never sees half a patch
+        self._overlay = (frozenset(), frozenset(), PrefixIndex(()), PrefixIndex(()))
+
+    @property
+    def patched(self):
+        return len(self._patched_listings) + len(self._patched_locations)
+
+    def apply(self, listing_ids):
+        """Re-read `listing_ids` from the database and patch the indexes. Returns whether anything changed."""
+        current = {
+            listing_id: (name, location)
+            for listing_id, name, location in Listing.objects.filter(id__in=listing_ids, is_available=True)
+            .values_list("id", "name", "location")
+        }
+        changed = False
+        for listing_id in listing_ids:
+            old, new = self.listings.get(listing_id), current.get(listing_id)
+            if old == new:
+                continue
+            changed = True
+            self._patched_listings.add(listing_id)
+            if old:
+                del self.listings[listing_id]
+                self._count_location(old[1], -1)
+            if new:
+                self.listings[listing_id] = new
+                self._count_location(new[1], 1)
+        if not changed:
+            return False
+
+        self._overlay = (
+            frozenset(self._location_rank[text] for text in self._patched_locations if text in self._location_rank),
+            frozenset(self._name_rank[i] for i in self._patched_listings if i in self._name_rank),
+            PrefixIndex(
+                (text, self.location_counts[text], None)
+                for text in self._patched_locations if text in self.location_counts
+            ),
+            PrefixIndex(
+                (self.listings[i][0], 1, i) for i in self._patched_listings if i in self.listings
+            ),
+        )
+        return True
+
+    def _count_location(self, location, delta):
+        if not location:
+            return
+        self._patched_locations.add(location)
+        self.location_counts[location] += delta
+        if self.location_counts[location] <= 0:
+            del self.location_counts[location]
+
+    def search(self, prefix, limit):
+        masked_locations, masked_names, locations, names = self._overlay
+        return {
+            "locations": [
+                {"location": text, "listings": count}
+                for text, count, _ in _merged(
+                    self._locations.search(prefix, limit, masked_locations), locations.search(prefix, limit), limit
+                )
+            ],
+            "listings": [
+                {"id": listing_id, "name": text}
+                for text, _, listing_id in _merged(
+                    self._names.search(prefix, limit, masked_names), names.search(prefix, limit), limit
+                )
+            ],
+        }
+
+
+def _merged(base, overlay, limit):
+    return list(heapq.merge(base, overlay, key=_order))[:limit]
+
+
+_current = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_syncing = False
+
+
+def mark_changed(listing_ids):
+    """
+    Record that these listings' name, location or availability changed (or
+    that they were deleted). Called on commit by the Listing signals and the
+    admin bulk actions.
+    """
+    AutocompleteChange.objects.bulk_create([AutocompleteChange(listing_id=i) for i in listing_ids])
+
+
+def rebuild():
+    """Build this process's index from the database (synchronously)."""
+    global _current, _checked_at
+    _current = Suggestions()
+    _checked_at = time.monotonic()
+    # Every process rebuilds now and then, which keeps the change log short
+    AutocompleteChange.objects.filter(created_at__lt=timezone.now() - CHANGE_RETENTION).delete()
+    return _current
+
+
+def sync():
+    """Apply the changes recorded since the last sync, or rebuild when that is cheaper or needed."""
+    suggestions = _current
+    now = timezone.now()
+    if suggestions is None or now - suggestions.synced_at > CHANGE_RETENTION - CHANGE_MARGIN:
+        # Idle for so long that the rows it needs may have been pruned
+        return rebuild()
+    listing_ids = set(
+        AutocompleteChange.objects.filter(created_at__gte=suggestions.synced_at - CHANGE_MARGIN)
+        .values_list("listing_id", flat=True)
+    )
+    if listing_ids and suggestions.apply(listing_ids) and suggestions.patched > settings.AUTOCOMPLETE_MAX_PATCHED:
+        return rebuild()
+    suggestions.synced_at = now
+    return suggestions
+
+
+def _sync_in_background():
+    global _syncing
+    try:
+        sync()
+    except Exception:
+        logger.exception("Autocomplete index sync failed")
+    finally:
+        _syncing = False
+        connections.close_all()
+
+
+def _schedule_sync():
+    global _syncing
+    with _lock:
+        if _syncing:
+            return
+        _syncing = True
+    threading.Thread(target=_sync_in_background, name="autocomplete-sync", daemon=True).start()
+
+
+def get_suggestions():
+    """The current index; only the very first call in a process waits for a build."""
+    global _checked_at
+    if _current is None:
+        with _lock:
+            if _current is None:
+                rebuild()
+        return _current
+
+    now = time.monotonic()
+    if now - _checked_at >= settings.AUTOCOMPLETE_VERSION_CHECK_SECONDS:
+        _checked_at = now
+        _schedule_sync()
+    return _current
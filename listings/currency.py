@@ -0,0 +1,159 @@
+"""
+Prices in the guest's currency.
+
+Listing prices and booking totals are stored in BASE_CURRENCY (ETB, what
+Chapa settles in). ExchangeRate holds how much of each other currency one
+unit of the base buys. The scheduled `refresh_exchange_rates` task updates
+that table from EXCHANGE_RATES_URL, and each process keeps a copy of it in
+memory for EXCHANGE_RATE_CACHE_SECONDS, so converting a page of prices
+runs no query.
+
+Conversion is exact: amounts become integer minor units (cents), the rate
+becomes an integer fraction, and each result is rounded half up to the
+target currency's minor unit (CURRENCIES[code] decimal places). A page of
+amounts goes through NumPy in one pass when the products fit in int64,
+and through Python integers otherwise; both give identical results.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+
+from alx_travel_app.lazy import LazyModule
+
+from .models import ExchangeRate
+
+# Both are imported on first use: converting a price or refreshing rates
+np = LazyModule("numpy")
+requests = LazyModule("requests")
+
+INT64_MAX = 2 ** 63 - 1
+
+
+class RateUnavailable(APIException):
+    """No exchange rate is stored for the requested currency (-> 503)."""
+    status_code = 503
+    default_detail = "Prices in this currency are temporarily unavailable."
+    default_code = "rate_unavailable"
+
+
+# -------------------------
+# Rates, cached per process
+# -------------------------
+_rates = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_rates():
+    """{currency: Decimal rate} from the ExchangeRate table, at most EXCHANGE_RATE_CACHE_SECONDS old."""
+    global _rates, _loaded_at
+    if _rates is None or time.monotonic() - _loaded_at >= settings.EXCHANGE_RATE_CACHE_SECONDS:
+        with _lock:
+            if _rates is None or time.monotonic() - _loaded_at >= settings.EXCHANGE_RATE_CACHE_SECONDS:
+                rates = dict(ExchangeRate.objects.values_list("currency", "rate"))
+                rates[settings.BASE_CURRENCY] = Decimal(1)
+                _rates, _loaded_at = rates, time.monotonic()
+    return _rates
+
+
+def clear_cache():
+    global _rates
+    _rates = None
+
+
+def refresh_rates():
+    """Store the latest rates for CURRENCIES from EXCHANGE_RATES_URL. Returns how many were updated."""
+    url = settings.EXCHANGE_RATES_URL
+    if not url:
+        return 0
+    response = requests.get(url.format(base=settings.BASE_CURRENCY), timeout=settings.EXCHANGE_RATES_TIMEOUT)
+    response.raise_for_status()
+    # Parse as Decimal: a float would already have lost digits
+    published = response.json(parse_float=Decimal).get("rates", {})
+    now = timezone.now()
+    rates = [
+        ExchangeRate(currency=code, rate=Decimal(str(published[code])), updated_at=now)
+        for code in settings.CURRENCIES
+        if code != settings.BASE_CURRENCY and code in published
+    ]
+    ExchangeRate.objects.bulk_create(
+        rates, update_conflicts=True, unique_fields=["currency"], update_fields=["rate", "updated_at"]
+    )
+    clear_cache()
+    return len(rates)
+
+
+# -------------------------
+# Conversion
+# -------------------------
+def requested_currency(request, default=None):
+    """The ?currency= of `request`, upper-cased and checked; 400 when unsupported."""
+    code = request.query_params.get("currency")
+    if not code:
+        return default
+    code = code.upper()
+    if code not in settings.CURRENCIES:
+        raise ValidationError({"currency": [f"Supported currencies: {', '.join(settings.CURRENCIES)}."]})
+    return code
+
+
+def _scale(currency):
+    return 10 ** settings.CURRENCIES[currency]
+
+
+def _round_half_up_div(products, denominator):
+    """Each of `products` divided by `denominator`, rounded half up (values are >= 0)."""
+    if isinstance(products, np.ndarray):
+        quotients, remainders = np.divmod(products, np.int64(denominator))
+        return (quotients + (2 * remainders >= denominator)).tolist()
+    return [q + (2 * r >= denominator) for q, r in (divmod(p, denominator) for p in products)]
+
+
+def convert_amounts(amounts, currency):
+    """
+    Convert base-currency amounts (Decimals or decimal strings) to `currency`.
+    Returns Decimals with the currency's number of decimal places.
+    """
+    rate = get_rates().get(currency)
+    if rate is None:
+        raise RateUnavailable()
+    base_scale = _scale(settings.BASE_CURRENCY)
+    places = settings.CURRENCIES[currency]
+    # result_minor = round(amount_minor * rate * 10**places / base_scale)
+    rate_numerator, rate_denominator = rate.as_integer_ratio()
+    numerator = rate_numerator * _scale(currency)
+    denominator = rate_denominator * base_scale
+
+    minor = [int(Decimal(amount) * base_scale) for amount in amounts]
+    if not minor:
+        return []
+    largest = max(minor)
+    # 2 * remainder must fit too, hence the // 2
+    if largest * numerator <= INT64_MAX // 2 and denominator <= INT64_MAX // 2:
+        products = np.asarray(minor, dtype=np.int64) * np.int64(numerator)
+    else:
+        products = [value * numerator for value in minor]
+    return [Decimal(value).scaleb(-places) for value in _round_half_up_div(products, denominator)]
+
+
+def convert(amount, currency):
+    """A single base-currency amount in `currency`."""
+    return convert_amounts([amount], currency)[0]
+
+
+def convert_rows(rows, currency, field="price_per_night"):
+    """
+    Convert `field` in each serialized row (a dict) to `currency`, in one
+    pass over the page, and label the row with the currency.
+    """
+    priced = [row for row in rows if row.get(field) is not None]
+    converted = convert_amounts([row[field] for row in priced], currency)
+    for row, amount in zip(priced, converted):
+        # Same string form DRF gives Decimals
+        row[field] = str(amount)
+        row["currency"] = currency
+    return rows
@@ -8,6 +8,25 @@ class Role(models.TextChoices):
 
     
 class Status(models.TextChoices):
+    """Booking status. The values are what is stored in Booking.status."""
     PENDING = 'pending', 'Pending'
     CONFIRMED = 'confirmed', 'Confirmed'
-    CANCELED = 'canceled', 'Canceled'
+    CANCELLED = 'cancelled', 'Cancelled'
+    # Left pending for longer than BOOKING_PENDING_TTL_MINUTES (see expiry.py)
+    EXPIRED = 'expired', 'Expired'
+
+
+class PaymentStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+    # Checkout abandoned for longer than PAYMENT_PENDING_TTL_MINUTES
+    EXPIRED = 'expired', 'Expired'
+
+
+class PhotoStatus(models.TextChoices):
+    """ListingPhoto.status: renditions are generated in the worker."""
+    PENDING = 'pending', 'Pending'
+    READY = 'ready', 'Ready'
+    # Not a readable image
+    FAILED = 'failed', 'Failed'
@@ -0,0 +1,151 @@
+"""
+Payment status push (Server-Sent Events).
+
+Clients open GET /api/payments/<transaction_id>/events/ instead of polling
+the verify endpoint. Whenever a Payment's status changes (see signals.py)
+an event is published on the transaction's channel and every subscriber
+connected to this process receives it.
+
+Publishing happens in web requests and in Celery workers, while subscribers
+live in the ASGI web processes. With PAYMENT_EVENTS_REDIS_URL set, events go
+through Redis pub/sub and a listener thread in each web process fans them
+out locally; without it, only subscribers in the publishing process are
+notified (enough for a single-process setup and for tests).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL_PREFIX = "payments:"
+SUBSCRIBE_TIMEOUT = 5
+
+
+class EventHub:
+    """In-process pub/sub. Subscribers are asyncio queues bound to their event loop."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        return entry
+
+    def unsubscribe(self, channel, entry):
+        with self._lock:
+            self._subscribers[channel].discard(entry)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish_local(self, channel, message):
+        """Deliver to this process's subscribers; safe to call from any thread."""
+        with self._lock:
+            entries = list(self._subscribers.get(channel, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                pass
+
+
+hub = EventHub()
+
+_redis = None
+_listener_started = False
+_listener_lock = threading.Lock()
+# Set while the relay's psubscribe is acknowledged by Redis
+_subscribed = threading.Event()
+
+
+def _redis_client():
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(settings.PAYMENT_EVENTS_REDIS_URL)
+    return _redis
+
+
+def _relay(pubsub):
+    """Fan Redis messages out to local subscribers until the connection drops."""
+    for item in pubsub.listen():
+        if item["type"] == "psubscribe":
+            # Redis has registered the pattern: from here on nothing is missed
+            _subscribed.set()
+        elif item["type"] == "pmessage":
+            channel = item["channel"].decode()[len(REDIS_CHANNEL_PREFIX):]
+            hub.publish_local(channel, json.loads(item["data"]))
+
+
+def _listen_forever():
+    """Relay Redis messages to local subscribers, reconnecting after errors."""
+    while True:
+        try:
+            pubsub = _redis_client().pubsub()
+            pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+            _relay(pubsub)
+        except Exception as e:
+            logger.warning("Payment event listener lost Redis, retrying: %s", e)
+        _subscribed.clear()
+        time.sleep(1)
+
+
+def ensure_listener():
+    """Start the Redis relay thread in this process (once), if Redis is configured."""
+    global _listener_started
+    if not settings.PAYMENT_EVENTS_REDIS_URL or _listener_started:
+        return
+    with _listener_lock:
+        if not _listener_started:
+            threading.Thread(target=_listen_forever, name="payment-events", daemon=True).start()
+            _listener_started = True
+
+
+async def wait_for_listener():
+    """
+    Start the relay and wait until Redis acknowledges its subscription.
+
+    psubscribe only sends the request; an event published before Redis has
+    processed it is not delivered. A stream that subscribes and then reads
+    the current status must wait for the ack, or a change made in between
+    is lost. Gives up after SUBSCRIBE_TIMEOUT seconds (Redis down): the
+    stream still sends the status it reads from the database.
+    """
+    ensure_listener()
+    if not settings.PAYMENT_EVENTS_REDIS_URL or _subscribed.is_set():
+        return True
+    ready = await asyncio.to_thread(_subscribed.wait, SUBSCRIBE_TIMEOUT)
+    if not ready:
+        logger.warning("Payment event listener not subscribed after %ss", SUBSCRIBE_TIMEOUT)
+    return ready
+
+
+def payment_event(payment):
+    """The message sent to a payment's subscribers."""
+    return {
+        "transaction_id": payment.transaction_id,
+        "status": payment.status,
+        "booking": payment.booking_id,
+    }
+
+
+def publish(channel, message):
+    """Publish `message` (a JSON-able dict) to everyone subscribed to `channel`."""
+    if settings.PAYMENT_EVENTS_REDIS_URL:
+        try:
+            _redis_client().publish(REDIS_CHANNEL_PREFIX + channel, json.dumps(message))
+            return
+        except Exception as e:
+            logger.warning("Could not publish payment event to Redis: %s", e)
+    hub.publish_local(channel, message)
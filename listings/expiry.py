@@ -0,0 +1,147 @@
+"""
+Expire abandoned bookings and payments.
+
+A checkout that is never completed leaves a `pending` payment behind, and
+that blocks initiate_payment's duplicate check for the booking forever. The
+scheduled `expire_stale_records` task moves such rows to `expired`:
+
+- payments pending for longer than PAYMENT_PENDING_TTL_MINUTES that
+  Chapa confirms were not paid;
+- bookings pending for longer than BOOKING_PENDING_TTL_MINUTES that have
+  no pending or completed payment.
+
+Age alone doesn't prove a checkout was abandoned: the guest may have paid
+and the callback been lost. So stale payments are checked with Chapa first.
+Paid ones get a verify_payment_status task (which completes the payment and
+confirms the booking) instead of expiring. Ones Chapa couldn't be asked
+about stay pending until a later run.
+
+Work is done in batches of EXPIRY_BATCH_SIZE rows, each in its own short
+transaction, and rows locked by someone else are skipped, so the sweeper
+never holds locks for long or waits on a checkout in progress. Candidates
+are found through the partial indexes on pending rows (see models.py).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, ical
+from .enums import PaymentStatus, Status
+from .models import Booking, Payment
+from .services import verified_status, verify_concurrently
+from .tasks import verify_payment_status
+
+
+def _expire_batch(candidates, fields, batch_size, expired, in_transaction=None):
+    """
+    Expire up to `batch_size` of `candidates`; returns their `fields` values.
+    `in_transaction(rows)` runs before the batch commits.
+    """
+    with transaction.atomic():
+        rows = list(
+            candidates.select_for_update(skip_locked=True, of=("self",))
+            .order_by("created_at")
+            .values("pk", *fields)[:batch_size]
+        )
+        candidates.model.objects.filter(pk__in=[row["pk"] for row in rows]).update(status=expired)
+        if in_transaction and rows:
+            in_transaction(rows)
+    return rows
+
+
+def _sweep(candidates, fields, expired, on_batch=None, in_transaction=None):
+    """Run up to EXPIRY_MAX_BATCHES batches; the rest waits for the next run."""
+    batch_size = settings.EXPIRY_BATCH_SIZE
+    total = 0
+    for _ in range(settings.EXPIRY_MAX_BATCHES):
+        rows = _expire_batch(candidates, fields, batch_size, expired, in_transaction)
+        if on_batch:
+            on_batch(rows)
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def _publish_expired_payments(rows):
+    for row in rows:
+        if row["transaction_id"]:
+            events.publish(row["transaction_id"], {
+                "transaction_id": row["transaction_id"],
+                "status": PaymentStatus.EXPIRED.value,
+                "booking": row["booking_id"],
+            })
+
+
+def _bump_calendar_feeds(rows):
+    ical.bump_feed_versions(row["property_id"] for row in rows)
+
+
+def _unpaid_on_chapa(rows):
+    """
+    Split stale payment rows by what Chapa says about them. Returns
+    (pks of the unpaid ones, pks to leave pending for now). Paid ones are
+    handed to verify_payment_status.
+    """
+    responses = verify_concurrently([row["transaction_id"] for row in rows if row["transaction_id"]])
+    unpaid, keep = [], []
+    for row in rows:
+        tx_ref = row["transaction_id"]
+        if not tx_ref:
+            # Never reached Chapa
+            unpaid.append(row["pk"])
+            continue
+        response = responses.get(tx_ref)
+        if not response or response.get("status") != "success":
+            # Chapa unreachable or errored: ask again next run
+            keep.append(row["pk"])
+        elif verified_status(response)[0] == PaymentStatus.COMPLETED:
+            keep.append(row["pk"])
+            verify_payment_status.delay(tx_ref)
+        else:
+            unpaid.append(row["pk"])
+    return unpaid, keep
+
+
+def expire_stale_payments():
+    cutoff = timezone.now() - timedelta(minutes=settings.PAYMENT_PENDING_TTL_MINUTES)
+    candidates = Payment.objects.filter(status=PaymentStatus.PENDING, created_at__lt=cutoff)
+    batch_size = settings.EXPIRY_BATCH_SIZE
+    total = 0
+    kept = []
+    for _ in range(settings.EXPIRY_MAX_BATCHES):
+        # Chapa is asked outside any transaction, so no locks are held meanwhile
+        rows = list(
+            candidates.exclude(pk__in=kept).order_by("created_at")
+            .values("pk", "transaction_id")[:batch_size]
+        )
+        if not rows:
+            break
+        unpaid, keep = _unpaid_on_chapa(rows)
+        kept += keep
+        # Rows settled (or locked) since they were read are skipped here
+        expired = _expire_batch(candidates.filter(pk__in=unpaid), ("transaction_id", "booking_id"),
+                                batch_size, PaymentStatus.EXPIRED)
+        # update() skips the signal that tells clients about status changes
+        _publish_expired_payments(expired)
+        total += len(expired)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def expire_stale_bookings():
+    cutoff = timezone.now() - timedelta(minutes=settings.BOOKING_PENDING_TTL_MINUTES)
+    candidates = Booking.objects.filter(status=Status.PENDING, created_at__lt=cutoff).exclude(
+        payments__status__in=[PaymentStatus.PENDING, PaymentStatus.COMPLETED]
+    )
+    # Pending bookings don't count towards analytics, so no days get dirty,
+    # but they do hold dates in the listings' calendar feeds.
+    return _sweep(candidates, ("property_id",), Status.EXPIRED, in_transaction=_bump_calendar_feeds)
+
+
+def expire_stale_records():
+    """Expire payments first, so their bookings can expire in the same run."""
+    return {"payments": expire_stale_payments(), "bookings": expire_stale_bookings()}
@@ -0,0 +1,120 @@
+"""
+Read-only fast path for list and retrieve responses.
+
+Rendering through ModelSerializer builds a field tree per request and
+calls get_attribute()/to_representation() for every field of every row on
+fully built model instances. For plain reads we can skip all of that:
+a ReadPlan is compiled once per (serializer, ?fields=, ?expand=) from the
+serializer's own fields and then shapes rows fetched with values() into
+exactly the same output.
+
+Anything the plan can't reproduce field-for-field (method fields, many
+relations such as ?expand=photos, custom fields) makes plan_for() return
+None, and the view falls back to the serializer. The parity tests in
+tests.py compare both paths byte for byte.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .serializers import DynamicFieldsModelSerializer, parse_field_paths
+
+# Field classes whose to_representation() returns database values unchanged.
+# (Decimal, date and datetime fields do real formatting and keep it.)
+PASSTHROUGH_FIELDS = (
+    drf_fields.CharField,  # also Email/URL/Slug fields
+    drf_fields.ChoiceField,
+    drf_fields.IntegerField,
+    drf_fields.BooleanField,
+    drf_fields.FloatField,
+    drf_fields.JSONField,
+)
+FORMATTED_FIELDS = (drf_fields.DecimalField, drf_fields.DateField, drf_fields.DateTimeField)
+
+
+class ReadPlan:
+    """Columns to pass to values() and how to turn each row into output."""
+
+    def __init__(self, columns, steps):
+        self.columns = columns
+        # (output name, column, converter or None, nested steps or None)
+        self.steps = steps
+
+    def render(self, row):
+        return _render(self.steps, row)
+
+    def render_many(self, rows):
+        steps = self.steps
+        return [_render(steps, row) for row in rows]
+
+
+def _render(steps, row):
+    out = {}
+    for name, column, convert, nested in steps:
+        value = row[column]
+        if value is None:
+            out[name] = None
+        elif nested is not None:
+            out[name] = _render(nested, row)
+        elif convert is None:
+            out[name] = value
+        else:
+            out[name] = convert(value)
+    return out
+
+
+def _compile(serializer, prefix, columns):
+    """Return the steps for `serializer`, or None if it can't be reproduced."""
+    model_meta = serializer.Meta.model._meta
+    steps = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        try:
+            model_field = model_meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        column = prefix + model_field.name
+
+        if isinstance(field, DynamicFieldsModelSerializer):
+            # An expanded foreign key; a NULL key renders as None
+            nested = _compile(field, column + "__", columns)
+            if nested is None:
+                return None
+            columns.append(column)
+            steps.append((name, column, None, nested))
+        elif isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            # values() already gives the related id
+            columns.append(column)
+            steps.append((name, column, None, None))
+        elif isinstance(field, FORMATTED_FIELDS):
+            columns.append(column)
+            steps.append((name, column, field.to_representation, None))
+        elif isinstance(field, PASSTHROUGH_FIELDS) and not (model_field.is_relation or field.source == "*"):
+            columns.append(column)
+            steps.append((name, column, None, None))
+        else:
+            return None
+    return steps
+
+
+@lru_cache(maxsize=256)
+def _plan(serializer_class, fields_raw, expand_raw):
+    fields = parse_field_paths(fields_raw) or None
+    expand = parse_field_paths(expand_raw) or None
+    serializer = serializer_class(fields=fields or {}, expand=expand or {})
+    columns = []
+    steps = _compile(serializer, "", columns)
+    if steps is None:
+        return None
+    return ReadPlan(list(dict.fromkeys(columns)), steps)
+
+
+def plan_for(serializer_class, request):
+    """The compiled plan for this request, or None to use the serializer."""
+    if not issubclass(serializer_class, DynamicFieldsModelSerializer):
+        return None
+    params = request.query_params
+    return _plan(serializer_class, params.get("fields", ""), serializer_class.expand_param(request))
@@ -0,0 +1,283 @@
+"""
+iCalendar (RFC 5545) sync of listing availability.
+
+Export: each listing has a feed of its pending and confirmed bookings that
+external calendars poll. The feed URL carries a secret token, an HMAC of
+the listing id, which only the host is given (it can be checked without
+a query, and without it the URL is a 404). A version token per listing
+(CalendarVersion) is replaced in the same transaction as any change to
+its bookings (signals, or the bulk paths that skip them). It is the feed's
+ETag, and the time it was replaced its Last-Modified, so a poll of an
+unchanged feed is answered with a 304 after one primary-key lookup. It is
+kept in the database rather than the cache so that every process agrees
+on it: with a per-process cache, processes that missed a change would
+keep answering 304.
+
+Import: CalendarFeed rows point at external feeds. `sync_calendar_feeds()`
+(scheduled) fetches them with the validators from the last fetch, diffs
+the events against the feed's ExternalBlock rows by UID, and writes only
+the difference with one bulk_create, one bulk_update and one delete per
+feed.
+
+Only the parts of iCalendar that availability needs are handled: VEVENTs
+with UID, DTSTART, DTEND (one day when missing), SUMMARY and STATUS.
+All-day and date-time values are both reduced to dates.
+"""
+import logging
+import uuid
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from alx_travel_app.lazy import LazyModule
+
+from .enums import Status
+from .models import Booking, CalendarFeed, CalendarVersion, ExternalBlock
+
+logger = logging.getLogger(__name__)
+
+# Only the import side needs it; Booking signals import this module everywhere
+requests = LazyModule("requests")
+
+PRODID = "-//ALX Travel App//Listing Availability//EN"
+UID_DOMAIN = "alx-travel-app"
+
+# Bookings that hold dates, and so appear in the exported feed
+BLOCKING_STATUSES = (Status.PENDING, Status.CONFIRMED)
+
+
+# -------------------------
+# Feed URL tokens
+# -------------------------
+def feed_token(listing_id):
+    """The secret part of the listing's feed URL."""
+    return salted_hmac("listings.ical.feed", str(listing_id), algorithm="sha256").hexdigest()[:32]
+
+
+def valid_feed_token(listing_id, token):
+    return constant_time_compare(feed_token(listing_id), token)
+
+
+# -------------------------
+# Feed versions (ETag / Last-Modified)
+# -------------------------
+def _new_version(listing_id):
+    return CalendarVersion(listing_id=listing_id, etag=uuid.uuid4().hex, modified_at=timezone.now().replace(microsecond=0))
+
+
+def feed_version(listing_id):
+    """(etag, last_modified) of the listing's feed."""
+    versions = CalendarVersion.objects.filter(listing_id=listing_id).values_list("etag", "modified_at")
+    version = versions.first()
+    if version is None:
+        # Never built (or not since versions moved to the database): start
+        # one, which costs every poller one full download.
+        CalendarVersion.objects.bulk_create([_new_version(listing_id)], ignore_conflicts=True)
+        version = versions.first()
+    return version
+
+
+def bump_feed_versions(listing_ids):
+    """Mark the feeds of `listing_ids` as changed. Call in the transaction that makes the change."""
+    CalendarVersion.objects.bulk_create(
+        [_new_version(listing_id) for listing_id in set(listing_ids)],
+        update_conflicts=True, unique_fields=["listing_id"], update_fields=["etag", "modified_at"],
+    )
+
+
+# -------------------------
+# Writing
+# -------------------------
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Split content lines longer than 75 octets, as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts)
+
+
+def render_calendar(listing_id, name, stamp):
+    """The listing's feed: one all-day VEVENT per booking that holds dates."""
+    dtstamp = stamp.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    bookings = (
+        # Not hot(): a long stay that started months ago still holds its dates
+        Booking.objects.filter(property_id=listing_id, status__in=BLOCKING_STATUSES, end_date__gte=timezone.now().date())
+        .order_by("start_date", "id")
+        .values_list("id", "start_date", "end_date", "status")
+    )
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for booking_id, start_date, end_date, booking_status in bookings:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:booking-{booking_id}@{UID_DOMAIN}",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;VALUE=DATE:{start_date:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{end_date:%Y%m%d}",
+            "SUMMARY:Booked",
+            f"STATUS:{'CONFIRMED' if booking_status == Status.CONFIRMED else 'TENTATIVE'}",
+            "TRANSP:OPAQUE",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+# -------------------------
+# Reading
+# -------------------------
+def _unfold(text):
+    lines = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+
+def _unescape(text):
+    out, chars = [], iter(text)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            out.append("\n" if char in ("n", "N") else char)
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def _parse_date(value, is_end=False):
+    """A DATE or DATE-TIME value as a date; an end that falls mid-day blocks that day too."""
+    value = value.strip()
+    day = date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    if is_end and len(value) > 8 and value[9:15].strip("0"):
+        day += timedelta(days=1)
+    return day
+
+
+def parse_calendar(text):
+    """
+    Return {uid: (start_date, end_date, summary)} for the events in `text`.
+    Cancelled events and events without a valid start are skipped.
+    """
+    events = {}
+    event = None
+    for line in _unfold(text):
+        name, _, value = line.partition(":")
+        name = name.partition(";")[0].upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            try:
+                start = _parse_date(event["DTSTART"])
+                end = _parse_date(event["DTEND"], is_end=True) if "DTEND" in event else start + timedelta(days=1)
+            except (KeyError, ValueError):
+                event = None
+                continue
+            if event.get("STATUS", "").upper() != "CANCELLED":
+                uid = _unescape(event.get("UID", "")) or f"{start:%Y%m%d}-{end:%Y%m%d}"
+                events[uid[:255]] = (start, max(end, start + timedelta(days=1)), _unescape(event.get("SUMMARY", ""))[:255])
+            event = None
+        elif event is not None:
+            event[name] = value
+    return events
+
+
+# -------------------------
+# Importing
+# -------------------------
+def apply_events(feed, events):
+    """Make the feed's ExternalBlock rows match `events`; returns (created, updated, deleted)."""
+    existing = {
+        uid: (pk, start_date, end_date, summary)
+        for pk, uid, start_date, end_date, summary in ExternalBlock.objects.filter(feed=feed)
+        .values_list("pk", "uid", "start_date", "end_date", "summary")
+    }
+    to_create, to_update = [], []
+    for uid, values in events.items():
+        current = existing.get(uid)
+        if current is None:
+            to_create.append(ExternalBlock(feed=feed, listing_id=feed.listing_id, uid=uid,
+                                           start_date=values[0], end_date=values[1], summary=values[2]))
+        elif current[1:] != values:
+            to_update.append(ExternalBlock(pk=current[0], start_date=values[0], end_date=values[1], summary=values[2]))
+    to_delete = [pk for uid, (pk, *_) in existing.items() if uid not in events]
+
+    with transaction.atomic():
+        ExternalBlock.objects.bulk_create(to_create, batch_size=500)
+        ExternalBlock.objects.bulk_update(to_update, ["start_date", "end_date", "summary"], batch_size=500)
+        ExternalBlock.objects.filter(pk__in=to_delete).delete()
+    return len(to_create), len(to_update), len(to_delete)
+
+
+def import_feed(feed, session=None):
+    """
+    Fetch one feed and apply its changes. Returns (created, updated,
+    deleted), all zero when the feed is unchanged or couldn't be read;
+    existing blocks are kept when a fetch fails.
+    """
+    session = session or requests.Session()
+    headers = {}
+    if feed.etag:
+        headers["If-None-Match"] = feed.etag
+    if feed.last_modified:
+        headers["If-Modified-Since"] = feed.last_modified
+
+    feed.last_synced_at = timezone.now()
+    changes = (0, 0, 0)
+    try:
+        response = session.get(feed.url, headers=headers, timeout=settings.CALENDAR_FETCH_TIMEOUT)
+        if response.status_code != 304:
+            response.raise_for_status()
+            if len(response.content) > settings.CALENDAR_MAX_BYTES:
+                raise ValueError(f"feed is larger than {settings.CALENDAR_MAX_BYTES} bytes")
+            changes = apply_events(feed, parse_calendar(response.content.decode("utf-8", "replace")))
+            feed.etag = response.headers.get("ETag", "")[:255]
+            feed.last_modified = response.headers.get("Last-Modified", "")[:64]
+        feed.last_error = ""
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning("Calendar feed %s failed: %s", feed.pk, e, extra={"url": feed.url})
+        feed.last_error = str(e)[:500]
+    feed.save(update_fields=["etag", "last_modified", "last_synced_at", "last_error"])
+    return changes
+
+
+def sync_calendar_feeds(batch_size=100):
+    """Import every feed, least recently synced first. Returns totals."""
+    totals = {"feeds": 0, "created": 0, "updated": 0, "deleted": 0}
+    with requests.Session() as session:
+        feeds = CalendarFeed.objects.order_by(F("last_synced_at").asc(nulls_first=True), "id")
+        for feed in feeds.iterator(chunk_size=batch_size):
+            created, updated, deleted = import_feed(feed, session)
+            totals["feeds"] += 1
+            totals["created"] += created
+            totals["updated"] += updated
+            totals["deleted"] += deleted
+    return totals
+
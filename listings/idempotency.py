@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for POST endpoints that clients retry.
+
+The first request with a given key runs normally and its response is kept
+in the cache for IDEMPOTENCY_TTL seconds. Repeats with the same key get the
+stored response back without running the view again (no DB writes, no
+Chapa calls). A repeat that arrives while the first request is still
+running waits briefly for it to finish and then replays its result, so
+concurrent duplicates collapse into one execution.
+
+Keys are scoped per endpoint and per client, and tied to a fingerprint of
+the request body so a key can't be reused for a different payload.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http.request import RawPostDataException
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+HEADER = "Idempotency-Key"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+def _cache_key(scope, request, key):
+    if request.user and request.user.is_authenticated:
+        client = f"user:{request.user.pk}"
+    else:
+        client = f"ip:{BaseThrottle().get_ident(request)}"
+    digest = hashlib.sha256(f"{scope}|{client}|{key}".encode()).hexdigest()
+    return f"idempotency:{digest}"
+
+
+def _fingerprint(request):
+    try:
+        body = request.body
+    except RawPostDataException:
+        # The body stream was already consumed; fall back to the parsed data.
+        body = repr(request.data).encode()
+    return hashlib.sha256(request.get_full_path().encode() + b"|" + body).hexdigest()
+
+
+def _replay(entry):
+    response = Response(entry["data"], status=entry["status"], headers=entry["headers"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope):
+    """
+    Decorator for DRF views (function views or viewset methods).
+
+        @api_view(["POST"])
+        @idempotent("initiate-payment")
+        def initiate_payment(request, booking_id): ...
+
+    Requests without an Idempotency-Key header are not affected.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            # Works for both view(request, ...) and method(self, request, ...)
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_func(*args, **kwargs)
+            if len(key) > 255:
+                return Response(
+                    {"error": f"{HEADER} must be at most 255 characters."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            cache_key = _cache_key(scope, request, key)
+            fingerprint = _fingerprint(request)
+
+            # cache.add is atomic: exactly one request wins the key.
+            in_flight = {"state": IN_FLIGHT, "fingerprint": fingerprint}
+            if not cache.add(cache_key, in_flight, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return _wait_for_first(cache_key, fingerprint)
+
+            try:
+                response = view_func(*args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+
+            if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                # Let the client retry failures for real.
+                cache.delete(cache_key)
+            else:
+                headers = {
+                    name: response[name] for name in ("Location", "Retry-After") if name in response
+                }
+                cache.set(cache_key, {
+                    "state": DONE,
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "data": response.data,
+                    "headers": headers,
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def _wait_for_first(cache_key, fingerprint):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    while True:
+        entry = cache.get(cache_key)
+        if entry is not None and entry["fingerprint"] != fingerprint:
+            return Response(
+                {"error": f"{HEADER} was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if entry is None or entry["state"] == DONE or time.monotonic() >= deadline:
+            break
+        time.sleep(0.05)
+
+    if entry is not None and entry["state"] == DONE:
+        return _replay(entry)
+    # Still running (or the first attempt failed and released the key).
+    return Response(
+        {"error": "A request with this Idempotency-Key is still being processed."},
+        status=status.HTTP_409_CONFLICT,
+        headers={"Retry-After": "1"},
+    )
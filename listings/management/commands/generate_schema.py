@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from alx_travel_app.schema import FORMATS, artifact_path, generate_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema files served by /swagger.json and /swagger.yaml"
+
+    def handle(self, *args, **kwargs):
+        for fmt in FORMATS:
+            path = artifact_path(fmt)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(generate_schema(fmt))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from alx_travel_app.startup import BOOT, by_package, parse_importtime, run_boot
+
+
+class Command(BaseCommand):
+    help = "Show which packages a web or worker process spends its import time on at start-up"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--role", choices=sorted(BOOT), default="web")
+        parser.add_argument("--limit", type=int, default=25, help="How many packages to list")
+
+    def handle(self, *args, role, limit, **kwargs):
+        modules = parse_importtime(run_boot(role, importtime=True).stderr)
+        total = sum(self_us for _, self_us, _ in modules)
+        self.stdout.write(f"{role}: {len(modules)} modules imported in {total / 1000:.0f} ms")
+        for package, self_us in by_package(modules)[:limit]:
+            self.stdout.write(f"{self_us / 1000:8.1f} ms  {package}")
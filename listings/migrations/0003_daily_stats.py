@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_bookings_dirty(apps, schema_editor):
+    """Queue every existing booking so the first refresh backfills the rollups."""
+    Booking = apps.get_model('listings', 'Booking')
+    StatsDirtyRange = apps.get_model('listings', 'StatsDirtyRange')
+    StatsDirtyRange.objects.bulk_create(
+        (
+            StatsDirtyRange(listing_id=listing_id, start_date=start_date, end_date=end_date)
+            for listing_id, start_date, end_date in Booking.objects.values_list(
+                'property_id', 'start_date', 'end_date'
+            ).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0002_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsDirtyRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_id', models.BigIntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ListingDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nights_booked', models.PositiveSmallIntegerField(default=0)),
+                ('bookings_started', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['host', 'date'], name='daily_stats_host_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'date'), name='unique_listing_daily_stats')],
+            },
+        ),
+        migrations.RunPython(mark_existing_bookings_dirty, migrations.RunPython.noop),
+    ]
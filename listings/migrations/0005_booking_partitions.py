@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from listings.partitioning import DEFAULT_PARTITION, TABLE, ensure_booking_partitions, is_partitioned
+
+UNPARTITIONED = f"{TABLE}_unpartitioned"
+
+FOREIGN_KEYS = [
+    ("property_id", "listings_listing"),
+    ("user_id", "listings_customuser"),
+]
+
+
+def _add_relations(schema_editor, table):
+    for column, target in FOREIGN_KEYS:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {TABLE}_{column}_fk FOREIGN KEY ({column}) "
+            f"REFERENCES {target} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_{column}_idx ON {table} ({column})")
+
+
+def partition_bookings(apps, schema_editor):
+    """
+    Rebuild listings_booking as a table partitioned by start_date month.
+
+    Postgres requires the primary key of a partitioned table to include the
+    partition key, so it becomes (id, start_date); id keeps its own sequence
+    and stays unique in practice. Nothing else references the table at the
+    database level (see Payment.booking).
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(start_date) FROM {TABLE}")
+        first = cursor.fetchone()[0]
+
+    execute(f"ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED}")
+    execute(f"CREATE TABLE {TABLE} (LIKE {UNPARTITIONED}) PARTITION BY RANGE (start_date)")
+    execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_id_start_date_pk PRIMARY KEY (id, start_date)")
+    _add_relations(schema_editor, TABLE)
+    execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+    ensure_booking_partitions(start=first, connection=connection)
+
+    execute(f"INSERT INTO {TABLE} SELECT * FROM {UNPARTITIONED}")
+    execute(f"DROP TABLE {UNPARTITIONED}")
+    # Identity columns on partitioned tables need Postgres 17, so use a
+    # plain sequence owned by the column.
+    execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    execute(f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)")
+
+
+def unpartition_bookings(apps, schema_editor):
+    connection = schema_editor.connection
+    if not is_partitioned(connection):
+        return
+    execute = schema_editor.execute
+
+    execute(f"CREATE TABLE {UNPARTITIONED} (LIKE {TABLE})")
+    execute(f"INSERT INTO {UNPARTITIONED} SELECT * FROM {TABLE}")
+    execute(f"DROP TABLE {TABLE}")
+    execute(f"ALTER TABLE {UNPARTITIONED} RENAME TO {TABLE}")
+    execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)"
+    )
+    _add_relations(schema_editor, TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_listing_photo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='booking',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='listings.booking'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='listings.listing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['property', 'start_date'], name='listings_ar_propert_1345d0_idx')],
+            },
+        ),
+        migrations.RunPython(partition_bookings, unpartition_bookings),
+    ]
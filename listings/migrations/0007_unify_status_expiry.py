@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+# Old spellings -> the values in listings.enums.Status
+LEGACY_BOOKING_STATUSES = {
+    'PENDING': 'pending',
+    'CONFIRMED': 'confirmed',
+    'CANCELLED': 'cancelled',
+    'canceled': 'cancelled',
+}
+
+
+def unify_booking_statuses(apps, schema_editor):
+    for model_name in ('Booking', 'ArchivedBooking'):
+        model = apps.get_model('listings', model_name)
+        for old, new in LEGACY_BOOKING_STATUSES.items():
+            model.objects.filter(status=old).update(status=new)
+
+
+def restore_booking_statuses(apps, schema_editor):
+    for model_name in ('Booking', 'ArchivedBooking'):
+        model = apps.get_model('listings', model_name)
+        model.objects.filter(status='expired').update(status='cancelled')
+        model.objects.update(status=Upper('status'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(unify_booking_statuses, restore_booking_statuses),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='booking_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['property', 'start_date'], name='booking_confirmed_property_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='payment_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'completed'])), fields=['booking'], name='payment_active_booking_idx'),
+        ),
+    ]
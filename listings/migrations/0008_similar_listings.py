@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_listings_dirty(apps, schema_editor):
+    """Queue every existing listing so the first refresh builds all recommendations."""
+    Listing = apps.get_model('listings', 'Listing')
+    SimilarityDirtyListing = apps.get_model('listings', 'SimilarityDirtyListing')
+    SimilarityDirtyListing.objects.bulk_create(
+        (
+            SimilarityDirtyListing(listing_id=listing_id)
+            for listing_id in Listing.objects.values_list('id', flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_unify_status_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityDirtyListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_listings', to='listings.listing')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'rank'), name='unique_similar_listing_rank')],
+            },
+        ),
+        migrations.RunPython(mark_existing_listings_dirty, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_similar_listings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=1000)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=500)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feeds', to='listings.listing')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExternalBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(max_length=255)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('summary', models.CharField(blank=True, max_length=255)),
+                ('feed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='listings.calendarfeed')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='external_blocks', to='listings.listing')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='calendarfeed',
+            constraint=models.UniqueConstraint(fields=('listing', 'url'), name='unique_listing_calendar_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='externalblock',
+            index=models.Index(fields=['listing', 'start_date'], name='listings_ex_listing_23025c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='externalblock',
+            constraint=models.UniqueConstraint(fields=('feed', 'uid'), name='unique_external_block_uid'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_exchange_rates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-start_date', '-id'], include=('property', 'end_date', 'total_price', 'status', 'created_at'), name='booking_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', '-start_date', '-id'], include=('user', 'end_date', 'total_price', 'status', 'created_at'), name='booking_property_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-id'], include=('property', 'rating'), name='review_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def expire_duplicate_pending_payments(apps, schema_editor):
+    # Payments let through by the old racy check: keep the newest pending
+    # payment of each booking, the others were abandoned checkouts.
+    Payment = apps.get_model('listings', 'Payment')
+    duplicated = (
+        Payment.objects.filter(status='pending')
+        .values('booking_id').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('booking_id', flat=True)
+    )
+    for booking_id in list(duplicated):
+        pending = Payment.objects.filter(booking_id=booking_id, status='pending').order_by('-created_at', '-id')
+        Payment.objects.filter(pk__in=list(pending.values_list('pk', flat=True)[1:])).update(status='expired')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(expire_duplicate_pending_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('booking',), name='payment_one_pending_per_booking'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PAYMENT_FIELDS = (
+    'id', 'booking_id', 'amount', 'currency', 'base_amount', 'transaction_id', 'chapa_reference',
+    'status', 'created_at', 'updated_at', 'chapa_response',
+)
+
+
+def move_orphaned_payments(apps, schema_editor):
+    # Earlier archive runs left payments behind, pointing at archived bookings
+    Payment = apps.get_model('listings', 'Payment')
+    ArchivedBooking = apps.get_model('listings', 'ArchivedBooking')
+    ArchivedPayment = apps.get_model('listings', 'ArchivedPayment')
+    orphaned = Payment.objects.filter(booking_id__in=ArchivedBooking.objects.values('id'))
+    rows = list(orphaned.values(*PAYMENT_FIELDS))
+    ArchivedPayment.objects.bulk_create([ArchivedPayment(**row) for row in rows], batch_size=1000)
+    # Historical models have no signal receivers, so this deletes nothing else
+    Payment.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_one_pending_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(max_length=3)),
+                ('base_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('transaction_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('chapa_reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('expired', 'Expired')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('chapa_response', models.JSONField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='listings.archivedbooking')),
+            ],
+        ),
+        migrations.RunPython(move_orphaned_payments, migrations.RunPython.noop),
+    ]
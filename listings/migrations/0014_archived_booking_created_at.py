@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_archived_payments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
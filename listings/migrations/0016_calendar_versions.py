@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0015_autocomplete_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarVersion',
+            fields=[
+                ('listing_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('etag', models.CharField(max_length=32)),
+                ('modified_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .enums import PaymentStatus, PhotoStatus, Status
+
 
 # -------------------------
 # Custom User
@@ -34,20 +36,85 @@ class Listing(models.Model):
         return f"{self.name} - {self.location}"
 
 
+# -------------------------
+# Listing photos (renditions generated by listings.photos)
+# -------------------------
+class ListingPhoto(models.Model):
+    STATUS_CHOICES = PhotoStatus.choices
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="photos")
+    # Stored under its content hash, so identical uploads share one file
+    original = models.ImageField(upload_to="listings/photos/", max_length=255)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # {"webp": {"320": "<storage name>", ...}, "jpeg": {...}}
+    renditions = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PhotoStatus.PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Photo {self.id} of listing {self.listing_id}"
+
+
 # -------------------------
 # Booking (when a user books a property)
 # -------------------------
+class BookingQuerySet(models.QuerySet):
+    def hot(self):
+        """
+        Bookings starting on or after the first day of the month
+        BOOKING_HOT_MONTHS ago. On Postgres the table is partitioned by
+        start_date month (see listings.partitioning), so this filter lets
+        the planner skip every older partition.
+        """
+        from .partitioning import hot_cutoff
+
+        return self.filter(start_date__gte=hot_cutoff())
+
+
 class Booking(models.Model):
     property = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="bookings")
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="bookings")
     start_date = models.DateField()
     end_date = models.DateField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
-    status = models.CharField(
-        max_length=20,
-        choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled')],
-        default='PENDING'
-    )
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "start_date"]),
+            # Partial indexes only hold the few rows still in play, so they
+            # stay small however many finished bookings pile up.
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status=Status.PENDING),
+                name="booking_pending_created_idx",
+            ),
+            models.Index(
+                fields=["property", "start_date"],
+                condition=models.Q(status=Status.CONFIRMED),
+                name="booking_confirmed_property_idx",
+            ),
+            # /api/me/ history pages: one range scan per page, and on
+            # Postgres the INCLUDEd columns make it an index-only scan.
+            models.Index(
+                fields=["user", "-start_date", "-id"],
+                include=["property", "end_date", "total_price", "status", "created_at"],
+                name="booking_user_history_idx",
+            ),
+            models.Index(
+                fields=["property", "-start_date", "-id"],
+                include=["user", "end_date", "total_price", "status", "created_at"],
+                name="booking_property_history_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Booking {self.id} - {self.property.name}"
@@ -61,6 +128,29 @@ class Booking(models.Model):
                 raise ValueError("Start date cannot be in the past")
 
 
+# -------------------------
+# Archived booking (cold storage, filled by listings.archive)
+# -------------------------
+class ArchivedBooking(models.Model):
+    """A finished booking moved out of the Booking table. Keeps its original id."""
+    id = models.BigIntegerField(primary_key=True)
+    property = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="archived_bookings")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="archived_bookings")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+    # The booking's own created_at; null for rows archived before it was kept
+    created_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["property", "start_date"])]
+
+    def __str__(self):
+        return f"Archived booking {self.id}"
+
+
 # -------------------------
 # Review (user feedback on a listing)
 # -------------------------
@@ -70,6 +160,12 @@ class Review(models.Model):
     rating = models.IntegerField()  # keep simple, no validators for now
     comment = models.TextField()
 
+    class Meta:
+        indexes = [
+            # /api/me/reviews/, newest first
+            models.Index(fields=["user", "-id"], include=["property", "rating"], name="review_user_history_idx"),
+        ]
+
     def __str__(self):
         return f"Review by {self.user.username} - {self.rating}/5"
 
@@ -79,19 +175,22 @@ class Review(models.Model):
 # -------------------------
 class Payment(models.Model):
     # Status choices help us maintain data integrity by limiting what values are valid
-    STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('completed', 'Completed'),
-        ('failed', 'Failed'),
-    ]
+    STATUS_CHOICES = PaymentStatus.choices
     
     # The booking this payment is associated with
     # We use ForeignKey because one booking has one payment, but we might query payments by booking
-    booking = models.ForeignKey('Booking', on_delete=models.CASCADE, related_name='payments')
+    # No database-level constraint: a partitioned Booking table can't be the
+    # target of one (its key includes start_date). When a booking is archived
+    # its payments move to ArchivedPayment with it.
+    booking = models.ForeignKey('Booking', on_delete=models.CASCADE, related_name='payments', db_constraint=False)
     
     # Financial information
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='ETB')  # Ethiopian Birr is Chapa's primary currency
+    # The booking total in settings.BASE_CURRENCY that `amount` was converted
+    # from, so revenue can be added up across currencies. Empty on payments
+    # made before multi-currency, which were all in the base currency.
+    base_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     # Transaction tracking
     # This is the unique identifier Chapa gives us to track this specific payment
@@ -101,7 +200,7 @@ class Payment(models.Model):
     chapa_reference = models.CharField(max_length=255, unique=True, null=True, blank=True)
     
     # Current status of the payment
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PaymentStatus.PENDING)
     
     # Timestamps help us track when things happened and debug issues
     created_at = models.DateTimeField(auto_now_add=True)
@@ -112,6 +211,215 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Back the admin's default ordering and its status/date filters
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["status", "created_at"]),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status=PaymentStatus.PENDING),
+                name="payment_pending_created_idx",
+            ),
+            # initiate_payment's duplicate check
+            models.Index(
+                fields=["booking"],
+                condition=models.Q(status__in=[PaymentStatus.PENDING, PaymentStatus.COMPLETED]),
+                name="payment_active_booking_idx",
+            ),
+        ]
+        constraints = [
+            # Two initiate_payment requests can both pass the duplicate check;
+            # only one of them gets to save its payment.
+            models.UniqueConstraint(
+                fields=["booking"],
+                condition=models.Q(status=PaymentStatus.PENDING),
+                name="payment_one_pending_per_booking",
+            ),
+        ]
     
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.status}"
+
+
+class ArchivedPayment(models.Model):
+    """A payment of an archived booking, moved out of Payment with it. Keeps its original id."""
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.ForeignKey(ArchivedBooking, on_delete=models.CASCADE, related_name="payments")
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    base_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    transaction_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    chapa_reference = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=PaymentStatus.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    chapa_response = models.JSONField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived payment {self.transaction_id}"
+
+
+
+# -------------------------
+# Daily analytics rollups (maintained by listings.analytics)
+# -------------------------
+class ListingDailyStats(models.Model):
+    """
+    One row per listing per day with activity, so host analytics never
+    have to scan Booking and Payment. `host` is copied from the listing so a
+    host's dashboard is a single range scan on (host, date).
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="daily_stats")
+    host = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+    nights_booked = models.PositiveSmallIntegerField(default=0)
+    bookings_started = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "date"], name="unique_listing_daily_stats"),
+        ]
+        indexes = [models.Index(fields=["host", "date"], name="daily_stats_host_date_idx")]
+
+    def __str__(self):
+        return f"Stats {self.listing_id} @ {self.date}"
+
+
+class StatsDirtyRange(models.Model):
+    """
+    Days whose rollups need recomputing. Written by signals whenever a
+    booking or payment changes and consumed by the refresh task.
+    listing_id is a plain column (no FK) so deleting a listing never trips
+    over pending dirty rows.
+    """
+    listing_id = models.BigIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()  # exclusive, like Booking.end_date
+
+    def __str__(self):
+        return f"Dirty {self.listing_id}: {self.start_date} - {self.end_date}"
+
+
+# -------------------------
+# Similar listings (precomputed by listings.similarity)
+# -------------------------
+class SimilarListing(models.Model):
+    """
+    The top-K most similar listings for each listing, by TF-IDF cosine
+    similarity of name, description and location. The unique (listing,
+    rank) index serves the similar-listings endpoint in one lookup.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="similar_listings")
+    similar = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "rank"], name="unique_similar_listing_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class SimilarityDirtyListing(models.Model):
+    """
+    Listings whose text changed (or that were deleted) since the last
+    similarity refresh. Plain listing_id column, like StatsDirtyRange.
+    """
+    listing_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Similarity dirty {self.listing_id}"
+
+
+class AutocompleteChange(models.Model):
+    """
+    A listing whose name, location or availability changed (or that was
+    deleted). Each web process reads the recent rows to patch its in-memory
+    autocomplete index (see listings.autocomplete), so the log is shared
+    however the cache is configured. Plain listing_id column, like
+    StatsDirtyRange; old rows are pruned.
+    """
+    listing_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Autocomplete change {self.listing_id}"
+
+
+# -------------------------
+# Calendar sync (external iCal feeds, imported by listings.ical)
+# -------------------------
+class CalendarVersion(models.Model):
+    """
+    The version of a listing's exported feed: its ETag, and Last-Modified.
+    Replaced in the same transaction as any change to the listing's
+    bookings, so every process serves the same version. Plain listing_id
+    primary key (no FK), like StatsDirtyRange, because bookings deleted in
+    a listing's cascade still bump it.
+    """
+    listing_id = models.BigIntegerField(primary_key=True)
+    etag = models.CharField(max_length=32)
+    modified_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Calendar version of listing {self.listing_id}"
+
+
+class CalendarFeed(models.Model):
+    """
+    An external calendar (Airbnb, Booking.com, Google...) whose events
+    block dates on a listing. etag / last_modified are the validators from
+    the last fetch, sent back so an unchanged feed costs a 304.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="calendar_feeds")
+    url = models.URLField(max_length=1000)
+    name = models.CharField(max_length=100, blank=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=500, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "url"], name="unique_listing_calendar_feed"),
+        ]
+
+    def __str__(self):
+        return self.name or self.url
+
+
+class ExternalBlock(models.Model):
+    """Dates blocked by one event of a CalendarFeed; end_date is exclusive, as in iCal."""
+    feed = models.ForeignKey(CalendarFeed, on_delete=models.CASCADE, related_name="blocks")
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="external_blocks")
+    uid = models.CharField(max_length=255)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    summary = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["feed", "uid"], name="unique_external_block_uid"),
+        ]
+        indexes = [models.Index(fields=["listing", "start_date"])]
+
+    def __str__(self):
+        return f"{self.listing_id}: {self.start_date} - {self.end_date}"
+
+
+# -------------------------
+# Exchange rates (refreshed by listings.currency)
+# -------------------------
+class ExchangeRate(models.Model):
+    """Units of `currency` that one unit of settings.BASE_CURRENCY buys."""
+    currency = models.CharField(max_length=3, unique=True)
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"1 base = {self.rate} {self.currency}"
@@ -0,0 +1,132 @@
+"""
+Keyset ("seek") pagination.
+
+Page N of PageNumberPagination is an OFFSET: the database reads and throws
+away every row before it, and a COUNT(*) runs on every page. KeysetPagination
+instead remembers the sort key of the last row it returned and asks for
+rows after it:
+
+    WHERE start_date <= :d AND (start_date < :d OR (start_date = :d AND id < :id))
+    ORDER BY start_date DESC, id DESC LIMIT :size + 1
+
+The leading `start_date <= :d` is implied by the rest, but planners can't
+use an OR as an index range bound; with it the scan starts at the cursor
+instead of at the top of the index.
+
+With an index that starts with the filtered column and continues with the
+sort key, e.g. (user, start_date, id), every page is one index range scan,
+however deep the client pages. The trade-off: no page numbers and no total
+count, only a `next` link.
+
+Views set `keyset_ordering`. It must end in a unique field (usually id) so
+that the position is unambiguous. Rows may be model instances or values()
+dicts (the fast read path).
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    ordering = ("-id",)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request, model, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            if not isinstance(position, list) or len(position) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(fields, position)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def after(ordering, position):
+        """Q for rows that sort after `position` in `ordering`."""
+        condition = Q()
+        equal = {}
+        for key, value in zip(ordering, position):
+            name = key.lstrip("-")
+            lookup = "lt" if key.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        if len(ordering) > 1:
+            # Redundant, but a bound on the leading key the index can seek to
+            key, value = ordering[0], position[0]
+            condition &= Q(**{f"{key.lstrip('-')}__{'lte' if key.startswith('-') else 'gte'}": value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        fields = [key.lstrip("-") for key in ordering]
+        size = self.get_page_size(request)
+
+        selected = queryset.query.values_select
+        if selected:
+            # values() rows (fast path) need the sort key even if ?fields= left it out
+            missing = [name for name in fields if name not in selected]
+            if missing:
+                queryset = queryset.values(*selected, *missing)
+
+        position = self.decode_cursor(request, queryset.model, fields)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        rows = list(queryset[:size + 1])
+        self.next_position = None
+        if len(rows) > size:
+            rows = rows[:size]
+            last = rows[-1]
+            self.next_position = [
+                last[name] if isinstance(last, dict) else getattr(last, name) for name in fields
+            ]
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        # Dates and datetimes go out in ISO form; to_python() reads them back
+        position = [value.isoformat() if hasattr(value, "isoformat") else value for value in self.next_position]
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param,
+                                   self.encode_cursor(position))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
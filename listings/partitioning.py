@@ -0,0 +1,124 @@
+"""
+Monthly partitions for the Booking table (Postgres only).
+
+Migration 0005 turns listings_booking into a table partitioned by RANGE
+(start_date), one partition per month plus a DEFAULT partition that
+catches anything outside them. Queries that filter on start_date, such as
+Booking.objects.hot(), only scan the partitions they need.
+
+`ensure_booking_partitions()` runs daily (maintain_booking_partitions task)
+to create the coming months ahead of time; `drop_empty_booking_partitions()`
+removes old partitions once the archive job has emptied them. On other
+databases (SQLite in development) all of this is a no-op and Booking is a
+plain table.
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+TABLE = "listings_booking"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_FORMAT = f"{TABLE}_y%Ym%m"
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def hot_cutoff():
+    """First day of the month BOOKING_HOT_MONTHS before the current one."""
+    return add_months(month_start(timezone.now().date()), -settings.BOOKING_HOT_MONTHS)
+
+
+def is_partitioned(connection=None):
+    connection = connection or default_connection
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def _existing_partitions(cursor):
+    """{month: partition name} for the monthly partitions that exist."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+        [TABLE],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        if name != DEFAULT_PARTITION:
+            partitions[datetime.strptime(name, PARTITION_FORMAT).date()] = name
+    return partitions
+
+
+def ensure_booking_partitions(start=None, months_ahead=None, connection=None):
+    """
+    Create monthly partitions from `start` (default: the hot cutoff) up to
+    `months_ahead` months from now. Rows that already landed in the default
+    partition for a new month are moved into it. Returns the names created.
+    """
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    if months_ahead is None:
+        months_ahead = settings.BOOKING_PARTITION_MONTHS_AHEAD
+    month = month_start(start or hot_cutoff())
+    last = add_months(month_start(timezone.now().date()), months_ahead)
+
+    quote = connection.ops.quote_name
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        existing = _existing_partitions(cursor)
+        while month <= last:
+            if month not in existing:
+                name = month.strftime(PARTITION_FORMAT)
+                bounds = [month, add_months(month, 1)]
+                # ATTACH refuses while the default partition still holds rows
+                # for this month, so move them across first.
+                cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)")
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+                    f"WHERE start_date >= %s AND start_date < %s RETURNING *) "
+                    f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                    bounds,
+                )
+                cursor.execute(
+                    f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} "
+                    f"FOR VALUES FROM ('{bounds[0]:%Y-%m-%d}') TO ('{bounds[1]:%Y-%m-%d}')"
+                )
+                created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+def drop_empty_booking_partitions(before, connection=None):
+    """Drop monthly partitions that end on or before `before` and hold no rows."""
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    quote = connection.ops.quote_name
+    dropped = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for month, name in sorted(_existing_partitions(cursor).items()):
+            if add_months(month, 1) > before:
+                break
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(name)})")
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+                dropped.append(name)
+    return dropped
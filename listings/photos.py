@@ -0,0 +1,124 @@
+"""
+Listing photo storage and rendition generation.
+
+Uploads are written to a temporary file by Django's upload handler (never
+held in memory whole), checked by Pillow to really be an image, hashed
+while being copied to storage in chunks, and stored as
+listings/photos/<sha256>.<ext>, the extension coming from the detected
+format (never from the client's filename). A Celery task then builds
+resized WebP and JPEG renditions named <sha256>-<width>w.<ext>, so the
+files can be cached forever and re-running the task is harmless.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from alx_travel_app.lazy import LazyModule
+
+from .enums import PhotoStatus
+from .models import ListingPhoto
+
+# Imported on the first upload or rendition, not by every web process
+Image = LazyModule("PIL.Image")
+ImageOps = LazyModule("PIL.ImageOps")
+
+PHOTO_DIR = "listings/photos"
+
+# rendition key -> (Pillow format, file extension)
+RENDITION_FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg")}
+
+# Pillow format -> file extension of accepted originals
+UPLOAD_FORMATS = {**dict(RENDITION_FORMATS.values()), "PNG": "png"}
+
+# EXIF orientations 5-8 are rotated by 90 degrees
+ORIENTATION_TAG = 0x0112
+
+
+def _hash_file(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _image_extension(upload):
+    """Extension for the upload's real format; ValueError if it isn't an accepted image."""
+    try:
+        # Reads the header and checks the file's structure without decoding pixels
+        image = Image.open(upload)
+        fmt = image.format
+        image.verify()
+    except Exception:
+        raise ValueError("Upload is not a valid image.") from None
+    finally:
+        upload.seek(0)
+    if fmt not in UPLOAD_FORMATS:
+        raise ValueError(f"Images must be one of: {', '.join(UPLOAD_FORMATS)}.")
+    return UPLOAD_FORMATS[fmt]
+
+
+def store_upload(listing, upload):
+    """
+    Save an uploaded image for `listing` under its content hash.
+    Raises ValueError if the upload is not a JPEG, PNG or WebP image.
+    """
+    ext = _image_extension(upload)
+    content_hash = _hash_file(upload)
+    name = f"{PHOTO_DIR}/{content_hash}.{ext}"
+    if not default_storage.exists(name):
+        # Storage backends copy the file chunk by chunk.
+        name = default_storage.save(name, upload)
+    return ListingPhoto.objects.create(listing=listing, original=name, content_hash=content_hash)
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=settings.LISTING_PHOTO_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, fmt, quality=settings.LISTING_PHOTO_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def generate_renditions(photo):
+    """
+    Build every configured width in every format and record them on `photo`.
+    Widths larger than the original are skipped (we never upscale), but the
+    smallest width is always produced.
+    """
+    with photo.original.open("rb") as source:
+        image = Image.open(source)
+        width, height = image.size
+        if image.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+            width, height = height, width
+        photo.width, photo.height = width, height
+
+        # For JPEGs, let the decoder skip detail we are going to throw away.
+        image.draft("RGB", (max(settings.LISTING_PHOTO_WIDTHS),) * 2)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    widths = sorted(settings.LISTING_PHOTO_WIDTHS)
+    widths = [w for w in widths if w <= image.width] or widths[:1]
+
+    renditions = {key: {} for key in RENDITION_FORMATS}
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for key, (fmt, ext) in RENDITION_FORMATS.items():
+            name = f"{PHOTO_DIR}/{photo.content_hash}-{width}w.{ext}"
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(_encode(resized, fmt)))
+            renditions[key][str(width)] = name
+
+    photo.renditions = renditions
+    photo.status = PhotoStatus.READY
+    photo.save(update_fields=["width", "height", "renditions", "status"])
+    return photo
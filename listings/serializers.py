@@ -1,32 +1,251 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from rest_framework import serializers
-from .models import CustomUser, Listing, Booking, Review
+from rest_framework.permissions import SAFE_METHODS
+
+from alx_travel_app import tracing
+from .models import CustomUser, Listing, ListingPhoto, Booking, Review, SimilarListing
+
+
+def parse_field_paths(raw):
+    """
+    Turn a query value like "id,host.username,host.email" into a tree:
+    {"id": {}, "host": {"username": {}, "email": {}}}
+    Dotted paths let clients reach into expanded (nested) serializers.
+    """
+    tree = {}
+    for path in (raw or "").split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class TracedListSerializer(serializers.ListSerializer):
+    """ListSerializer whose rendering shows up as a span in sampled traces."""
+
+    @property
+    def data(self):
+        if not tracing.recording():
+            return super().data
+        with tracing.span(f"serialize {type(self.child).__name__}", many=True) as span:
+            data = super().data
+            span.set(rows=len(data))
+            return data
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that supports sparse fieldsets and on-demand expansion.
+
+    - ?fields=id,name           -> only return these fields
+    - ?expand=host              -> replace the `host` id with the nested object
+    - ?expand=property.host     -> expansion can go several levels deep
+
+    Expandable relations are declared on Meta:
+        expandable_fields = {"host": UserSerializer}
+
+    Meta.default_expand (same syntax as ?expand=) keeps the nested shape
+    the API has always returned when the client doesn't ask for one;
+    `?expand=` with no value returns plain ids.
+
+    Only read requests (GET/HEAD/OPTIONS) are shaped this way, so writes
+    always see the full set of writable fields.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Only the top-level serializer reads the query string. Nested
+        # serializers receive their part of the tree from their parent.
+        if fields is None and expand is None:
+            fields, expand = self.requested_paths(self.context.get("request"))
+
+        for name, sub_expand in (expand or {}).items():
+            expandable = getattr(self.Meta, "expandable_fields", {}).get(name)
+            if expandable is None:
+                continue
+            # Either a serializer class, or (class, extra kwargs) e.g. many=True
+            serializer_class, options = expandable if isinstance(expandable, tuple) else (expandable, {})
+            self.fields[name] = serializer_class(
+                read_only=True,
+                fields=(fields or {}).get(name) or None,
+                # A dict, even empty, so the child doesn't fall back to its defaults
+                expand=sub_expand,
+                **options,
+            )
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        # Leave custom Meta.list_serializer_class alone
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = TracedListSerializer
+        return serializer
+
+    @property
+    def data(self):
+        if not tracing.recording():
+            return super().data
+        with tracing.span(f"serialize {type(self).__name__}"):
+            return super().data
+
+    @classmethod
+    def expand_param(cls, request):
+        """The raw ?expand= value, or Meta.default_expand if the client sent none."""
+        params = request.query_params if request is not None else {}
+        if "expand" in params:
+            return params["expand"]
+        return getattr(cls.Meta, "default_expand", "")
+
+    @classmethod
+    def requested_paths(cls, request):
+        """Return the (fields, expand) trees requested by a read request."""
+        if request is not None and request.method not in SAFE_METHODS:
+            return None, None
+        fields = request.query_params.get("fields") if request is not None else None
+        return (
+            parse_field_paths(fields) or None,
+            parse_field_paths(cls.expand_param(request)) or None,
+        )
+
+    def select_paths(self, prefix=""):
+        """
+        Work out which columns and relations are needed to render this serializer.
+
+        Returns (only, related, prefetch) lists ready for queryset.only(),
+        select_related() and prefetch_related(). `only` is None when a field
+        can't be mapped to a model column (e.g. a SerializerMethodField), in
+        which case we have to load every column to be safe.
+        """
+        model_meta = self.Meta.model._meta
+        only, related, prefetch = [], [], []
+        for field in self.fields.values():
+            try:
+                model_field = model_meta.get_field(field.source.split(".")[0])
+            except FieldDoesNotExist:
+                only = None
+                continue
+
+            path = prefix + model_field.name
+            if model_field.many_to_many or model_field.one_to_many:
+                # Expanded reverse/many relations are fetched in one extra query.
+                child = getattr(field, "child", None)
+                if isinstance(child, DynamicFieldsModelSerializer):
+                    prefetch.append(path)
+                    _, sub_related, sub_prefetch = child.select_paths(prefix=path + "__")
+                    prefetch += sub_related + sub_prefetch
+                continue
+
+            if only is not None:
+                only.append(path)
+            if isinstance(field, DynamicFieldsModelSerializer):
+                related.append(path)
+                sub_only, sub_related, sub_prefetch = field.select_paths(prefix=path + "__")
+                related += sub_related
+                prefetch += sub_prefetch
+                if only is not None and sub_only is not None:
+                    only += sub_only
+                else:
+                    only = None
+        return only, related, prefetch
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """Narrow `queryset` to the columns and joins this request will render."""
+        fields, expand = cls.requested_paths(request)
+        only, related, prefetch = cls(fields=fields or {}, expand=expand or {}).select_paths()
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if only and fields:
+            queryset = queryset.only(*only)
+        return queryset
+
 
 # host details
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = CustomUser
         fields = ["id", "username", "email", "phone_number"]
 
 
-class ListingSerializer(serializers.ModelSerializer):
-    host = UserSerializer(read_only=True)
+class ListingPhotoSerializer(DynamicFieldsModelSerializer):
+    """
+    Photo with its resized versions, so clients can pick the size they show:
+    - renditions: {"webp": {"320": url, ...}, "jpeg": {...}}
+    - srcset: {"webp": "url 320w, url 640w", ...} ready for <img srcset>
+    """
+    renditions = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
+    class Meta:
+        model = ListingPhoto
+        fields = ["id", "listing", "original", "width", "height", "status", "renditions", "srcset", "created_at"]
+        read_only_fields = fields
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_renditions(self, photo):
+        return {
+            fmt: {width: self._url(name) for width, name in sizes.items()}
+            for fmt, sizes in photo.renditions.items()
+        }
+
+    def get_srcset(self, photo):
+        return {
+            fmt: ", ".join(f"{self._url(name)} {width}w" for width, name in sizes.items())
+            for fmt, sizes in photo.renditions.items()
+        }
+
+
+class ListingSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Listing
-        fields = "__all__"  
+        fields = "__all__"
         # or list explicitly:
         # fields = ["id", "host", "name", "description", "location", "price_per_night", "created_at"]
+        # The host is the user creating the listing (see ListingsViewSet)
+        read_only_fields = ["host"]
+        expandable_fields = {
+            "host": UserSerializer,
+            "photos": (ListingPhotoSerializer, {"many": True}),
+        }
+        default_expand = "host"
+
+
+class SimilarListingSerializer(serializers.ModelSerializer):
+    listing = ListingSerializer(source="similar", read_only=True)
+
+    class Meta:
+        model = SimilarListing
+        fields = ["rank", "score", "listing"]
 
 
-class BookingSerializer(serializers.ModelSerializer):
-    # property = ListingSerializer(read_only=True)
-    # user = UserSerializer(read_only=True)
+class BookingSerializer(DynamicFieldsModelSerializer):
+    # Plain ids by default; use ?expand=property,user to embed the related objects.
 
     class Meta:
         model = Booking
         fields = "__all__"
         # You could also exclude auto fields like created_at if you don’t need them
         # exclude = ["created_at"]
+        expandable_fields = {"property": ListingSerializer, "user": UserSerializer}
 
     def validate(self, data):
         """
@@ -38,15 +257,59 @@ class BookingSerializer(serializers.ModelSerializer):
 
         return data
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for Review model.
     - Shows which property and user the review is for
-    - Makes the API response more informative
+    - Makes the API response more informative (?expand= narrows it)
     """
-    property = ListingSerializer(read_only=True)
-    user = UserSerializer(read_only=True)
-    
+
     class Meta:
         model = Review
         fields = "__all__"
+        # The author is the user posting the review (see ReviewViewSet)
+        read_only_fields = ["user"]
+        expandable_fields = {"property": ListingSerializer, "user": UserSerializer}
+        default_expand = "property.host,user"
+
+
+class QuoteQuerySerializer(serializers.Serializer):
+    """Validates the query string of the listing quote endpoint."""
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, data):
+        if data["end"] <= data["start"]:
+            raise serializers.ValidationError("End date must be after start date.")
+        if (data["end"] - data["start"]).days > 365:
+            raise serializers.ValidationError("A stay cannot be longer than a year.")
+        return data
+
+
+class HostAnalyticsQuerySerializer(serializers.Serializer):
+    """Validates the query string of the host analytics endpoint."""
+    granularity = serializers.ChoiceField(choices=["day", "month"], default="day")
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    listing = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        end = data.get("end") or timezone.now().date()
+        start = data.get("start") or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError("start must be on or before end.")
+        if (end - start).days > 366 * 3:
+            raise serializers.ValidationError("Date range cannot exceed three years.")
+        data["start"], data["end"] = start, end
+        return data
+
+
+class PaymentBatchVerifySerializer(serializers.Serializer):
+    """Body of the batch verify endpoint: {"transaction_ids": [...]}."""
+    transaction_ids = serializers.ListField(child=serializers.CharField(max_length=255), allow_empty=False)
+
+    def validate_transaction_ids(self, value):
+        limit = settings.PAYMENT_BATCH_VERIFY_MAX
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} transactions per request.")
+        return value
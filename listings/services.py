@@ -1,7 +1,25 @@
-import requests
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
 import uuid
 
+from alx_travel_app.lazy import LazyModule
+
+from . import events, ical
+from .analytics import mark_dirty_many
+from .enums import PaymentStatus, Status
+from .models import Booking, Payment
+from .throttling import check_outbound
+
+logger = logging.getLogger(__name__)
+
+# The HTTP stack is only imported by processes that actually call Chapa
+requests = LazyModule("requests")
+
 class ChapaService:
     """
     This service class encapsulates all Chapa API interactions.
@@ -17,7 +35,7 @@ class ChapaService:
             'Content-Type': 'application/json'
         }
     
-    def initialize_payment(self, amount, email, first_name, last_name, tx_ref, callback_url, return_url):
+    def initialize_payment(self, amount, email, first_name, last_name, tx_ref, callback_url, return_url, currency=None):
         """
         Initialize a payment with Chapa.
         
@@ -26,13 +44,15 @@ class ChapaService:
         
         Chapa needs to know where to send the user after payment (return_url) and
         where to send the payment result (callback_url).
+
+        `amount` is in `currency` (default settings.BASE_CURRENCY).
         """
         
         url = f"{self.BASE_URL}/transaction/initialize"
         
         payload = {
             "amount": str(amount),
-            "currency": "ETB",
+            "currency": currency or settings.BASE_CURRENCY,
             "email": email,
             "first_name": "Abdellah",
             "last_name": "Hadid",
@@ -45,14 +65,17 @@ class ChapaService:
                 "description": "Payment for your booking"
             }
         }
+        # Shed load before calling Chapa when our global quota is spent
+        check_outbound()
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = requests.post(url, json=payload, headers=self.headers, timeout=settings.CHAPA_TIMEOUT)
             response.raise_for_status()  # Raises an exception for 4xx/5xx status codes
             return response.json()
         except requests.exceptions.RequestException as e:
-            # Log the error in production, you'd use proper logging
-            print(f"Error initializing payment: {str(e)}")
-            print("Response text:", response.text)
+            logger.error(
+                "Error initializing payment: %s", e,
+                extra={"tx_ref": tx_ref, "response_text": getattr(e.response, "text", None)},
+            )
             return None
     
     def verify_payment(self, tx_ref):
@@ -65,11 +88,136 @@ class ChapaService:
         
         url = f"{self.BASE_URL}/transaction/verify/{tx_ref}"
         
+        check_outbound()
         try:
-            response = requests.get(url, headers=self.headers)
+            response = requests.get(url, headers=self.headers, timeout=settings.CHAPA_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error verifying payment: {str(e)}")
-            print("Response text:", response.text)
-            return None
\ No newline at end of file
+            logger.error(
+                "Error verifying payment: %s", e,
+                extra={"tx_ref": tx_ref, "response_text": getattr(e.response, "text", None)},
+            )
+            return None
+
+
+def apply_verification(payment, verification_response):
+    """
+    Record a successful Chapa verify response on `payment`.
+
+    Marks the payment completed (and confirms its booking) or failed, saves
+    the raw response and returns a message for the client. Saving the status
+    change also notifies anyone subscribed to the payment's events.
+    """
+    payment.status, message = verified_status(verification_response)
+    if payment.status == PaymentStatus.COMPLETED:
+        payment.booking.status = Status.CONFIRMED
+        payment.booking.save()
+
+    # Update stored response and save
+    payment.chapa_response = verification_response
+    payment.save()
+    return message
+
+
+def verified_status(verification_response):
+    """The (payment status, client message) a successful verify response leads to."""
+    if verification_response.get('data', {}).get('status') == 'success':
+        return PaymentStatus.COMPLETED, "Payment verified and booking confirmed."
+    return PaymentStatus.FAILED, "Payment verification returned as failed."
+
+
+def verify_concurrently(transaction_ids):
+    """Ask Chapa about each transaction, CHAPA_VERIFY_CONCURRENCY at a time."""
+    if not transaction_ids:
+        return {}
+    chapa_service = ChapaService()
+
+    def verify(tx_ref):
+        try:
+            return chapa_service.verify_payment(tx_ref)
+        except Throttled:
+            # Global outbound budget spent: report it like any failed call
+            return None
+
+    workers = min(settings.CHAPA_VERIFY_CONCURRENCY, len(transaction_ids))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chapa-verify") as pool:
+        # copy_context() keeps the request id on log lines from the workers
+        responses = pool.map(lambda tx_ref: contextvars.copy_context().run(verify, tx_ref), transaction_ids)
+        return dict(zip(transaction_ids, responses))
+
+
+def verify_payments(transaction_ids):
+    """
+    Verify many payments at once. Returns one result per transaction id, in
+    the order given (duplicates dropped).
+
+    All payments are loaded in one query; those already completed, failed
+    or expired are reported as they are, and the pending ones are verified
+    with Chapa in parallel. The changes are then written with one
+    bulk_update (plus one update for the confirmed bookings). bulk_update
+    skips the model signals, so the analytics days are marked dirty, the
+    calendar feeds bumped and the status events published here instead.
+    """
+    transaction_ids = list(dict.fromkeys(transaction_ids))
+    payments = {
+        payment.transaction_id: payment
+        for payment in Payment.objects.filter(transaction_id__in=transaction_ids)
+    }
+    pending = [tx_ref for tx_ref, payment in payments.items() if payment.status == PaymentStatus.PENDING]
+    responses = verify_concurrently(pending)
+
+    results = {}
+    verified = []
+    for tx_ref in transaction_ids:
+        payment = payments.get(tx_ref)
+        if payment is None:
+            results[tx_ref] = {"transaction_id": tx_ref, "error": "Payment not found."}
+        elif tx_ref not in responses:
+            results[tx_ref] = {"transaction_id": tx_ref, "status": payment.status}
+        elif not responses[tx_ref]:
+            results[tx_ref] = {"transaction_id": tx_ref, "status": payment.status, "error": "Failed to verify payment."}
+        elif responses[tx_ref].get('status') != 'success':
+            results[tx_ref] = {"transaction_id": tx_ref, "status": payment.status, "error": "Payment verification failed."}
+        else:
+            verified.append(payment)
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Chapa calls took a while: leave alone anything that was settled
+        # meanwhile (e.g. by the callback task).
+        still_pending = set(
+            Payment.objects.select_for_update()
+            .filter(pk__in=[payment.pk for payment in verified], status=PaymentStatus.PENDING)
+            .values_list("pk", flat=True)
+        )
+        changed = []
+        for payment in verified:
+            if payment.pk not in still_pending:
+                results[payment.transaction_id] = {
+                    "transaction_id": payment.transaction_id,
+                    "error": "Payment was updated by another request; verify it again.",
+                }
+                continue
+            payment.status, message = verified_status(responses[payment.transaction_id])
+            payment.chapa_response = responses[payment.transaction_id]
+            payment.updated_at = now
+            changed.append(payment)
+            results[payment.transaction_id] = {
+                "transaction_id": payment.transaction_id, "status": payment.status, "message": message,
+            }
+
+        Payment.objects.bulk_update(changed, ["status", "chapa_response", "updated_at"])
+        confirmed = [payment.booking_id for payment in changed if payment.status == PaymentStatus.COMPLETED]
+        Booking.objects.filter(pk__in=confirmed).update(status=Status.CONFIRMED)
+        ranges = list(
+            Booking.objects.filter(pk__in=[payment.booking_id for payment in changed])
+            .values_list("property_id", "start_date", "end_date")
+        )
+        mark_dirty_many(ranges)
+        ical.bump_feed_versions(listing_id for listing_id, _, _ in ranges)
+        for payment in changed:
+            message = events.payment_event(payment)
+            transaction.on_commit(lambda tx_ref=payment.transaction_id, msg=message: events.publish(tx_ref, msg))
+
+    return [results[tx_ref] for tx_ref in transaction_ids]
@@ -0,0 +1,116 @@
+"""
+Model signal handlers for the listings app.
+
+Connected in ListingsConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import autocomplete, events, ical
+from .analytics import mark_dirty
+from .models import Booking, Listing, Payment, SimilarityDirtyListing, SimilarListing
+
+
+# -------------------------
+# Analytics rollups: mark the days a change touches as dirty
+# (and the listing's iCal feed as changed)
+# -------------------------
+@receiver(post_init, sender=Booking)
+def remember_booking_dates(sender, instance, **kwargs):
+    # Keep the values loaded from the DB so a date change also refreshes
+    # the days the booking used to cover. Read __dict__: touching a field
+    # deferred by only() would reload the row, and run this again.
+    values = tuple(instance.__dict__.get(field) for field in ("property_id", "start_date", "end_date"))
+    instance._rollup_original = values if None not in values else None
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    original = getattr(instance, "_rollup_original", None)
+    current = (instance.property_id, instance.start_date, instance.end_date)
+    listing_ids = {instance.property_id}
+    if original and original != current and not created:
+        mark_dirty(*original)
+        listing_ids.add(original[0])
+    mark_dirty(*current)
+    instance._rollup_original = current
+    ical.bump_feed_versions(listing_ids)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    mark_dirty(instance.property_id, instance.start_date, instance.end_date)
+    ical.bump_feed_versions([instance.property_id])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    booking = (
+        Booking.objects.filter(pk=instance.booking_id)
+        .values_list("property_id", "start_date", "end_date")
+        .first()
+    )
+    if booking:
+        mark_dirty(*booking)
+
+
+# -------------------------
+# Payment events: push status changes to subscribed clients
+# -------------------------
+@receiver(post_init, sender=Payment)
+def remember_payment_status(sender, instance, **kwargs):
+    instance._original_status = instance.__dict__.get("status")
+
+
+@receiver(post_save, sender=Payment)
+def publish_payment_status(sender, instance, created, **kwargs):
+    if created or not instance.transaction_id or instance.status == instance._original_status:
+        return
+    instance._original_status = instance.status
+    message = events.payment_event(instance)
+    # Only announce what has actually been committed
+    transaction.on_commit(lambda: events.publish(instance.transaction_id, message))
+
+
+# -------------------------
+# Listing text: queue similar-listing refreshes, invalidate autocomplete
+# -------------------------
+SIMILARITY_FIELDS = ("name", "description", "location")
+AUTOCOMPLETE_FIELDS = ("name", "location", "is_available")
+TRACKED_LISTING_FIELDS = SIMILARITY_FIELDS + ("is_available",)
+
+
+def _listing_values(instance):
+    # __dict__ so deferred fields (from only()) aren't loaded just to compare
+    return {field: instance.__dict__.get(field) for field in TRACKED_LISTING_FIELDS}
+
+
+@receiver(post_init, sender=Listing)
+def remember_listing_text(sender, instance, **kwargs):
+    instance._tracked_original = _listing_values(instance)
+
+
+@receiver(post_save, sender=Listing)
+def listing_saved(sender, instance, created, **kwargs):
+    current = _listing_values(instance)
+    changed = {field for field, value in current.items() if value != instance._tracked_original[field]}
+    if created or changed & set(SIMILARITY_FIELDS):
+        SimilarityDirtyListing.objects.create(listing_id=instance.pk)
+    if created or changed & set(AUTOCOMPLETE_FIELDS):
+        transaction.on_commit(lambda: autocomplete.mark_changed([instance.pk]))
+    instance._tracked_original = current
+
+
+@receiver(pre_delete, sender=Listing)
+def listing_deleted(sender, instance, **kwargs):
+    # The cascade removes the rows pointing at this listing, so queue the
+    # listings that recommended it while we can still find them.
+    pointing = SimilarListing.objects.filter(similar_id=instance.pk).values_list("listing_id", flat=True)
+    SimilarityDirtyListing.objects.bulk_create(
+        [SimilarityDirtyListing(listing_id=listing_id) for listing_id in pointing]
+    )
+    # Bound now: the delete resets instance.pk before the commit
+    listing_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.mark_changed([listing_id]))
@@ -0,0 +1,266 @@
+"""
+Precomputed "similar listings" recommendations.
+
+Listings are turned into TF-IDF vectors (name, description and location
+tokens; location tokens are kept apart so "Miami" in a description doesn't
+count as being in Miami) held in a SciPy sparse matrix with unit-length
+rows, so a sparse matrix product gives cosine similarities. The top
+SIMILAR_LISTINGS_K neighbours of each listing are stored in SimilarListing,
+which the endpoint reads with a single indexed lookup.
+
+`refresh_similar_listings()` (scheduled) only recomputes what a change can
+affect: the listings marked dirty by signals, plus any listing that had a
+dirty listing among its neighbours or that now scores higher against one
+than its current last neighbour. The fitted vocabulary and IDF weights are
+kept in memory (TfidfModel), so a refresh only vectorises the dirty
+listings. `rebuild_similar_listings()` refits and recomputes everything once
+a day to undo the drift; a process whose model is older than that refits
+on its next refresh.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from .models import Listing, SimilarityDirtyListing, SimilarListing
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to "
+    "was were will with you your our we".split()
+)
+
+# Repeating a field's tokens weights it more heavily in the vector.
+NAME_WEIGHT, DESCRIPTION_WEIGHT, LOCATION_WEIGHT = 2, 1, 2
+
+
+def _terms(name, description, location):
+    counts = Counter()
+    for text, weight, prefix in (
+        (name, NAME_WEIGHT, ""),
+        (description, DESCRIPTION_WEIGHT, ""),
+        (location, LOCATION_WEIGHT, "loc:"),
+    ):
+        for token in TOKEN_RE.findall((text or "").lower()):
+            if token in STOP_WORDS or len(token) < 2:
+                continue
+            counts[prefix + token] += weight
+    return counts
+
+
+def _vectorize(rows, vocabulary, grow):
+    """
+    rows: iterable of (id, name, description, location).
+    Returns (ids array, CSR of sublinear term frequencies). Terms missing from
+    `vocabulary` are added to it when `grow`, otherwise dropped.
+    """
+    ids, indptr, indices, data = [], [0], [], []
+    for listing_id, name, description, location in rows:
+        ids.append(listing_id)
+        for term, count in _terms(name, description, location).items():
+            column = vocabulary.setdefault(term, len(vocabulary)) if grow else vocabulary.get(term)
+            if column is None:
+                continue
+            indices.append(column)
+            # Sublinear term frequency: the 10th "beach" adds little
+            data.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+
+    counts = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+        shape=(len(ids), len(vocabulary)),
+    )
+    return np.asarray(ids, dtype=np.int64), counts
+
+
+def _weigh(counts, idf):
+    """Apply the IDF weights and scale every non-empty row to unit length."""
+    if counts.shape[0] == 0:
+        return counts
+    matrix = counts @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+class TfidfModel:
+    """
+    The vocabulary and IDF weights fitted on every listing, and the vectors
+    of those listings.
+
+    `update()` vectorises only the listings that changed, against the fitted
+    weights, so a refresh never re-reads or re-tokenises the whole table.
+    Terms first seen after the fit are ignored and IDF weights go stale as
+    listings change, until the next fit (see SIMILAR_LISTINGS_REFIT_SECONDS).
+    """
+
+    def __init__(self, rows):
+        self.vocabulary = {}
+        ids, counts = _vectorize(rows, self.vocabulary, grow=True)
+        document_frequency = np.bincount(counts.indices, minlength=len(self.vocabulary))
+        self.idf = (np.log((1 + len(ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.ids = ids
+        self.matrix = _weigh(counts, self.idf)
+        self.fitted_at = time.monotonic()
+
+    def transform(self, rows):
+        """(ids array, unit-length TF-IDF rows) for `rows`, using the fitted weights."""
+        ids, counts = _vectorize(rows, self.vocabulary, grow=False)
+        return ids, _weigh(counts, self.idf)
+
+    def update(self, rows, removed_ids=()):
+        """Replace the vectors of the listings in `rows` and drop `removed_ids`."""
+        new_ids, new_matrix = self.transform(rows)
+        replaced = np.concatenate([new_ids, np.fromiter(removed_ids, dtype=np.int64)])
+        keep = ~np.isin(self.ids, replaced)
+        self.ids = np.concatenate([self.ids[keep], new_ids])
+        self.matrix = sparse.vstack([self.matrix[keep], new_matrix], format="csr")
+
+
+def build_matrix(rows):
+    """
+    rows: iterable of (id, name, description, location).
+    Returns (ids array, CSR matrix with one L2-normalised TF-IDF row per id).
+    """
+    model = TfidfModel(rows)
+    return model.ids, model.matrix
+
+
+def _top_k(matrix, rows, k, batch_size):
+    """Yield (row, neighbour rows, scores) for each row index in `rows`, best first."""
+    transposed = matrix.T
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        products = (matrix[batch] @ transposed).tocsr()
+        for offset, row in enumerate(batch):
+            begin, end = products.indptr[offset], products.indptr[offset + 1]
+            neighbours = products.indices[begin:end]
+            scores = products.data[begin:end]
+            keep = neighbours != row
+            neighbours, scores = neighbours[keep], scores[keep]
+            if len(scores) > k:
+                best = np.argpartition(-scores, k)[:k]
+                neighbours, scores = neighbours[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            yield row, neighbours[order], scores[order]
+
+
+def _store(ids, matrix, rows, k, batch_size):
+    """Replace the stored neighbours of `rows`, one transaction per batch."""
+    results = _top_k(matrix, rows, k, batch_size)
+    while True:
+        chunk = [item for _, item in zip(range(batch_size), results)]
+        if not chunk:
+            return
+        with transaction.atomic():
+            SimilarListing.objects.filter(listing_id__in=[int(ids[row]) for row, _, _ in chunk]).delete()
+            SimilarListing.objects.bulk_create([
+                SimilarListing(
+                    listing_id=int(ids[row]), similar_id=int(ids[neighbour]), rank=rank, score=float(score)
+                )
+                for row, neighbours, scores in chunk
+                for rank, (neighbour, score) in enumerate(zip(neighbours, scores), start=1)
+            ])
+
+
+# The model fitted by the last full pass in this process
+_model = None
+
+LISTING_TEXT = ("id", "name", "description", "location")
+
+
+def _fit():
+    global _model
+    _model = TfidfModel(Listing.objects.order_by("id").values_list(*LISTING_TEXT).iterator())
+    return _model
+
+
+def _updated_model(dirty_ids):
+    """
+    The cached model with the `dirty_ids` listings re-vectorised, or a fresh
+    fit when there is none yet or it is older than SIMILAR_LISTINGS_REFIT_SECONDS.
+    Also picks up listings created or deleted without a dirty mark (bulk
+    operations skip signals); their ids are added to `dirty_ids`.
+    """
+    model = _model
+    if model is None or time.monotonic() - model.fitted_at > settings.SIMILAR_LISTINGS_REFIT_SECONDS:
+        return _fit()
+    live = set(Listing.objects.values_list("id", flat=True))
+    known = set(model.ids.tolist())
+    removed = known - live
+    dirty_ids |= removed | (live - known)
+    model.update(
+        Listing.objects.filter(id__in=dirty_ids & live).order_by("id").values_list(*LISTING_TEXT).iterator(),
+        removed,
+    )
+    return model
+
+
+def _affected_rows(ids, matrix, dirty_ids, k):
+    """Rows whose top-K list may change because the `dirty_ids` listings changed."""
+    position = {int(listing_id): row for row, listing_id in enumerate(ids)}
+    dirty_rows = [position[listing_id] for listing_id in dirty_ids if listing_id in position]
+    affected = set(dirty_rows)
+
+    # Listings that currently list a changed (or deleted) listing
+    affected.update(
+        position[listing_id]
+        for listing_id in SimilarListing.objects.filter(similar_id__in=dirty_ids)
+        .values_list("listing_id", flat=True)
+        if listing_id in position
+    )
+
+    if dirty_rows:
+        # Listings the changed ones would now rank highly enough for
+        scores = (matrix @ matrix[dirty_rows].T).tocsr()
+        best = np.asarray(scores.max(axis=1).todense()).ravel()
+        candidates = [int(ids[row]) for row in np.flatnonzero(best > 0) if row not in affected]
+        for start in range(0, len(candidates), 1000):
+            current = {
+                entry["listing_id"]: entry
+                for entry in SimilarListing.objects.filter(listing_id__in=candidates[start:start + 1000])
+                .values("listing_id")
+                .annotate(count=Count("id"), lowest=Min("score"))
+            }
+            for listing_id in candidates[start:start + 1000]:
+                entry = current.get(listing_id)
+                row = position[listing_id]
+                if entry is None or entry["count"] < k or best[row] > entry["lowest"]:
+                    affected.add(row)
+    return sorted(affected)
+
+
+def refresh_similar_listings(k=None, batch_size=None):
+    """Recompute recommendations touched by the queued changes. Returns rows recomputed."""
+    k = k or settings.SIMILAR_LISTINGS_K
+    batch_size = batch_size or settings.SIMILAR_LISTINGS_BATCH_SIZE
+    marks = list(SimilarityDirtyListing.objects.values_list("id", "listing_id"))
+    if not marks:
+        return 0
+    dirty_ids = {listing_id for _, listing_id in marks}
+
+    model = _updated_model(dirty_ids)
+    rows = _affected_rows(model.ids, model.matrix, dirty_ids, k)
+    _store(model.ids, model.matrix, rows, k, batch_size)
+    # Only consume what we read; marks added meanwhile wait for the next run.
+    SimilarityDirtyListing.objects.filter(id__lte=max(mark_id for mark_id, _ in marks)).delete()
+    return len(rows)
+
+
+def rebuild_similar_listings(k=None, batch_size=None):
+    """Recompute every listing's recommendations. Returns rows recomputed."""
+    k = k or settings.SIMILAR_LISTINGS_K
+    batch_size = batch_size or settings.SIMILAR_LISTINGS_BATCH_SIZE
+    last_mark = SimilarityDirtyListing.objects.order_by("-id").values_list("id", flat=True).first()
+    model = _fit()
+    _store(model.ids, model.matrix, list(range(len(model.ids))), k, batch_size)
+    if last_mark:
+        SimilarityDirtyListing.objects.filter(id__lte=last_mark).delete()
+    return len(model.ids)
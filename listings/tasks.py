@@ -3,6 +3,8 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
 
+from alx_travel_app import tracing
+
 @shared_task
 def send_booking_confirmation_email(booking_id, user_email, listing_title, check_in, check_out, payment_amount=None):
     """
@@ -48,14 +50,149 @@ def send_booking_confirmation_email(booking_id, user_email, listing_title, check
     # Send the email
     # This returns the number of successfully sent emails
     try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user_email],
-            fail_silently=False,  # Raise exceptions if sending fails
-        )
+        with tracing.span("smtp.send_mail", kind="client"):
+            send_mail(
+                subject=subject,
+                message=message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[user_email],
+                fail_silently=False,  # Raise exceptions if sending fails
+            )
         return f"Email sent successfully to {user_email}"
     except Exception as e:
         # If email sending fails, Celery will know the task failed
         raise Exception(f"Failed to send email: {str(e)}")
+
+
+@shared_task
+def refresh_listing_daily_stats(batch_size=500):
+    """
+    Recompute analytics rollups for the days marked dirty since the last run.
+
+    Scheduled through CELERY_BEAT_SCHEDULE. Only the dirty (listing, day)
+    pairs are recomputed, so the cost depends on recent activity rather
+    than on how many years of bookings we have.
+    """
+    from .analytics import refresh_dirty_days
+
+    refreshed = refresh_dirty_days(batch_size=batch_size)
+    return f"Refreshed {refreshed} listing-day rollups"
+
+
+@shared_task
+def refresh_similar_listings():
+    """Recompute similar-listing recommendations affected by recent edits."""
+    from .similarity import refresh_similar_listings as refresh
+
+    refreshed = refresh()
+    return f"Recomputed similar listings for {refreshed} listings"
+
+
+@shared_task
+def rebuild_similar_listings():
+    """Recompute every listing's recommendations (daily, undoes IDF drift)."""
+    from .similarity import rebuild_similar_listings as rebuild
+
+    rebuilt = rebuild()
+    return f"Rebuilt similar listings for {rebuilt} listings"
+
+
+@shared_task
+def maintain_booking_partitions():
+    """Create the coming months' Booking partitions (Postgres only; daily)."""
+    from .partitioning import ensure_booking_partitions
+
+    created = ensure_booking_partitions()
+    return f"Created {len(created)} booking partitions"
+
+
+@shared_task
+def expire_stale_records():
+    """Expire abandoned pending payments and bookings, in bounded batches."""
+    from .expiry import expire_stale_records as expire
+
+    expired = expire()
+    return f"Expired {expired['payments']} payments and {expired['bookings']} bookings"
+
+
+@shared_task
+def archive_old_bookings(batch_size=1000):
+    """Move long-finished bookings to the archive table (daily)."""
+    from .archive import archive_bookings
+
+    archived = archive_bookings(batch_size=batch_size)
+    return f"Archived {archived} bookings"
+
+
+@shared_task
+def refresh_exchange_rates():
+    """Store the latest exchange rates (hourly)."""
+    from .currency import refresh_rates
+
+    updated = refresh_rates()
+    return f"Updated {updated} exchange rates"
+
+
+@shared_task
+def sync_calendar_feeds(batch_size=100):
+    """Import hosts' external iCal feeds, applying only what changed."""
+    from .ical import sync_calendar_feeds as sync
+
+    totals = sync(batch_size=batch_size)
+    return (
+        f"Synced {totals['feeds']} calendar feeds: {totals['created']} blocks added, "
+        f"{totals['updated']} changed, {totals['deleted']} removed"
+    )
+
+
+@shared_task
+def generate_listing_photo_renditions(photo_id):
+    """
+    Create the resized WebP/JPEG versions of an uploaded listing photo.
+
+    Runs in the worker so the upload request only has to store the original.
+    """
+    from .enums import PhotoStatus
+    from .models import ListingPhoto
+    from .photos import generate_renditions
+
+    photo = ListingPhoto.objects.filter(pk=photo_id).first()
+    if photo is None:
+        return f"Photo {photo_id} no longer exists"
+    try:
+        generate_renditions(photo)
+    except (OSError, ValueError) as e:
+        # Not a readable image; keep the row so the client sees why
+        photo.status = PhotoStatus.FAILED
+        photo.save(update_fields=["status"])
+        return f"Failed to process photo {photo_id}: {e}"
+    return f"Generated renditions for photo {photo_id}"
+
+
+@shared_task(bind=True, max_retries=5)
+def verify_payment_status(self, transaction_id):
+    """
+    Verify a pending payment with Chapa after its callback fires.
+
+    Saving the new status publishes it to subscribers of the payment's
+    event stream, so clients are told instead of polling.
+    """
+    from rest_framework.exceptions import Throttled
+    from .enums import PaymentStatus
+    from .models import Payment
+    from .services import ChapaService, apply_verification
+
+    payment = Payment.objects.select_related('booking').filter(transaction_id=transaction_id).first()
+    if payment is None or payment.status != PaymentStatus.PENDING:
+        return f"Nothing to verify for {transaction_id}"
+
+    try:
+        verification_response = ChapaService().verify_payment(transaction_id)
+    except Throttled as e:
+        # Global Chapa budget is spent; try again once it refills
+        raise self.retry(countdown=e.wait or 1)
+
+    if not verification_response or verification_response.get('status') != 'success':
+        raise self.retry(countdown=30)
+
+    return apply_verification(payment, verification_response)
@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from io import BytesIO
 
-# Create your tests here.
+import msgpack
+from PIL import Image
+import orjson
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from alx_travel_app import schema, tracing
+from alx_travel_app.log import JsonFormatter, QueueingHandler, SamplingFilter
+from alx_travel_app.renderers import ORJSONRenderer
+from alx_travel_app.startup import BOOT, by_package, parse_importtime
+
+from . import autocomplete, currency, events, fastpath, ical, throttling
+from .analytics import refresh_dirty_days
+from .archive import archive_bookings
+from .enums import PaymentStatus, PhotoStatus, Status
+from .expiry import expire_stale_records
+from . import similarity
+from .pagination import KeysetPagination
+from .similarity import build_matrix, rebuild_similar_listings, refresh_similar_listings
+from .models import (
+    ArchivedBooking, AutocompleteChange, CalendarFeed, CalendarVersion, ExchangeRate, ExternalBlock, SimilarListing, StatsDirtyRange, CustomUser, Listing, ListingPhoto, Booking, Review, Payment, ListingDailyStats,
+)
+from .serializers import BookingSerializer, ListingSerializer
+from .tasks import generate_listing_photo_renditions, send_booking_confirmation_email
+
+
+class ApiTestCase(TestCase):
+    """Shared fixtures: one host, one guest, a listing, a booking and a review."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = CustomUser.objects.create_user(
+            username="host", email="host@example.com", password="password123"
+        )
+        cls.guest = CustomUser.objects.create_user(
+            username="guest", email="guest@example.com", password="password123"
+        )
+        cls.listing = Listing.objects.create(
+            host=cls.host,
+            name="Beach House",
+            description="A long description " * 20,
+            location="Miami",
+            price_per_night=Decimal("150.00"),
+        )
+        start = date.today() + timedelta(days=5)
+        cls.booking = Booking.objects.create(
+            property=cls.listing,
+            user=cls.guest,
+            start_date=start,
+            end_date=start + timedelta(days=3),
+            total_price=Decimal("450.00"),
+        )
+        cls.review = Review.objects.create(
+            property=cls.listing, user=cls.guest, rating=5, comment="Lovely"
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+
+class SparseFieldsetTests(ApiTestCase):
+    def test_default_shape_stays_nested(self):
+        response = self.client.get(f"/api/listings/{self.listing.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["host"]["email"], self.host.email)
+        self.assertIn("description", response.data)
+        review = self.client.get(f"/api/reviews/{self.review.id}/").data
+        self.assertEqual(review["property"]["host"]["id"], self.host.id)
+        self.assertEqual(review["user"]["username"], "guest")
+        self.assertEqual(self.client.get(f"/api/bookings/{self.booking.id}/").data["user"], self.guest.id)
+
+    def test_empty_expand_returns_ids(self):
+        response = self.client.get(f"/api/listings/{self.listing.id}/?expand=")
+        self.assertEqual(response.data["host"], self.host.id)
+
+    def test_fields_limits_output_and_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/listings/?fields=id,name")
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+        listing_sql = [q["sql"] for q in ctx.captured_queries if "listings_listing" in q["sql"]][-1]
+        self.assertNotIn("description", listing_sql)
+
+    def test_expand_nests_and_joins(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                "/api/reviews/?expand=property.host&fields=id,property.name,property.host"
+            )
+        row = response.data["results"][0]
+        self.assertEqual(set(row), {"id", "property"})
+        self.assertEqual(set(row["property"]), {"name", "host"})
+        self.assertEqual(row["property"]["host"]["email"], self.host.email)
+        # One COUNT for pagination plus one joined SELECT.
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn("description", ctx.captured_queries[-1]["sql"])
+
+    def test_writes_ignore_fieldsets(self):
+        self.client.force_authenticate(self.guest)
+        response = self.client.post(
+            "/api/reviews/?fields=id",
+            {"property": self.listing.id, "user": self.guest.id, "rating": 4, "comment": "Nice"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["rating"], 4)
+
+    def test_owner_fields_come_from_the_request_user(self):
+        payload = {"host": self.guest.id, "name": "Mine", "description": "Flat", "location": "Miami", "price_per_night": "80.00"}
+        self.assertEqual(self.client.post("/api/listings/", payload, format="json").status_code, 401)
+        self.client.force_authenticate(self.host)
+        response = self.client.post("/api/listings/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Listing.objects.get(pk=response.data["id"]).host_id, self.host.id)
+        response = self.client.post(
+            "/api/reviews/", {"property": self.listing.id, "user": self.guest.id, "rating": 1, "comment": "x"}, format="json"
+        )
+        self.assertEqual(Review.objects.get(pk=response.data["id"]).user_id, self.host.id)
+
+
+class RendererTests(ApiTestCase):
+    def test_orjson_output_matches_stdlib(self):
+        data = {"price": Decimal("12.50"), "items": [{"name": "Café"}], "empty": None}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack_selected_by_accept_header(self):
+        response = self.client.get(
+            f"/api/listings/{self.listing.id}/", HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)["name"], "Beach House")
+
+    def test_json_body_is_parsed(self):
+        self.client.force_authenticate(self.guest)
+        response = self.client.post(
+            "/api/reviews/",
+            data=b'{"property": %d, "user": %d, "rating": 3, "comment": "ok"}'
+            % (self.listing.id, self.guest.id),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+class HostAnalyticsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking.status = Status.CONFIRMED
+        self.booking.save()
+        Payment.objects.create(booking=self.booking, amount=Decimal("450.00"), status="completed")
+        refresh_dirty_days()
+
+    def test_rollups_cover_booked_nights(self):
+        rows = ListingDailyStats.objects.filter(listing=self.listing).order_by("date")
+        self.assertEqual([r.date for r in rows], [
+            self.booking.start_date + timedelta(days=i) for i in range(3)
+        ])
+        self.assertEqual(rows[0].revenue, Decimal("450.00"))
+        self.assertEqual(sum(r.bookings_started for r in rows), 1)
+
+    def test_only_dirty_days_are_recomputed(self):
+        self.assertEqual(refresh_dirty_days(), 0)
+        self.booking.end_date += timedelta(days=1)
+        self.booking.save()
+        self.assertEqual(refresh_dirty_days(), 4)
+        self.assertEqual(ListingDailyStats.objects.filter(listing=self.listing).count(), 4)
+
+    def test_cancelling_clears_rollups(self):
+        self.booking.status = Status.CANCELLED
+        self.booking.save()
+        refresh_dirty_days()
+        self.assertFalse(ListingDailyStats.objects.exists())
+
+    def test_endpoint_groups_by_month(self):
+        self.client.force_authenticate(self.host)
+        start = self.booking.start_date
+        response = self.client.get(
+            "/api/hosts/me/analytics/",
+            {"granularity": "month", "start": start.isoformat(), "end": start.isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        row = response.data["results"][0]
+        self.assertEqual(row["listing"], self.listing.id)
+        self.assertEqual(row["nights_booked"], 1)
+        self.assertEqual(row["occupancy_rate"], 1.0)
+        self.assertEqual(row["revenue"], "450.00")
+
+    def test_endpoint_requires_authentication(self):
+        response = self.client.get("/api/hosts/me/analytics/")
+        self.assertIn(response.status_code, (401, 403))
+
+
+@override_settings(
+    RATE_LIMIT_REDIS_URL=None,
+    RATE_LIMITS={"payment_client": "100/min", "payment_booking": "2/min", "chapa_outbound": "100/s"},
+)
+class RateLimitTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        throttling._backend = None
+        patcher = mock.patch("listings.services.requests.post")
+        self.chapa_post = patcher.start()
+        self.chapa_post.return_value.json.return_value = {"status": "failed"}
+        self.addCleanup(patcher.stop)
+
+    def initiate(self):
+        return self.client.post(f"/api/bookings/{self.booking.id}/initiate-payment/")
+
+    def test_per_booking_limit_returns_429_with_retry_after(self):
+        self.assertEqual(self.initiate().status_code, 502)
+        self.assertEqual(self.initiate().status_code, 502)
+        response = self.initiate()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(self.chapa_post.call_count, 2)
+
+    @override_settings(RATE_LIMITS={"payment_client": "100/min", "payment_booking": "100/min", "chapa_outbound": "1/m"})
+    def test_global_outbound_limit_sheds_before_calling_chapa(self):
+        self.initiate()
+        response = self.initiate()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.chapa_post.call_count, 1)
+
+    @override_settings(RATE_LIMITS={"payment_client": "2/min", "payment_booking": "100/min", "chapa_outbound": "100/s"})
+    def test_client_limit_ignores_forged_forwarded_for(self):
+        for forged in ("10.0.0.1", "10.0.0.2"):
+            self.client.post(f"/api/bookings/{self.booking.id}/initiate-payment/", HTTP_X_FORWARDED_FOR=forged)
+        response = self.client.post(f"/api/bookings/{self.booking.id}/initiate-payment/", HTTP_X_FORWARDED_FOR="10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+
+    def test_concurrent_initiate_keeps_one_pending_payment(self):
+        def racing_request(*args, **kwargs):
+            # Another request saves its payment while this one waits on Chapa
+            Payment.objects.create(booking=self.booking, amount=1, transaction_id="tx-other", status=PaymentStatus.PENDING)
+            return mock.Mock(**{"json.return_value": {"status": "success", "data": {"checkout_url": "https://chapa"}}})
+
+        self.chapa_post.side_effect = racing_request
+        response = self.initiate()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(Payment.objects.values_list("transaction_id", flat=True)), ["tx-other"])
+
+    def test_unreachable_redis_falls_back_to_local_buckets(self):
+        backend = throttling.RedisBucketBackend("redis://127.0.0.1:1/0", throttling.LocalBucketBackend())
+        self.assertEqual(backend.consume("k", 1, 1.0, 1000.0), (True, 0.0))
+        self.assertEqual(backend.consume("k", 1, 1.0, 1000.5), (False, 0.5))
+
+
+@override_settings(RATE_LIMIT_REDIS_URL=None, IDEMPOTENCY_WAIT=0.1)
+class IdempotencyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        patcher = mock.patch("listings.views.send_booking_confirmation_email")
+        self.email_task = patcher.start()
+        self.addCleanup(patcher.stop)
+        start = date.today() + timedelta(days=30)
+        self.payload = {
+            "property": self.listing.id,
+            "user": self.guest.id,
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=2)).isoformat(),
+            "total_price": "300.00",
+        }
+
+    def create_booking(self, key, payload=None):
+        return self.client.post(
+            "/api/bookings/", payload or self.payload, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_repeated_key_replays_first_response(self):
+        first = self.create_booking("abc")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.create_booking("abc")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(self.email_task.delay.call_count, 1)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.create_booking("abc")
+        response = self.create_booking("abc", dict(self.payload, total_price="1.00"))
+        self.assertEqual(response.status_code, 422)
+
+    def test_duplicate_while_in_flight_gets_conflict(self):
+        with mock.patch("listings.idempotency.cache.add", return_value=False):
+            with mock.patch("listings.idempotency.cache.get", return_value={"state": "in_flight", "fingerprint": mock.ANY}):
+                response = self.create_booking("abc")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_requests_without_key_are_unaffected(self):
+        self.client.post("/api/bookings/", self.payload, format="json")
+        self.client.post("/api/bookings/", self.payload, format="json")
+        self.assertEqual(Booking.objects.count(), 3)
+
+
+class SchemaTests(TestCase):
+    def setUp(self):
+        schema._documents.clear()
+        self.addCleanup(schema._documents.clear)
+
+    @override_settings(DEBUG=False)
+    def test_serves_artifact_with_etag(self):
+        with mock.patch.object(schema, "artifact_path") as path, \
+                mock.patch.object(schema, "generate_schema") as generate:
+            path.return_value.read_bytes.return_value = b'{"swagger": "2.0"}'
+            response = self.client.get("/swagger.json/")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b'{"swagger": "2.0"}')
+            etag = response["ETag"]
+
+            cached = self.client.get("/swagger.json/", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(path.return_value.read_bytes.call_count, 1)
+            generate.assert_not_called()
+
+    @override_settings(DEBUG=False)
+    def test_missing_artifact_is_generated_once_and_written(self):
+        with mock.patch.object(schema, "artifact_path") as path, \
+                mock.patch.object(schema, "generate_schema") as generate:
+            path.return_value.read_bytes.side_effect = FileNotFoundError
+            generate.return_value = b'{"swagger": "2.0"}'
+            response = self.client.get("/swagger.json/")
+            self.client.get("/swagger.json/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        generate.assert_called_once_with(".json")
+        path.return_value.write_bytes.assert_called_once_with(b'{"swagger": "2.0"}')
+
+    @override_settings(DEBUG=True)
+    def test_debug_generates_lazily(self):
+        response = self.client.get("/swagger.yaml/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"/listings/", response.content)
+
+    def test_docs_page_loads_drf_yasg_on_demand(self):
+        response = self.client.get("/redoc/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"redoc", response.content.lower())
+
+
+class StartupTests(TestCase):
+    HEAVY = ("requests", "numpy", "PIL", "drf_yasg.generators", "django.contrib.admin")
+
+    def imported_at_boot(self, role):
+        code = BOOT[role] + f"; import sys; print(*[m for m in {self.HEAVY!r} if m in sys.modules])"
+        env = dict(os.environ, PROCESS_ROLE=role, DJANGO_SETTINGS_MODULE="alx_travel_app.settings")
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        return result.stdout.split()
+
+    def test_worker_defers_heavy_imports(self):
+        # admin stays installed, so the URLconf and the checks work in workers
+        self.assertEqual(self.imported_at_boot("worker"), ["django.contrib.admin"])
+
+    def test_worker_passes_the_system_checks(self):
+        env = dict(os.environ, PROCESS_ROLE="worker", DJANGO_SETTINGS_MODULE="alx_travel_app.settings")
+        code = "import django; django.setup(); from django.urls import reverse; print(reverse('admin:index'))"
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "/admin/")
+        subprocess.run([sys.executable, "manage.py", "check"], cwd=settings.BASE_DIR, env=env,
+                       capture_output=True, check=True)
+
+    def test_web_defers_numpy_pillow_and_schema_machinery(self):
+        # requests comes in through DRF anyway; admin is served by web
+        self.assertEqual(self.imported_at_boot("web"), ["requests", "django.contrib.admin"])
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     requests.compat\n"
+            "import time:       460 |        580 |   requests\n"
+        )
+        modules = parse_importtime(output)
+        self.assertEqual(modules, [("requests.compat", 120, 120), ("requests", 460, 580)])
+        self.assertEqual(by_package(modules), [("requests", 580)])
+
+
+class StatelessAuthTests(ApiTestCase):
+    def access_token(self):
+        response = self.client.post(
+            "/api/token/", {"email": "host@example.com", "password": "password123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data["access"]
+
+    def test_jwt_request_needs_no_auth_queries(self):
+        token = self.access_token()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/stateless/hosts/me/analytics/")
+        self.assertEqual(response.status_code, 200)
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("listings_customuser", tables)
+        self.assertNotIn("django_session", tables)
+
+    def test_stateless_path_skips_session_and_csrf(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token()}")
+        response = client.post(
+            "/api/stateless/reviews/",
+            {"property": self.listing.id, "user": self.guest.id, "rating": 5, "comment": "ok"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(hasattr(response.wsgi_request, "session"))
+
+    def test_stateless_path_rejects_session_login(self):
+        self.client.force_login(self.host)
+        response = self.client.get("/api/stateless/hosts/me/analytics/")
+        self.assertIn(response.status_code, (401, 403))
+
+
+class LoggingTests(TestCase):
+    def make_record(self, level=logging.INFO, **extra):
+        record = logging.makeLogRecord({"name": "listings", "levelno": level, "levelname": logging.getLevelName(level), "msg": "hello %s", "args": ("world",)})
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_includes_request_id_and_extras(self):
+        line = JsonFormatter().format(self.make_record(request_id="abc", tx_ref="tx-1"))
+        entry = orjson.loads(line)
+        self.assertEqual(entry["message"], "hello world")
+        self.assertEqual(entry["request_id"], "abc")
+        self.assertEqual(entry["tx_ref"], "tx-1")
+
+    def test_sampling_keeps_warnings_and_is_per_request(self):
+        sampler = SamplingFilter(rate=0.5)
+        self.assertTrue(sampler.filter(self.make_record(logging.WARNING, request_id="x")))
+        kept = [sampler.filter(self.make_record(request_id=f"req-{i}")) for i in range(200)]
+        self.assertTrue(20 < sum(kept) < 180)
+        self.assertEqual(
+            sampler.filter(self.make_record(request_id="req-7")),
+            sampler.filter(self.make_record(request_id="req-7")),
+        )
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueingHandler(filename=os.devnull, console=False, queue_size=1)
+        handler.listener.stop()
+        handler.handle(self.make_record())
+        handler.handle(self.make_record())
+        self.assertEqual(handler.dropped, 1)
+
+    def test_forked_process_writes_its_own_file(self):
+        handler = QueueingHandler(filename="/tmp/logs/django.log", console=False, per_process=True)
+        self.addCleanup(handler.listener.stop)
+        self.assertEqual(str(handler.log_path()), f"/tmp/logs/django.{os.getpid()}.log")
+        with mock.patch("os.getpid", return_value=4242):
+            handler.listener.stop()
+            handler._restart_listener()
+        self.assertEqual(handler.listener.handlers[0].baseFilename, "/tmp/logs/django.4242.log")
+
+    def test_response_carries_request_id(self):
+        response = self.client.get("/api/listings/", HTTP_X_REQUEST_ID="req-123")
+        self.assertEqual(response["X-Request-ID"], "req-123")
+
+    def test_malformed_request_id_is_replaced(self):
+        for bad in ("a" * 65, "<script>", "id with spaces"):
+            response = self.client.get("/api/listings/", HTTP_X_REQUEST_ID=bad)
+            self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+
+@override_settings(TRACE_EXPORTER="memory", TRACE_SAMPLE_RATE=1.0)
+class TracingTests(ApiTestCase):
+    PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+    def setUp(self):
+        super().setUp()
+        tracing.collector.clear()
+
+    def spans(self, trace_id="0af7651916cd43dd8448eb211c80319c"):
+        return tracing.collector.spans(trace_id)
+
+    def test_request_continues_callers_trace_with_db_and_serializer_spans(self):
+        with override_settings(FAST_READ_PATH=False):
+            response = self.client.get("/api/listings/", HTTP_TRACEPARENT=self.PARENT)
+        self.assertEqual(response["X-Trace-ID"], "0af7651916cd43dd8448eb211c80319c")
+        spans = self.spans()
+        server = next(s for s in spans if s["kind"] == "server")
+        self.assertEqual(server["parent_id"], "b7ad6b7169203331")
+        self.assertEqual(server["name"], "GET /api/listings/")
+        serialize = next(s for s in spans if s["name"] == "serialize ListingSerializer")
+        self.assertEqual(serialize["parent_id"], server["span_id"])
+        self.assertEqual(serialize["attributes"]["rows"], 1)
+        queries = [s for s in spans if s["name"] == "db.query"]
+        self.assertTrue(queries)
+        self.assertTrue(all(s["parent_id"] in (server["span_id"], serialize["span_id"]) for s in queries))
+
+    @override_settings(TRACE_TRUST_INCOMING_SAMPLING=True)
+    def test_unsampled_trace_propagates_but_records_nothing(self):
+        response = self.client.get("/api/listings/", HTTP_TRACEPARENT=self.PARENT[:-2] + "00")
+        self.assertEqual(response["X-Trace-ID"], "0af7651916cd43dd8448eb211c80319c")
+        with override_settings(TRACE_SAMPLE_RATE=0.0):
+            self.client.get("/api/listings/")
+        self.assertEqual(tracing.collector.spans(), [])
+
+    @override_settings(TRACE_SAMPLE_RATE=0.0)
+    def test_untrusted_callers_cannot_force_sampling(self):
+        response = self.client.get("/api/listings/", HTTP_TRACEPARENT=self.PARENT)
+        self.assertEqual(response["X-Trace-ID"], "0af7651916cd43dd8448eb211c80319c")
+        self.assertEqual(tracing.collector.spans(), [])
+
+    def test_failed_publishes_do_not_pile_up(self):
+        open_spans = tracing.OpenSpans(size=2)
+        with mock.patch.object(tracing, "_open_spans", open_spans):
+            with tracing.span("enqueue"):
+                for n in range(5):
+                    # The broker raised: after_task_publish never comes
+                    tracing._before_publish(headers={"id": f"task-{n}", "task": "t"})
+        self.assertEqual(len(open_spans), 2)
+
+    def test_task_headers_and_task_span(self):
+        headers = {"id": "task-1", "task": "listings.tasks.send_booking_confirmation_email"}
+        with tracing.span("enqueue", parent=tracing.parse_traceparent(self.PARENT)):
+            tracing._before_publish(headers=headers)
+            tracing._after_publish(headers=headers)
+        publish = next(s for s in self.spans() if s["kind"] == "producer")
+        self.assertEqual(headers["traceparent"], f"00-{publish['trace_id']}-{publish['span_id']}-01")
+
+        send_booking_confirmation_email.apply(
+            args=(self.booking.pk, "guest@example.com", "Beach House", "2026-01-01", "2026-01-03"),
+            headers={"traceparent": headers["traceparent"], "trace_enqueued_at": headers["trace_enqueued_at"]},
+        )
+        task = next(s for s in self.spans() if s["kind"] == "consumer")
+        self.assertEqual(task["parent_id"], publish["span_id"])
+        self.assertEqual(task["attributes"]["celery.state"], "SUCCESS")
+        self.assertIn("celery.queue_wait_ms", task["attributes"])
+        smtp = next(s for s in self.spans() if s["name"] == "smtp.send_mail")
+        self.assertEqual(smtp["parent_id"], task["span_id"])
+        self.assertIsNone(tracing.current_span.get())
+
+    def test_outbound_requests_carry_traceparent(self):
+        upstream = requests.Response()
+        upstream.status_code = 200
+        with mock.patch.object(requests.adapters.HTTPAdapter, "send", return_value=upstream) as send:
+            with tracing.span("job", parent=tracing.parse_traceparent(self.PARENT)):
+                requests.get("https://api.chapa.co/v1/transaction/verify/tx-1?key=secret", timeout=1)
+        client = next(s for s in self.spans() if s["kind"] == "client")
+        self.assertEqual(client["attributes"]["http.url"], "https://api.chapa.co/v1/transaction/verify/tx-1")
+        self.assertEqual(client["attributes"]["http.status_code"], 200)
+        sent = send.call_args.args[0]
+        self.assertEqual(sent.headers["traceparent"], f"00-{client['trace_id']}-{client['span_id']}-01")
+
+
+class ListingPhotoTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, LISTING_PHOTO_WIDTHS=[320, 640, 1280])
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def image_file(self, size=(800, 600)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, "JPEG")
+        return SimpleUploadedFile("beach.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def upload(self, image=None):
+        self.client.force_authenticate(self.host)
+        with mock.patch("listings.views.generate_listing_photo_renditions") as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f"/api/listings/{self.listing.id}/photos/", {"image": image or self.image_file()}, format="multipart"
+                )
+        return response, task
+
+    def test_upload_stores_by_hash_and_queues_renditions(self):
+        response, task = self.upload()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "pending")
+        photo = ListingPhoto.objects.get()
+        self.assertEqual(photo.original.name, f"listings/photos/{photo.content_hash}.jpg")
+        task.delay.assert_called_once_with(photo.id)
+
+    def test_extension_comes_from_the_detected_format(self):
+        buffer = BytesIO()
+        Image.new("RGB", (10, 10)).save(buffer, "PNG")
+        self.upload(SimpleUploadedFile("photo.html", buffer.getvalue(), content_type="text/html"))
+        self.assertTrue(ListingPhoto.objects.get().original.name.endswith(".png"))
+
+    def test_non_images_are_rejected(self):
+        for name, content in [("x.jpg", b"<html><script>alert(1)</script></html>"),
+                              ("x.svg", b'<svg xmlns="http://www.w3.org/2000/svg" onload="alert(1)"/>')]:
+            response, task = self.upload(SimpleUploadedFile(name, content))
+            self.assertEqual(response.status_code, 400)
+            task.delay.assert_not_called()
+        self.assertFalse(ListingPhoto.objects.exists())
+
+    def test_only_host_can_upload(self):
+        self.client.force_authenticate(self.guest)
+        response = self.client.post(
+            f"/api/listings/{self.listing.id}/photos/", {"image": self.image_file()}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_renditions_and_srcset(self):
+        self.upload()
+        photo = ListingPhoto.objects.get()
+        generate_listing_photo_renditions(photo.id)
+        photo.refresh_from_db()
+        self.assertEqual(photo.status, PhotoStatus.READY)
+        self.assertEqual((photo.width, photo.height), (800, 600))
+        # 1280 would be an upscale, so it is skipped
+        self.assertEqual(sorted(photo.renditions["webp"], key=int), ["320", "640"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/listings/{self.listing.id}/?expand=photos")
+        self.assertEqual(len(ctx.captured_queries), 2)
+        srcset = response.data["photos"][0]["srcset"]["webp"]
+        self.assertIn(f"{photo.content_hash}-320w.webp 320w", srcset)
+        self.assertIn(f"{photo.content_hash}-640w.webp 640w", srcset)
+
+    def test_unreadable_upload_is_marked_failed(self):
+        self.upload()
+        photo = ListingPhoto.objects.get()
+        with photo.original.open("wb") as f:
+            f.write(b"not an image")
+        generate_listing_photo_renditions(photo.id)
+        photo.refresh_from_db()
+        self.assertEqual(photo.status, PhotoStatus.FAILED)
+
+
+class PaymentEventTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.payment = Payment.objects.create(
+            booking=self.booking, amount=Decimal("450.00"), transaction_id="tx-events"
+        )
+
+    def test_status_change_is_published_after_commit(self):
+        with mock.patch.object(events, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.payment.status = "completed"
+                self.payment.save()
+            self.payment.save()  # unchanged status: nothing new to say
+        publish.assert_called_once_with("tx-events", {
+            "transaction_id": "tx-events", "status": "completed", "booking": self.booking.id,
+        })
+
+    def test_stream_sends_current_status_and_closes_when_final(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status="completed")
+        response = self.client.get("/api/payments/tx-events/events/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = async_to_sync(self._read)(response)
+        self.assertIn('"status": "completed"', body)
+        self.assertTrue(body.startswith("retry: 3000"))
+
+    async def _read(self, response):
+        return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+    def test_relay_reports_subscribed_only_after_redis_acks(self):
+        self.addCleanup(events._subscribed.clear)
+        received = []
+        pubsub = mock.Mock()
+
+        def listen():
+            self.assertFalse(events._subscribed.is_set())
+            yield {"type": "psubscribe", "channel": b"payments:*", "data": 1}
+            self.assertTrue(events._subscribed.is_set())
+            yield {"type": "pmessage", "channel": b"payments:tx-events", "data": b'{"status": "completed"}'}
+
+        pubsub.listen = listen
+        with mock.patch.object(events.hub, "publish_local", side_effect=lambda *a: received.append(a)):
+            events._relay(pubsub)
+        self.assertEqual(received, [("tx-events", {"status": "completed"})])
+
+    @override_settings(PAYMENT_EVENTS_REDIS_URL="redis://127.0.0.1:1/0")
+    def test_stream_waits_for_the_relay_subscription(self):
+        self.addCleanup(events._subscribed.clear)
+        with mock.patch.object(events, "ensure_listener", side_effect=events._subscribed.set) as ensure:
+            self.assertTrue(async_to_sync(events.wait_for_listener)())
+        ensure.assert_called_once()
+        with mock.patch.object(events, "ensure_listener"), mock.patch.object(events, "SUBSCRIBE_TIMEOUT", 0.01):
+            events._subscribed.clear()
+            self.assertFalse(async_to_sync(events.wait_for_listener)())
+
+    def test_stream_for_unknown_payment_is_404(self):
+        self.assertEqual(self.client.get("/api/payments/nope/events/").status_code, 404)
+
+    def test_callback_queues_verification(self):
+        with mock.patch("listings.views.verify_payment_status") as task:
+            response = self.client.get("/api/payments/callback/?trx_ref=tx-events")
+        self.assertEqual(response.status_code, 200)
+        task.delay.assert_called_once_with("tx-events")
+
+
+class BookingArchiveTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        start = date.today() - timedelta(days=800)
+        self.old = Booking.objects.create(
+            property=self.listing, user=self.guest, start_date=start,
+            end_date=start + timedelta(days=2), total_price=Decimal("300.00"), status=Status.CONFIRMED,
+        )
+        self.payment = Payment.objects.create(booking=self.old, amount=Decimal("300.00"), status="completed")
+        refresh_dirty_days()
+
+    def test_list_skips_old_bookings_but_they_stay_reachable_until_archived(self):
+        response = self.client.get("/api/bookings/")
+        self.assertEqual([b["id"] for b in response.data["results"]], [self.booking.id])
+        self.assertEqual(self.client.get(f"/api/bookings/{self.old.id}/").status_code, 200)
+        archive_bookings()
+        self.assertEqual(self.client.get(f"/api/bookings/{self.old.id}/").status_code, 404)
+
+    def test_archive_moves_old_bookings_with_their_payments_and_keeps_stats(self):
+        stats_before = list(ListingDailyStats.objects.values_list("date", "nights_booked", "revenue"))
+
+        self.assertEqual(archive_bookings(), 1)
+
+        self.assertFalse(Booking.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedBooking.objects.get(pk=self.old.pk)
+        self.assertEqual(
+            (archived.start_date, archived.status, archived.created_at),
+            (self.old.start_date, Status.CONFIRMED, self.old.created_at),
+        )
+        self.assertTrue(Booking.objects.filter(pk=self.booking.pk).exists())
+        self.assertFalse(Payment.objects.filter(pk=self.payment.pk).exists())
+        self.assertEqual(list(archived.payments.values_list("pk", "amount")), [(self.payment.pk, Decimal("300.00"))])
+        refresh_dirty_days()
+        self.assertEqual(
+            list(ListingDailyStats.objects.values_list("date", "nights_booked", "revenue")), stats_before
+        )
+        self.assertEqual(archive_bookings(), 0)
+
+
+class AdminTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = CustomUser.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password123"
+        )
+        self.client.force_login(self.admin)
+
+    def test_changelists_render(self):
+        Payment.objects.create(booking=self.booking, amount=Decimal("450.00"), transaction_id="tx-admin")
+        for url in ("customuser", "listing", "booking", "payment"):
+            response = self.client.get(f"/admin/listings/{url}/?q=tx-admin")
+            self.assertEqual(response.status_code, 200, url)
+        response = self.client.get("/admin/listings/booking/?q=abc")
+        self.assertEqual(response.status_code, 200)
+
+    def test_booking_changelist_query_count_is_flat(self):
+        for offset in range(5):
+            Booking.objects.create(
+                property=self.listing, user=self.guest, start_date=date.today() + timedelta(days=30 + offset),
+                end_date=date.today() + timedelta(days=31 + offset), total_price=Decimal("150.00"),
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/admin/listings/booking/")
+        few = len(ctx.captured_queries)
+        Booking.objects.create(
+            property=self.listing, user=self.guest, start_date=date.today() + timedelta(days=60),
+            end_date=date.today() + timedelta(days=61), total_price=Decimal("150.00"),
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/admin/listings/booking/")
+        self.assertEqual(len(ctx.captured_queries), few)
+
+    def test_cancel_action_is_one_update_and_marks_days_dirty(self):
+        StatsDirtyRange.objects.all().delete()
+        response = self.client.post("/admin/listings/booking/", {
+            "action": "cancel_bookings", "_selected_action": [self.booking.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Status.CANCELLED)
+        self.assertTrue(StatsDirtyRange.objects.filter(listing_id=self.listing.id).exists())
+
+
+class ExpiryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        long_ago = timezone.now() - timedelta(days=3)
+        self.payment = Payment.objects.create(booking=self.booking, amount=Decimal("450.00"), transaction_id="tx-old")
+        Payment.objects.filter(pk=self.payment.pk).update(created_at=long_ago)
+        Booking.objects.filter(pk=self.booking.pk).update(created_at=long_ago)
+        patcher = mock.patch("listings.expiry.verify_concurrently")
+        self.chapa = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.chapa.return_value = {"tx-old": {"status": "success", "data": {"status": "pending"}}}
+
+    @override_settings(EXPIRY_BATCH_SIZE=1)
+    def test_stale_payment_then_booking_expire(self):
+        fresh = Booking.objects.create(
+            property=self.listing, user=self.guest, start_date=date.today() + timedelta(days=40),
+            end_date=date.today() + timedelta(days=41), total_price=Decimal("150.00"),
+        )
+        with mock.patch.object(events, "publish") as publish:
+            self.assertEqual(expire_stale_records(), {"payments": 1, "bookings": 1})
+        self.chapa.assert_called_with(["tx-old"])
+        publish.assert_called_once_with("tx-old", {
+            "transaction_id": "tx-old", "status": "expired", "booking": self.booking.id,
+        })
+        self.payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentStatus.EXPIRED)
+        self.assertEqual(self.booking.status, Status.EXPIRED)
+        self.assertEqual(fresh.status, Status.PENDING)
+
+    def test_booking_with_completed_payment_is_kept(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status=PaymentStatus.COMPLETED)
+        self.assertEqual(expire_stale_records(), {"payments": 0, "bookings": 0})
+
+    def test_paid_payment_is_verified_instead_of_expired(self):
+        self.chapa.return_value = {"tx-old": {"status": "success", "data": {"status": "success"}}}
+        with mock.patch("listings.expiry.verify_payment_status") as task:
+            self.assertEqual(expire_stale_records(), {"payments": 0, "bookings": 0})
+        task.delay.assert_called_once_with("tx-old")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentStatus.PENDING)
+
+    def test_payment_stays_pending_while_chapa_is_unreachable(self):
+        self.chapa.return_value = {"tx-old": None}
+        self.assertEqual(expire_stale_records(), {"payments": 0, "bookings": 0})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentStatus.PENDING)
+
+
+class SimilarListingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.villa = Listing.objects.create(
+            host=self.host, name="Beach Villa", description="Ocean views and a private beach",
+            location="Miami", price_per_night=Decimal("300.00"),
+        )
+        self.cabin = Listing.objects.create(
+            host=self.host, name="Mountain Cabin", description="Snowy peaks and a fireplace",
+            location="Aspen", price_per_night=Decimal("200.00"),
+        )
+        rebuild_similar_listings()
+
+    def test_vectors_are_unit_length(self):
+        _, matrix = build_matrix([(1, "Beach House", "Sunny beach", "Miami"), (2, "", "", "")])
+        norms = matrix.multiply(matrix).sum(axis=1).tolist()
+        self.assertAlmostEqual(norms[0][0], 1.0, places=5)
+        self.assertEqual(norms[1][0], 0.0)
+
+    def test_endpoint_ranks_most_similar_first_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/listings/{self.listing.id}/similar/")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        results = response.data["results"]
+        self.assertEqual(results[0]["listing"]["id"], self.villa.id)
+        self.assertNotIn(self.listing.id, [r["listing"]["id"] for r in results])
+
+    def test_unknown_listing_is_404(self):
+        self.assertEqual(self.client.get("/api/listings/999999/similar/").status_code, 404)
+
+    def test_refresh_only_recomputes_affected_listings(self):
+        self.assertEqual(refresh_similar_listings(), 0)  # nothing queued
+        self.cabin.description = "A quiet mountain cabin far from any beach"
+        self.cabin.save()
+        self.cabin.price_per_night = Decimal("210.00")
+        self.cabin.save()  # text unchanged: not queued again
+
+        refreshed = refresh_similar_listings()
+
+        self.assertGreaterEqual(refreshed, 1)
+        self.assertEqual(refresh_similar_listings(), 0)
+        self.assertTrue(SimilarListing.objects.filter(listing=self.cabin, similar=self.listing).exists())
+
+    def test_refresh_reuses_the_fitted_model(self):
+        self.cabin.description = "A quiet mountain cabin far from any beach"
+        self.cabin.save()
+        Listing.objects.bulk_create([Listing(
+            host=self.host, name="Beach Bungalow", description="Steps from the beach", location="Miami",
+            price_per_night=Decimal("150.00"),
+        )])  # no signals, no dirty mark
+        with mock.patch.object(similarity, "TfidfModel", wraps=similarity.TfidfModel) as fit:
+            refresh_similar_listings()
+        fit.assert_not_called()
+        bungalow = Listing.objects.get(name="Beach Bungalow")
+        self.assertIn(bungalow.id, similarity._model.ids.tolist())
+        self.assertTrue(SimilarListing.objects.filter(listing=bungalow, similar=self.villa).exists())
+
+        with override_settings(SIMILAR_LISTINGS_REFIT_SECONDS=0), \
+                mock.patch.object(similarity, "TfidfModel", wraps=similarity.TfidfModel) as fit:
+            self.cabin.name = "Alpine Cabin"
+            self.cabin.save()
+            refresh_similar_listings()
+        fit.assert_called_once()
+
+    def test_deleting_a_listing_requeues_those_recommending_it(self):
+        self.villa.delete()
+        refresh_similar_listings()
+        self.assertEqual(
+            list(SimilarListing.objects.filter(listing=self.listing).values_list("similar_id", flat=True)),
+            [],
+        )
+
+
+class AutocompleteTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, location in [("Ocean Loft", "Miami Beach"), ("Old Town Flat", "Zürich"), ("Bay View", "Miami")]:
+            Listing.objects.create(
+                host=self.host, name=name, description="", location=location, price_per_night=Decimal("90.00")
+            )
+        autocomplete.rebuild()
+
+    def test_prefix_index_ranks_by_weight_and_matches_words(self):
+        index = autocomplete.PrefixIndex([("Miami", 2, None), ("Miami Beach", 5, None), ("Madrid", 9, None)])
+        self.assertEqual([t for t, _, _ in index.search("mia")], ["Miami Beach", "Miami"])
+        self.assertEqual([t for t, _, _ in index.search("bea")], ["Miami Beach"])
+        self.assertEqual([t for t, _, _ in index.search("m", limit=2)], ["Madrid", "Miami Beach"])
+        self.assertEqual([t for t, _, _ in index.search("miami b")], ["Miami Beach"])
+        self.assertEqual(index.search(""), [])
+
+    def test_long_prefixes_match_a_full_scan(self):
+        items = [(f"Beach House {i % 7} Bay {i}", (i * 37) % 11, i) for i in range(300)]
+        index = autocomplete.PrefixIndex(items)
+        def matches(text, prefix):
+            words = text.lower().split()
+            return any(" ".join(words[n:]).startswith(prefix) for n in range(len(words)))
+
+        for prefix in ("beach", "beach house 3", "bay 1", "house", "nowhere"):
+            expected = sorted(
+                (item for item in items if matches(item[0], prefix)), key=lambda item: (-item[1], item[0])
+            )[:autocomplete.MAX_LIMIT]
+            self.assertEqual(index.search(prefix, limit=autocomplete.MAX_LIMIT), expected, prefix)
+
+    def test_admin_availability_actions_record_changes(self):
+        admin_user = CustomUser.objects.create_superuser(username="admin", email="admin@example.com", password="x")
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/admin/listings/listing/", {
+                "action": "mark_unavailable", "_selected_action": [self.listing.pk],
+            })
+        self.assertTrue(AutocompleteChange.objects.filter(listing_id=self.listing.pk).exists())
+
+    def test_excluded_ranks_are_backfilled(self):
+        items = [(f"Beach {i:03}", 1, i) for i in range(100)]
+        index = autocomplete.PrefixIndex(items, capacity=25)
+        for prefix in ("bea", "beach"):
+            results = index.search(prefix, limit=10, exclude=frozenset(range(30)))
+            self.assertEqual([payload for _, _, payload in results], list(range(30, 40)), prefix)
+
+    def test_endpoint_reads_memory_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/autocomplete/?q=zur")
+        self.assertEqual(ctx.captured_queries, [])
+        data = orjson.loads(response.content)
+        self.assertEqual(data["locations"], [{"location": "Zürich", "listings": 1}])
+        self.assertEqual([l["name"] for l in data["listings"]], [])
+        data = orjson.loads(self.client.get("/api/autocomplete/?q=ocean").content)
+        self.assertEqual([l["name"] for l in data["listings"]], ["Ocean Loft"])
+
+    @override_settings(AUTOCOMPLETE_VERSION_CHECK_SECONDS=0)
+    def test_check_interval_schedules_a_background_sync(self):
+        with mock.patch.object(autocomplete, "_schedule_sync") as schedule:
+            autocomplete.get_suggestions()
+        schedule.assert_called_once()
+
+    def test_sync_patches_changes_without_a_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.create(
+                host=self.host, name="Miami Cabin", description="", location="Miami", price_per_night=Decimal("80.00")
+            )
+            Listing.objects.filter(name="Ocean Loft").get().delete()
+        index = autocomplete.get_suggestions()
+        with mock.patch.object(autocomplete, "Suggestions") as rebuild:
+            self.assertIs(autocomplete.sync(), index)
+        rebuild.assert_not_called()
+        data = index.search("mia", 10)
+        self.assertEqual(data["locations"], [{"location": "Miami", "listings": 3}])
+        self.assertEqual([l["name"] for l in data["listings"]], ["Miami Cabin"])
+        self.assertEqual(index.search("ocean", 10)["listings"], [])
+
+    @override_settings(AUTOCOMPLETE_MAX_PATCHED=1)
+    def test_too_many_patches_rebuild_the_index(self):
+        index = autocomplete.get_suggestions()
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.filter(name="Bay View").get().delete()
+        self.assertIsNot(autocomplete.sync(), index)
+        self.assertEqual(autocomplete.get_suggestions().search("bay", 10)["listings"], [])
+
+
+class MyHistoryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        start = date.today() + timedelta(days=30)
+        # Two trips on the same day, so the id breaks the tie
+        for days in (0, 0, 10, 20):
+            Booking.objects.create(property=self.listing, user=self.guest, start_date=start + timedelta(days=days),
+                                   end_date=start + timedelta(days=days + 2), total_price=Decimal("300.00"))
+        Booking.objects.create(property=self.listing, user=self.other, start_date=start,
+                               end_date=start + timedelta(days=2), total_price=Decimal("300.00"))
+        self.client.force_authenticate(self.guest)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.data["results"]]
+            url, pages = response.data["next"], pages + 1
+        return ids, pages
+
+    def test_trips_are_the_users_own_newest_first_across_pages(self):
+        expected = list(Booking.objects.filter(user=self.guest).order_by("-start_date", "-id").values_list("id", flat=True))
+        for fast in (True, False):
+            with override_settings(FAST_READ_PATH=fast):
+                # ?fields= leaves out start_date; the cursor still needs it
+                self.assertEqual(self.walk("/api/me/bookings/?page_size=2&fields=id"), (expected, 3))
+
+    def test_page_is_a_single_query_without_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/me/bookings/?page_size=2")
+        self.assertNotIn("count", response.data)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_cursor_condition_bounds_the_leading_key(self):
+        condition = KeysetPagination.after(("-start_date", "-id"), [date(2030, 1, 1), 5])
+        sql = str(Booking.objects.filter(condition).query)
+        self.assertIn('"start_date" <= 2030-01-01', sql)
+        self.assertIn('"id" < 5', sql)
+
+    def test_reviews_and_host_bookings(self):
+        Review.objects.create(property=self.listing, user=self.other, rating=3, comment="Fine")
+        response = self.client.get("/api/me/reviews/")
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.review.pk])
+
+        self.client.force_authenticate(self.host)
+        ids, _ = self.walk("/api/me/listings/bookings/")
+        self.assertEqual(sorted(ids), sorted(Booking.objects.values_list("id", flat=True)))
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get("/api/me/listings/bookings/").data["results"], [])
+
+    def test_requires_login_and_a_valid_cursor(self):
+        self.assertEqual(self.client.get("/api/me/bookings/?cursor=bm9wZQ").status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get("/api/me/bookings/").status_code, (401, 403))
+
+
+class FastReadPathTests(ApiTestCase):
+    PARAMS = ["", "?expand=", "?fields=id,status", "?expand=user", "?expand=property.host", "?fields=id,property.name&expand=property"]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.guest)
+
+    def assertSameAsSerializer(self, url):
+        fast = self.client.get(url)
+        with override_settings(FAST_READ_PATH=False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, slow.status_code, url)
+        self.assertEqual(fast.content, slow.content, url)
+
+    def test_list_and_retrieve_match_the_serializers(self):
+        urls = ["/api/listings/", f"/api/listings/{self.listing.id}/", "/api/listings/?expand=host",
+                "/api/listings/?fields=id,host.email&expand=host"]
+        for base in ("bookings", "reviews"):
+            obj = self.booking if base == "bookings" else self.review
+            for params in self.PARAMS:
+                urls += [f"/api/{base}/{params}", f"/api/{base}/{obj.id}/{params}"]
+        urls += ["/api/listings/999999/", "/api/bookings/abc/"]
+        for url in urls:
+            self.assertSameAsSerializer(url)
+
+    def test_fast_path_skips_model_instances(self):
+        with mock.patch.object(BookingSerializer, "to_representation") as to_representation:
+            response = self.client.get("/api/bookings/?expand=property")
+        to_representation.assert_not_called()
+        self.assertEqual(response.data["results"][0]["property"]["name"], self.listing.name)
+
+    def test_unsupported_shapes_fall_back(self):
+        request = mock.Mock(query_params={"expand": "photos"})
+        self.assertIsNone(fastpath.plan_for(ListingSerializer, request))
+        self.assertSameAsSerializer("/api/listings/?expand=photos")
+
+
+class BatchVerifyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        throttling._backend = None
+        start = date.today() + timedelta(days=20)
+        other = Booking.objects.create(
+            property=self.listing, user=self.guest, start_date=start,
+            end_date=start + timedelta(days=2), total_price=Decimal("300.00"),
+        )
+        for tx_ref, booking, payment_status in [
+            ("tx-paid", self.booking, PaymentStatus.PENDING),
+            ("tx-declined", other, PaymentStatus.PENDING),
+            ("tx-done", other, PaymentStatus.FAILED),
+        ]:
+            Payment.objects.create(booking=booking, amount=booking.total_price, transaction_id=tx_ref, status=payment_status)
+        patcher = mock.patch("listings.services.requests.get", side_effect=self.chapa_verify)
+        self.chapa_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def chapa_verify(url, **kwargs):
+        response = mock.Mock()
+        outcome = "success" if url.endswith("tx-paid") else "failed"
+        response.json.return_value = {"status": "success", "data": {"status": outcome}}
+        return response
+
+    def test_verifies_pending_payments_and_saves_them_together(self):
+        StatsDirtyRange.objects.all().delete()
+        body = {"transaction_ids": ["tx-done", "tx-paid", "nope", "tx-declined", "tx-paid"]}
+        with mock.patch.object(events, "publish") as publish, CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/api/payments/verify/", body, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r["transaction_id"], r.get("status"), "error" in r) for r in response.data["results"]],
+            [("tx-done", "failed", False), ("tx-paid", "completed", False), ("nope", None, True),
+             ("tx-declined", "failed", False)],
+        )
+        self.assertEqual(self.chapa_get.call_count, 2)
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(
+            sum(q["sql"].startswith('UPDATE "listings_payment"') for q in ctx.captured_queries), 1
+        )
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Status.CONFIRMED)
+        self.assertEqual(Payment.objects.get(transaction_id="tx-declined").status, PaymentStatus.FAILED)
+        self.assertTrue(StatsDirtyRange.objects.filter(listing_id=self.listing.id).exists())
+
+    def test_unreachable_chapa_leaves_payment_pending(self):
+        self.chapa_get.side_effect = requests.exceptions.ConnectionError("down")
+        response = self.client.post("/api/payments/verify/", {"transaction_ids": ["tx-paid"]}, format="json")
+        self.assertEqual(response.data["results"][0]["status"], "pending")
+        self.assertIn("error", response.data["results"][0])
+        self.assertEqual(Payment.objects.get(transaction_id="tx-paid").status, PaymentStatus.PENDING)
+
+    @override_settings(PAYMENT_BATCH_VERIFY_MAX=2)
+    def test_rejects_oversized_batches(self):
+        response = self.client.post("/api/payments/verify/", {"transaction_ids": ["a", "b", "c"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.chapa_get.assert_not_called()
+
+
+CALENDARS = os.path.join(os.path.dirname(__file__), "testdata", "calendars")
+
+
+def calendar_response(filename=None, status_code=200, etag=""):
+    """A fake requests response serving one of the fixture feeds."""
+    response = mock.Mock(status_code=status_code, headers={"ETag": etag} if etag else {})
+    response.content = b""
+    if filename:
+        with open(os.path.join(CALENDARS, filename), "rb") as f:
+            response.content = f.read()
+    return response
+
+
+class CalendarExportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = f"/api/listings/{self.listing.id}/calendar/{ical.feed_token(self.listing.id)}.ics"
+
+    def test_feed_lists_booked_dates(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertIn(f"UID:booking-{self.booking.id}@alx-travel-app\r\n", body)
+        self.assertIn(f"DTSTART;VALUE=DATE:{self.booking.start_date:%Y%m%d}\r\n", body)
+        self.assertIn("STATUS:TENTATIVE", body)
+        # What we export, we can read back
+        self.assertEqual(
+            ical.parse_calendar(body),
+            {f"booking-{self.booking.id}@alx-travel-app": (self.booking.start_date, self.booking.end_date, "Booked")},
+        )
+
+    def test_unchanged_feed_is_304_after_one_lookup(self):
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        # Versions live in the database, so a process with a cold (or
+        # separate) cache still sees the change
+        self.booking.status = Status.CONFIRMED
+        self.booking.save()
+        cache.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("STATUS:CONFIRMED", response.content.decode())
+
+    def test_version_is_bumped_with_the_change(self):
+        self.client.get(self.url)
+        before = CalendarVersion.objects.get(listing_id=self.listing.id).etag
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            self.booking.status = Status.CANCELLED
+            self.booking.save()
+            self.assertNotEqual(CalendarVersion.objects.get(listing_id=self.listing.id).etag, before)
+            raise DatabaseError("rolled back")
+        self.assertEqual(CalendarVersion.objects.get(listing_id=self.listing.id).etag, before)
+
+    def test_unknown_listing_is_404(self):
+        self.assertEqual(self.client.get(f"/api/listings/999999/calendar/{ical.feed_token(999999)}.ics").status_code, 404)
+
+    def test_feed_needs_its_secret_token(self):
+        other = Listing.objects.create(
+            host=self.host, name="Other", description="", location="Miami", price_per_night=Decimal("90.00")
+        )
+        for url in (f"/api/listings/{self.listing.id}/calendar/{ical.feed_token(other.id)}.ics",
+                    f"/api/listings/{other.id}/calendar/nope.ics"):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        # Bad tokens don't create versions
+        self.assertFalse(CalendarVersion.objects.filter(listing_id=other.id).exists())
+
+    def test_only_the_host_gets_the_feed_url(self):
+        url = f"/api/listings/{self.listing.id}/calendar-url/"
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(self.host)
+        self.assertEqual(self.client.get(url).data["url"], f"http://testserver{self.url}")
+
+
+class CalendarImportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.feed = CalendarFeed.objects.create(listing=self.listing, url="https://example.com/airbnb.ics")
+        self.session = mock.Mock()
+
+    def blocks(self):
+        return {
+            block.uid: (block.start_date, block.end_date, block.summary)
+            for block in ExternalBlock.objects.filter(feed=self.feed)
+        }
+
+    def test_parses_fixture_feed(self):
+        with open(os.path.join(CALENDARS, "airbnb.ics")) as f:
+            events = ical.parse_calendar(f.read())
+        self.assertEqual(events, {
+            "stay-1@airbnb.com": (date(2026, 11, 10), date(2026, 11, 14), "Reserved"),
+            "stay-2@airbnb.com": (date(2026, 12, 1), date(2026, 12, 3), "Airbnb (Not available)"),
+            # Leaves at 11:00 on the 22nd, so the 22nd is blocked too
+            "stay-3@airbnb.com": (date(2026, 12, 20), date(2026, 12, 23), "Owner, family visit"),
+        })
+
+    def test_second_import_applies_only_the_changes(self):
+        self.session.get.return_value = calendar_response("airbnb.ics", etag='"v1"')
+        self.assertEqual(ical.import_feed(self.feed, self.session), (3, 0, 0))
+        unchanged_pk = ExternalBlock.objects.get(uid="stay-1@airbnb.com").pk
+
+        self.session.get.return_value = calendar_response("airbnb_updated.ics", etag='"v2"')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(ical.import_feed(self.feed, self.session), (1, 1, 1))
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        writes = [q["sql"] for q in ctx.captured_queries if "listings_externalblock" in q["sql"] and not q["sql"].startswith("SELECT")]
+        self.assertEqual(len(writes), 3)  # one INSERT, one UPDATE, one DELETE
+        self.assertEqual(self.blocks(), {
+            "stay-1@airbnb.com": (date(2026, 11, 10), date(2026, 11, 14), "Reserved"),
+            "stay-2@airbnb.com": (date(2026, 12, 1), date(2026, 12, 5), "Airbnb (Not available)"),
+            "stay-4@airbnb.com": (date(2027, 1, 2), date(2027, 1, 3), "Reserved"),
+        })
+        self.assertEqual(ExternalBlock.objects.get(uid="stay-1@airbnb.com").pk, unchanged_pk)
+
+    def test_not_modified_and_failed_fetches_keep_blocks(self):
+        self.session.get.return_value = calendar_response("airbnb.ics")
+        ical.import_feed(self.feed, self.session)
+        self.session.get.return_value = calendar_response(status_code=304)
+        self.assertEqual(ical.import_feed(self.feed, self.session), (0, 0, 0))
+        self.session.get.side_effect = requests.exceptions.ConnectionError("down")
+        self.assertEqual(ical.import_feed(self.feed, self.session), (0, 0, 0))
+        self.assertEqual(len(self.blocks()), 3)
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.last_error, "down")
+
+    def test_sync_task_imports_every_feed(self):
+        with mock.patch("listings.ical.requests.Session") as session_class:
+            session_class.return_value.__enter__.return_value.get.return_value = calendar_response("airbnb.ics")
+            totals = ical.sync_calendar_feeds()
+        self.assertEqual(totals, {"feeds": 1, "created": 3, "updated": 0, "deleted": 0})
+
+
+class CurrencyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        throttling._backend = None
+        ExchangeRate.objects.create(currency="USD", rate=Decimal("0.0069"), updated_at=timezone.now())
+        currency.clear_cache()
+        self.addCleanup(currency.clear_cache)
+
+    def test_conversion_matches_decimal_rounding(self):
+        amounts = [Decimal(cents) / 100 for cents in (0, 1, 72, 50, 15000, 9999999999, 123457)]
+        # The large rate overflows int64 and takes the Python-integer path
+        for rate in (Decimal("0.0069"), Decimal("1.2345678901"), Decimal("0.005"), Decimal("1234567890.5")):
+            expected = [(a * rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) for a in amounts]
+            with mock.patch.object(currency, "get_rates", return_value={"USD": rate}):
+                self.assertEqual(currency.convert_amounts(amounts, "USD"), expected)
+
+    def test_listing_prices_in_requested_currency(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/listings/?currency=usd")
+        row = response.data["results"][0]
+        self.assertEqual((row["price_per_night"], row["currency"]), ("1.04", "USD"))  # 150 * 0.0069 = 1.035
+        self.assertEqual(len(ctx.captured_queries), 3)  # count, page, rates (then cached)
+        response = self.client.get(f"/api/listings/{self.listing.id}/?currency=USD&fields=id,price_per_night")
+        self.assertEqual(response.data, {"id": self.listing.id, "price_per_night": "1.04", "currency": "USD"})
+        self.assertEqual(self.client.get("/api/listings/?currency=XYZ").status_code, 400)
+        self.assertEqual(self.client.get("/api/listings/?currency=EUR").status_code, 503)
+
+    def test_quote(self):
+        response = self.client.get(
+            f"/api/listings/{self.listing.id}/quote/?start=2026-12-01&end=2026-12-04&currency=USD"
+        )
+        self.assertEqual(response.data["nights"], 3)
+        self.assertEqual(response.data["price_per_night"], "1.04")
+        self.assertEqual(response.data["total_price"], "3.11")  # 450 * 0.0069 = 3.105
+        response = self.client.get(f"/api/listings/{self.listing.id}/quote/?start=2026-12-04&end=2026-12-01")
+        self.assertEqual(response.status_code, 400)
+
+    def test_payment_charged_and_stored_in_currency(self):
+        with mock.patch("listings.services.requests.post") as chapa_post:
+            chapa_post.return_value.json.return_value = {
+                "status": "success", "data": {"checkout_url": "https://checkout.chapa.co/x"},
+            }
+            response = self.client.post(
+                f"/api/bookings/{self.booking.id}/initiate-payment/", {"currency": "USD"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(chapa_post.call_args.kwargs["json"]["currency"], "USD")
+        self.assertEqual(chapa_post.call_args.kwargs["json"]["amount"], "3.11")
+        payment = Payment.objects.get(booking=self.booking)
+        self.assertEqual((payment.amount, payment.currency, payment.base_amount), (Decimal("3.11"), "USD", Decimal("450.00")))
+
+    def test_refresh_rates_stores_decimal_rates(self):
+        body = '{"rates": {"USD": 0.00712, "EUR": 0.0065, "GBP": 0.0055}}'
+        response = mock.Mock()
+        response.json.side_effect = lambda **kwargs: json.loads(body, **kwargs)
+        with mock.patch("listings.currency.requests.get", return_value=response):
+            self.assertEqual(currency.refresh_rates(), 2)
+        self.assertEqual(currency.get_rates()["USD"], Decimal("0.00712"))
+        self.assertEqual(currency.get_rates()["EUR"], Decimal("0.0065"))
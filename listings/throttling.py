@@ -0,0 +1,185 @@
+"""
+Token-bucket rate limiting shared across processes.
+
+Buckets live in Redis when RATE_LIMIT_REDIS_URL is configured so every
+gunicorn/Celery process draws from the same budget. If Redis is missing or
+unreachable we fall back to a per-process in-memory bucket rather than
+failing the request (or waiting on a dead socket).
+
+Rates use DRF's "num/period" format, e.g. "10/min". `num` is also the
+burst size: a quiet client can spend it all at once, then gets `num`
+tokens back spread evenly over `period`.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """Turn "10/min" into (capacity, tokens_per_second)."""
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class LocalBucketBackend:
+    """In-process token buckets, bounded so unique client keys can't grow memory forever."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now, tokens=1):
+        with self._lock:
+            available, last = self._buckets.pop(key, (capacity, now))
+            available = min(capacity, available + max(0.0, now - last) * rate)
+            if available >= tokens:
+                available -= tokens
+                retry_after = 0.0
+            else:
+                retry_after = (tokens - available) / rate
+            self._buckets[key] = (available, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after == 0.0, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Refill, take and store in one round trip so concurrent processes can't
+# both spend the last token. Numbers are returned as strings because Redis
+# truncates Lua numbers to integers.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= requested then
+  tokens = tokens - requested
+else
+  retry_after = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBucketBackend:
+    """Token buckets stored in Redis and updated atomically by a Lua script."""
+
+    # After a Redis error, use the local fallback for this long before
+    # trying Redis again, so an outage doesn't add a timeout to every request.
+    RETRY_REDIS_AFTER = 30
+
+    def __init__(self, url, fallback):
+        import redis
+
+        self.fallback = fallback
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._script = self._client.register_script(TOKEN_BUCKET_LUA)
+        self._down_until = 0.0
+
+    def consume(self, key, capacity, rate, now, tokens=1):
+        if now >= self._down_until:
+            try:
+                retry_after = float(self._script(keys=[f"ratelimit:{key}"], args=[capacity, rate, now, tokens]))
+                return retry_after == 0.0, retry_after
+            except Exception as e:
+                logger.warning("Rate limit Redis unavailable, using local buckets: %s", e)
+                self._down_until = now + self.RETRY_REDIS_AFTER
+        return self.fallback.consume(key, capacity, rate, now, tokens)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide bucket backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                local = LocalBucketBackend()
+                url = getattr(settings, "RATE_LIMIT_REDIS_URL", None)
+                _backend = RedisBucketBackend(url, local) if url else local
+    return _backend
+
+
+def consume(scope, key):
+    """
+    Take one token from the `scope` bucket for `key`.
+    Returns (allowed, retry_after_seconds).
+    """
+    capacity, rate = parse_rate(settings.RATE_LIMITS[scope])
+    return get_backend().consume(f"{scope}:{key}", capacity, rate, time.time())
+
+
+def check_outbound(scope="chapa_outbound"):
+    """Raise Throttled (-> 429 + Retry-After) when the global outbound budget is spent."""
+    allowed, retry_after = consume(scope, "global")
+    if not allowed:
+        raise Throttled(wait=retry_after, detail="Payment provider is busy, please retry shortly.")
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the shared token buckets.
+    Subclasses set `scope` (a key of settings.RATE_LIMITS) and `get_key()`.
+    DRF turns a refusal into a 429 with a Retry-After header.
+    """
+    scope = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        allowed, self.retry_after = consume(self.scope, key)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class PaymentClientThrottle(TokenBucketThrottle):
+    """Per-client budget: the user id when logged in, otherwise the client IP."""
+    scope = "payment_client"
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+
+class PaymentBookingThrottle(TokenBucketThrottle):
+    """Per-booking (or per-transaction) budget, whoever is retrying it."""
+    scope = "payment_booking"
+
+    def get_key(self, request, view):
+        kwargs = getattr(view, "kwargs", {})
+        if "booking_id" in kwargs:
+            return f"booking:{kwargs['booking_id']}"
+        if "transaction_id" in kwargs:
+            return f"tx:{kwargs['transaction_id']}"
+        return None
@@ -1,6 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ListingsViewSet, BookingsViewSet, ReviewViewSet, initiate_payment, verify_payment
+from .views import (
+    ListingsViewSet, BookingsViewSet, ReviewViewSet, initiate_payment, verify_payment, batch_verify_payments, host_analytics,
+    payment_callback, payment_events, autocomplete, listing_calendar,
+    MyBookingsView, MyReviewsView, MyListingBookingsView,
+)
 
 
 router = DefaultRouter()
@@ -11,7 +15,16 @@ router.register(r'reviews', ReviewViewSet, basename='review')
 
 
 urlpatterns = [
+  path('listings/<int:listing_id>/calendar/<str:token>.ics', listing_calendar, name='listing-calendar'),
   path('', include(router.urls)),
   path('bookings/<int:booking_id>/initiate-payment/', initiate_payment, name='initiate-payment'),
+  path('payments/callback/', payment_callback, name='payment-callback'),
+  path('payments/verify/', batch_verify_payments, name='batch-verify-payments'),
   path('payments/<str:transaction_id>/verify/', verify_payment, name='verify-payment'),
+  path('payments/<str:transaction_id>/events/', payment_events, name='payment-events'),
+  path('hosts/me/analytics/', host_analytics, name='host-analytics'),
+  path('me/bookings/', MyBookingsView.as_view(), name='my-bookings'),
+  path('me/reviews/', MyReviewsView.as_view(), name='my-reviews'),
+  path('me/listings/bookings/', MyListingBookingsView.as_view(), name='my-listing-bookings'),
+  path('autocomplete/', autocomplete, name='autocomplete'),
 ]
@@ -1,19 +1,211 @@
-from rest_framework import viewsets
-from .models import Listing, Booking, Review
-from .serializers import ListingSerializer, BookingSerializer, ReviewSerializer
-from .tasks import send_booking_confirmation_email
+import asyncio
+import json
+import logging
+
+import orjson
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+from rest_framework import generics, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import BasePermission, IsAuthenticated, IsAuthenticatedOrReadOnly
+from alx_travel_app import tracing
+from .models import Listing, Booking, Review, SimilarListing
+from .serializers import (
+    ListingSerializer, ListingPhotoSerializer, BookingSerializer, ReviewSerializer, SimilarListingSerializer,
+    QuoteQuerySerializer,
+)
+from .idempotency import idempotent
+from .pagination import KeysetPagination
+from .photos import store_upload
+from . import autocomplete as suggestions, currency as money, events, fastpath, ical
+from .tasks import send_booking_confirmation_email, generate_listing_photo_renditions, verify_payment_status
+
+logger = logging.getLogger(__name__)
+
+
+class SparseFieldsetMixin:
+    """
+    Narrow the queryset to what the serializer will actually render.
+
+    ?fields= becomes queryset.only(...) and ?expand= becomes
+    select_related(...), so unused columns and joins are never read.
+    """
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.get_serializer_class().optimize_queryset(queryset, self.request)
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve from values() rows shaped by a precompiled
+    fastpath.ReadPlan instead of the serializer, when the plan can
+    reproduce the serializer's output exactly (see listings/fastpath.py).
+    Set FAST_READ_PATH = False to always use the serializer.
+    """
 
-class ListingsViewSet(viewsets.ModelViewSet):
+    def _read_plan(self):
+        if not settings.FAST_READ_PATH:
+            return None
+        # Object-level permissions need model instances
+        for permission in self.get_permissions():
+            if type(permission).has_object_permission is not BasePermission.has_object_permission:
+                return None
+        return fastpath.plan_for(self.get_serializer_class(), self.request)
+
+    def list(self, request, *args, **kwargs):
+        plan = self._read_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.filter_queryset(self.get_queryset()).values(*plan.columns)
+        page = self.paginate_queryset(rows)
+        with tracing.span(f"serialize {self.get_serializer_class().__name__}", fast_path=True):
+            data = plan.render_many(page if page is not None else rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = self._read_plan()
+        if plan is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = self.filter_queryset(self.get_queryset()).values(*plan.columns)
+        # Same lookup (and the same 404s) as GenericAPIView.get_object()
+        row = generics.get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(plan.render(row))
+
+
+class ListingsViewSet(FastReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Listing model.
     Provides: list, create, retrieve, update, destroy actions automatically.
     """
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def perform_create(self, serializer):
+        # pk, not the user: stateless JWT requests carry a TokenUser
+        serializer.save(host_id=self.request.user.pk)
+
+    # ?currency=USD shows prices converted from the base currency
+    def list(self, request, *args, **kwargs):
+        currency = money.requested_currency(request)
+        response = super().list(request, *args, **kwargs)
+        if currency:
+            data = response.data
+            money.convert_rows(data["results"] if isinstance(data, dict) else data, currency)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        currency = money.requested_currency(request)
+        response = super().retrieve(request, *args, **kwargs)
+        if currency:
+            money.convert_rows([response.data], currency)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def quote(self, request, pk=None):
+        """
+        Price of a stay: GET /api/listings/<id>/quote/?start=2026-01-10&end=2026-01-13&currency=USD
 
+        The total is converted as a whole, so it is exactly what
+        initiate_payment charges in that currency.
+        """
+        params = QuoteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        currency = money.requested_currency(request, default=settings.BASE_CURRENCY)
+        price = None
+        if str(pk).isdigit():
+            price = Listing.objects.filter(pk=pk).values_list("price_per_night", flat=True).first()
+        if price is None:
+            raise Http404("Listing not found")
+
+        start, end = params.validated_data["start"], params.validated_data["end"]
+        nights = (end - start).days
+        price_per_night, total_price = money.convert_amounts([price, price * nights], currency)
+        return Response({
+            "listing": int(pk),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "nights": nights,
+            "currency": currency,
+            "price_per_night": str(price_per_night),
+            "total_price": str(total_price),
+        })
+
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def photos(self, request, pk=None):
+        """
+        Upload a photo (multipart field `image`). Only the listing's host may
+        upload. The original is streamed to storage; resized renditions are
+        generated in the background, so the photo starts as `pending`.
+        """
+        listing = self.get_object()
+        if not request.user.is_authenticated or request.user.pk != listing.host_id:
+            return Response(
+                {"error": "Only the host can add photos to this listing."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get("image")
+        if upload is None:
+            return Response({"error": "No image provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.LISTING_PHOTO_MAX_BYTES:
+            return Response(
+                {"error": "Image is too large."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        try:
+            photo = store_upload(listing, upload)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        transaction.on_commit(lambda: generate_listing_photo_renditions.delay(photo.id))
+        return Response(
+            ListingPhotoSerializer(photo, context=self.get_serializer_context()).data,
+            status=status.HTTP_202_ACCEPTED
+        )
 
-class BookingsViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='calendar-url')
+    def calendar_url(self, request, pk=None):
+        """
+        The secret URL of the listing's iCal feed, to paste into an external
+        calendar. Only the listing's host may see it.
+        """
+        listing = self.get_object()
+        if not request.user.is_authenticated or request.user.pk != listing.host_id:
+            return Response(
+                {"error": "Only the host can see this listing's calendar URL."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        path = reverse("listing-calendar", args=[listing.id, ical.feed_token(listing.id)])
+        return Response({"url": request.build_absolute_uri(path)})
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Listings most similar to this one, best first. Read from the
+        precomputed SimilarListing table (see listings/similarity.py).
+        """
+        if not str(pk).isdigit():
+            raise Http404("Listing not found")
+        similar = list(
+            SimilarListing.objects.filter(listing_id=pk).select_related("similar__host").order_by("rank")
+        )
+        if not similar and not Listing.objects.filter(pk=pk).exists():
+            raise Http404("Listing not found")
+        serializer = SimilarListingSerializer(similar, many=True, context=self.get_serializer_context())
+        return Response({"results": serializer.data})
+
+
+class BookingsViewSet(FastReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Booking model.
     Provides: list, create, retrieve, update, destroy actions automatically.
@@ -21,6 +213,16 @@ class BookingsViewSet(viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # The list shows current bookings only, so Postgres scans just the
+        # recent partitions. Single bookings stay reachable until archiving
+        # moves them to ArchivedBooking, however long ago they started.
+        if self.action == "list":
+            queryset = queryset.hot()
+        return queryset
+
+    @idempotent("bookings-create")
     def create(self, request, *args, **kwargs):
         """
         Override the create method to trigger the email task after
@@ -53,23 +255,77 @@ class BookingsViewSet(viewsets.ModelViewSet):
         )
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(FastReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
   queryset = Review.objects.all()
   serializer_class = ReviewSerializer
+  permission_classes = [IsAuthenticatedOrReadOnly]
 
+  def perform_create(self, serializer):
+      serializer.save(user_id=self.request.user.pk)
 
-from rest_framework.decorators import api_view, permission_classes
+
+class MyHistoryView(FastReadMixin, SparseFieldsetMixin, generics.ListAPIView):
+    """
+    Base for the /api/me/ lists: only the current user's rows, newest
+    first, paged by keyset (listings/pagination.py). The model's matching
+    (user, start_date, id) style index makes each page one range scan.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Column holding the current user's id
+    owner_field = "user_id"
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{self.owner_field: self.request.user.pk})
+
+
+class MyBookingsView(MyHistoryView):
+    """
+    GET /api/me/bookings/ - the current user's trips, however old. Trips
+    moved to ArchivedBooking (listings/archive.py) are no longer listed.
+    """
+    queryset = Booking.objects.all()
+    serializer_class = BookingSerializer
+    keyset_ordering = ("-start_date", "-id")
+
+
+class MyReviewsView(MyHistoryView):
+    """GET /api/me/reviews/ - reviews the current user has written."""
+    queryset = Review.objects.all()
+    serializer_class = ReviewSerializer
+    keyset_ordering = ("-id",)
+
+
+class MyListingBookingsView(MyHistoryView):
+    """GET /api/me/listings/bookings/ - bookings of the current host's listings."""
+    queryset = Booking.objects.all()
+    serializer_class = BookingSerializer
+    keyset_ordering = ("-start_date", "-id")
+    owner_field = "property__host_id"
+
+
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
 from django.shortcuts import get_object_or_404
-from .models import Booking, Payment
-from .services import ChapaService
+from datetime import timedelta
+from decimal import Decimal
+from .enums import PaymentStatus, Status
+from .models import Payment, ListingDailyStats
+from .serializers import HostAnalyticsQuerySerializer, PaymentBatchVerifySerializer
+from .services import ChapaService, apply_verification, verify_payments
+from .throttling import PaymentClientThrottle, PaymentBookingThrottle
 import uuid
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Temporarily public for testing
+@throttle_classes([PaymentClientThrottle, PaymentBookingThrottle])
+@idempotent("initiate-payment")
 def initiate_payment(request, booking_id):
     """
     Initiate a payment using Chapa.
@@ -79,10 +335,25 @@ def initiate_payment(request, booking_id):
     # Retrieve booking by ID (no user filter since AllowAny)
     booking = get_object_or_404(Booking, id=booking_id)
 
+    if booking.status in (Status.CANCELLED, Status.EXPIRED):
+        return Response(
+            {"error": f"This booking is {booking.status} and can no longer be paid."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Charge in the guest's currency when Chapa supports it
+    currency = str(request.data.get("currency") or settings.BASE_CURRENCY).upper()
+    if currency not in settings.CHAPA_CURRENCIES:
+        return Response(
+            {"error": f"Payments can be made in {', '.join(settings.CHAPA_CURRENCIES)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    amount = money.convert(booking.total_price, currency)
+
     # Prevent duplicate payments
     existing_payment = Payment.objects.filter(
         booking=booking,
-        status__in=['pending', 'completed']
+        status__in=[PaymentStatus.PENDING, PaymentStatus.COMPLETED]
     ).first()
 
     if existing_payment:
@@ -107,7 +378,8 @@ def initiate_payment(request, booking_id):
     # Initialize payment with Chapa
     chapa_service = ChapaService()
     chapa_response = chapa_service.initialize_payment(
-        amount=booking.total_price,
+        amount=amount,
+        currency=currency,
         email=email,
         first_name=first_name,
         last_name=last_name,
@@ -131,21 +403,34 @@ def initiate_payment(request, booking_id):
     chapa_ref = data.get('tx_ref') or data.get('reference')
     checkout_url = data.get('checkout_url')
 
-    # Create a payment record
-    payment = Payment.objects.create(
-        booking=booking,
-        amount=booking.total_price,
-        transaction_id=tx_ref,
-        chapa_reference=chapa_ref,
-        status='pending',
-        chapa_response=chapa_response
-    )
+    # Create a payment record. The unique constraint on pending payments
+    # settles a race with a concurrent request for the same booking.
+    try:
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                booking=booking,
+                amount=amount,
+                currency=currency,
+                base_amount=booking.total_price,
+                transaction_id=tx_ref,
+                chapa_reference=chapa_ref,
+                status=PaymentStatus.PENDING,
+                chapa_response=chapa_response
+            )
+    except IntegrityError:
+        logger.warning("Concurrent payment for booking %s; dropping checkout %s", booking.id, tx_ref)
+        return Response(
+            {"error": "A payment already exists for this booking."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     return Response(
         {
             "message": "Payment initialized successfully.",
             "payment_url": checkout_url,
             "transaction_id": tx_ref,
+            "amount": str(amount),
+            "currency": currency,
         },
         status=status.HTTP_200_OK
     )
@@ -153,6 +438,7 @@ def initiate_payment(request, booking_id):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Temporarily public for testing
+@throttle_classes([PaymentClientThrottle, PaymentBookingThrottle])
 def verify_payment(request, transaction_id):
     """
     Verify payment status using Chapa's API.
@@ -174,26 +460,7 @@ def verify_payment(request, transaction_id):
     # Handle verification result
     if verification_response.get('status') == 'success':
         payment_data = verification_response.get('data', {})
-        payment_status = payment_data.get('status')
-
-        if payment_status == 'success':
-            payment.status = 'completed'
-            payment.booking.status = 'confirmed'
-            payment.booking.save()
-
-            # This is the critical addition - trigger the email task
-            # We do this AFTER saving the booking to ensure the database
-            # reflects the confirmed status before the email goes out
-            # The delay() method hands this off to Celery without waiting
-
-            message = "Payment verified and booking confirmed."
-        else:
-            payment.status = 'failed'
-            message = "Payment verification returned as failed."
-
-        # Update stored response and save
-        payment.chapa_response = verification_response
-        payment.save()
+        message = apply_verification(payment, verification_response)
 
         return Response(
             {
@@ -211,3 +478,219 @@ def verify_payment(request, transaction_id):
         },
         status=status.HTTP_400_BAD_REQUEST
     )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Temporarily public for testing
+@throttle_classes([PaymentClientThrottle])
+def batch_verify_payments(request):
+    """
+    Verify several payments in one call.
+
+    Body: {"transaction_ids": ["booking-1-...", ...]}. Payments already
+    completed, failed or expired are reported without calling Chapa; the
+    rest are verified in parallel and saved together (see
+    services.verify_payments). Each result carries the payment's status,
+    or an "error" for that transaction alone.
+    """
+    serializer = PaymentBatchVerifySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    results = verify_payments(serializer.validated_data["transaction_ids"])
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def host_analytics(request):
+    """
+    Occupancy, revenue and booking counts for the current host's listings,
+    grouped by day or month.
+
+    Reads only from the ListingDailyStats rollups (one range scan on
+    (host, date)), never from Booking or Payment. Listings with no activity
+    in the range are omitted.
+
+    Query params: granularity=day|month, start, end (ISO dates), listing.
+    """
+    params = HostAnalyticsQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    start, end = params.validated_data["start"], params.validated_data["end"]
+    by_month = params.validated_data["granularity"] == "month"
+
+    # host_id rather than host: with stateless JWT auth request.user is a
+    # TokenUser carrying only the id, not a model instance.
+    rollups = ListingDailyStats.objects.filter(host_id=request.user.pk, date__range=(start, end))
+    if "listing" in params.validated_data:
+        rollups = rollups.filter(listing_id=params.validated_data["listing"])
+
+    rows = (
+        rollups.annotate(period=TruncMonth("date") if by_month else F("date"))
+        .values("listing_id", "period")
+        .annotate(
+            nights_booked=Sum("nights_booked"),
+            bookings=Sum("bookings_started"),
+            revenue=Sum("revenue"),
+        )
+        .order_by("listing_id", "period")
+    )
+
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(rows, request)
+    results = []
+    for row in page:
+        period_start = max(row["period"], start)
+        if by_month:
+            next_month = (row["period"].replace(day=28) + timedelta(days=4)).replace(day=1)
+            period_end = min(next_month - timedelta(days=1), end)
+        else:
+            period_end = period_start
+        nights_available = (period_end - period_start).days + 1
+        results.append({
+            "listing": row["listing_id"],
+            "period": row["period"].isoformat(),
+            "bookings": row["bookings"],
+            "nights_booked": row["nights_booked"],
+            "occupancy_rate": round(row["nights_booked"] / nights_available, 4),
+            "revenue": str(row["revenue"].quantize(Decimal("0.01"))),
+        })
+    return paginator.get_paginated_response(results)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def payment_callback(request):
+    """
+    Chapa calls this URL when a checkout finishes.
+
+    The payload is not trusted: it only tells us which transaction to look
+    at. Verification with Chapa happens once, in the background, and the
+    result is pushed to clients listening on the payment's event stream.
+    """
+    params = request.data if request.method == 'POST' else request.query_params
+    tx_ref = params.get('trx_ref') or params.get('tx_ref')
+    if not tx_ref:
+        return Response({"error": "Missing trx_ref."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if Payment.objects.filter(transaction_id=tx_ref, status=PaymentStatus.PENDING).exists():
+        verify_payment_status.delay(tx_ref)
+
+    return Response({"message": "Callback received."}, status=status.HTTP_200_OK)
+
+
+FINAL_PAYMENT_STATUSES = (PaymentStatus.COMPLETED, PaymentStatus.FAILED, PaymentStatus.EXPIRED)
+
+
+def _sse(message):
+    return f"event: payment\ndata: {json.dumps(message)}\n\n"
+
+
+async def _payment_event_stream(transaction_id):
+    # Subscribe (locally, and the relay in Redis) before reading the
+    # current status so no change is missed
+    entry = events.hub.subscribe(transaction_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.PAYMENT_EVENTS_MAX_SECONDS
+    try:
+        await events.wait_for_listener()
+        yield "retry: 3000\n\n"
+        payment = await Payment.objects.filter(transaction_id=transaction_id).afirst()
+        message = events.payment_event(payment) if payment else None
+        while True:
+            if message:
+                yield _sse(message)
+                if message["status"] in FINAL_PAYMENT_STATUSES:
+                    return
+            timeout = min(settings.PAYMENT_EVENTS_HEARTBEAT, deadline - loop.time())
+            if timeout <= 0:
+                # Let the client reconnect rather than holding the connection forever
+                return
+            try:
+                message = await asyncio.wait_for(entry[1].get(), timeout)
+            except asyncio.TimeoutError:
+                message = None
+                yield ": keep-alive\n\n"
+    finally:
+        events.hub.unsubscribe(transaction_id, entry)
+
+
+async def payment_events(request, transaction_id):
+    """
+    Server-Sent Events stream of a payment's status.
+
+    Sends the current status straight away, then every change, and closes
+    once the payment is completed or failed. Replaces polling the verify
+    endpoint. Serve through ASGI (alx_travel_app/asgi.py) so open streams
+    don't each hold a worker thread.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not await Payment.objects.filter(transaction_id=transaction_id).aexists():
+        raise Http404("Payment not found")
+
+    response = StreamingHttpResponse(
+        _payment_event_stream(transaction_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let proxies buffer the stream
+    return response
+
+
+@require_safe
+def autocomplete(request):
+    """
+    Type-ahead suggestions: GET /api/autocomplete/?q=mia&limit=5
+
+    Returns matching locations (with their listing counts) and listing
+    names from the in-memory index in listings/autocomplete.py. This is a
+    plain Django view, not a DRF one, because it is called on every
+    keystroke and the index lookup itself takes microseconds.
+    """
+    query = request.GET.get('q', '')[:100]
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), suggestions.MAX_LIMIT)
+    except ValueError:
+        limit = 10
+    data = suggestions.get_suggestions().search(query, limit)
+    response = HttpResponse(orjson.dumps(data), content_type='application/json')
+    response['Cache-Control'] = f'public, max-age={settings.AUTOCOMPLETE_CACHE_SECONDS}'
+    return response
+
+
+def _calendar_version(request, listing_id, token):
+    # No version (so no row) for a URL we didn't hand out
+    if not ical.valid_feed_token(listing_id, token):
+        return None, None
+    # Looked up once for both the ETag and the Last-Modified
+    if not hasattr(request, "calendar_version"):
+        request.calendar_version = ical.feed_version(listing_id)
+    return request.calendar_version
+
+
+@require_safe
+@condition(
+    etag_func=lambda request, listing_id, token: _calendar_version(request, listing_id, token)[0],
+    last_modified_func=lambda request, listing_id, token: _calendar_version(request, listing_id, token)[1],
+)
+def listing_calendar(request, listing_id, token):
+    """
+    iCal feed of a listing's booked dates, for external calendars to poll:
+    GET /api/listings/<id>/calendar/<token>.ics
+
+    The token is secret (the host gets the URL from
+    /api/listings/<id>/calendar-url/), so booked dates aren't public.
+    The ETag and Last-Modified come from the listing's CalendarVersion
+    (see listings/ical.py), so a conditional request for an unchanged feed
+    gets a 304 after a single primary-key lookup.
+    """
+    if not ical.valid_feed_token(listing_id, token):
+        raise Http404("Listing not found")
+    # Read the version before the bookings, so a change made while we
+    # render gets a newer ETag on the next poll.
+    stamp = _calendar_version(request, listing_id, token)[1]
+    name = Listing.objects.filter(pk=listing_id).values_list("name", flat=True).first()
+    if name is None:
+        raise Http404("Listing not found")
+    response = HttpResponse(ical.render_calendar(listing_id, name, stamp), content_type='text/calendar; charset=utf-8')
+    # Let caches keep it but revalidate every time
+    response['Cache-Control'] = 'no-cache'
+    return response